@@ -5,55 +5,403 @@ Reliable financial data source using Alpha Vantage API
 
 import os
 import requests
-import pandas as pd
 import numpy as np
 import time
 from datetime import datetime, timedelta
 import json
+import threading
+from functools import partial
+from contextlib import contextmanager
+from http_session import PooledSession
+from api_key_pool import APIKeyPool
+from rate_limiter import LANES, DEFAULT_LANE, lane_priority
+from resp_client import shared_client
+from api_cache import api_cache
+from price_store import price_store, to_day_number
+from price_decoder import decode_daily_series, DailySeriesStreamParser
+from request_planner import RequestPlanner
+from single_flight import SingleFlight
+from market_calendar import market_hours_ttl
+from earnings_calendar import (parse_earnings_calendar, next_report_date, EARNINGS_GRACE,
+                               EARNINGS_CALENDAR_PARAMS)
+from listing_index import listing_index, parse_listing_status, LISTING_STATUS_PARAMS
+
+# How long each endpoint's responses stay valid in the cache.
+# Values are timedeltas or callables taking the symbol and returning an absolute expiry time;
+# price endpoints follow the listing exchange's trading calendar. OVERVIEW normally lasts
+# until the ticker's next results release; this entry covers tickers with no known date.
+ENDPOINT_TTLS = {
+    'OVERVIEW': partial(market_hours_ttl.daily_expiry, at_least=timedelta(days=1)),
+    'TIME_SERIES_DAILY': market_hours_ttl.daily_expiry,
+    'SYMBOL_SEARCH': timedelta(weeks=1),
+    'GLOBAL_QUOTE': market_hours_ttl.quote_expiry,
+    'EARNINGS_CALENDAR': timedelta(weeks=1),
+}
+
+# How long past expiry a response may still be served, marked stale, while one
+# background refresh replaces it. Also covers days when the daily quota runs out.
+ENDPOINT_MAX_STALE = {
+    'OVERVIEW': timedelta(weeks=1),
+    'TIME_SERIES_DAILY': timedelta(days=3),
+    'SYMBOL_SEARCH': timedelta(weeks=4),
+    'GLOBAL_QUOTE': timedelta(days=3),
+    'EARNINGS_CALENDAR': timedelta(weeks=4),
+}
+
+# How long a failed or empty lookup is remembered, by kind of failure, so repeating a bad
+# input does not spend another call. Rate-limit replies and a spent daily quota are not
+# remembered here: the key pool already tracks those.
+NEGATIVE_TTLS = {
+    'not_found': timedelta(hours=6),         # A valid reply with no data: unknown ticker, search without matches
+    'invalid_symbol': timedelta(hours=24),   # An 'Error Message' reply rejecting the request's parameters
+    'provider_error': timedelta(minutes=2),  # HTTP errors, timeouts and unreadable replies
+    'not_entitled': timedelta(hours=1),      # A notice that the endpoint or parameter needs a premium plan
+}
+
+# Wording of the 'Note' and 'Information' replies that mean a key hit its per-minute or daily
+# limit. Other notices, such as premium-only endpoints and parameters, say nothing about the key.
+LIMIT_NOTICE_WORDING = ('call frequency', 'rate limit', 'per minute', 'per day', 'spreading out')
+
+# Prefix of the cache data type under which failures are kept, apart from good responses,
+# so a failed refresh never replaces a stale entry that is still being served
+NEGATIVE_CACHE_PREFIX = 'negative|'
+
+# The field holding each endpoint's payload. A reply found nothing if it is an empty document
+# (OVERVIEW for an unknown ticker) or holds this field empty; anything else is not a miss.
+RESULT_FIELDS = {
+    'OVERVIEW': 'Symbol',
+    'SYMBOL_SEARCH': 'bestMatches',
+    'GLOBAL_QUOTE': 'Global Quote',
+    'TIME_SERIES_DAILY': 'Time Series (Daily)',
+    'LISTING_STATUS': 'listings',
+    'EARNINGS_CALENDAR': 'reports',
+}
+
+# Endpoints that answer in CSV, and the function decoding each body into cacheable data
+CSV_ENDPOINTS = {
+    'EARNINGS_CALENDAR': parse_earnings_calendar,
+    'LISTING_STATUS': parse_listing_status,
+}
+
+# Asset types the evaluator can score; OVERVIEW has no fundamentals for the others (e.g. ETFs)
+EVALUATED_ASSET_TYPES = ('Stock',)
+
+# A compact response holds the last 100 trading days; older history needs a full refetch
+COMPACT_WINDOW = timedelta(days=140)
+
+# The stored daily history sets the 52-week range only if its latest bar is at most this old
+RANGE_HISTORY_MAX_AGE = timedelta(days=7)
+
+# Bytes read per network chunk when streaming large responses
+STREAM_CHUNK_SIZE = 64 * 1024
+
+# Request parameters that identify a response; anything else (e.g. apikey) is excluded from cache keys
+CACHE_KEY_PARAMS = ('function', 'symbol', 'keywords', 'outputsize', 'interval', 'time_period', 'series_type',
+                    'horizon')
 
 class AlphaVantageDataFetcher:
-    def __init__(self):
-        self.api_key = os.getenv('ALPHA_VANTAGE_API_KEY')
+    def __init__(self, pool_size=10, connect_timeout=5, read_timeout=30, cache=None, endpoint_ttls=None,
+                 store=None, endpoint_max_stale=None, key_pool=None, negative_ttls=None,
+                 listings=None):
         self.base_url = 'https://www.alphavantage.co/query'
-        self.last_request_time = 0
-        self.request_interval = 12  # Alpha Vantage free tier: 5 requests per minute
         
-    def _make_request(self, params):
-        """Make rate-limited request to Alpha Vantage API"""
-        # Enforce rate limiting
-        current_time = time.time()
-        time_since_last = current_time - self.last_request_time
+        # API keys, each with a token bucket at its tier's interval and a daily quota, shared by
+        # every process on this host, or on every replica with Redis
+        self.key_pool = key_pool or APIKeyPool.from_env()
+        
+        # Shared keep-alive pool so repeated calls skip the TCP+TLS handshake
+        self.session = PooledSession(
+            pool_size=int(os.getenv('ALPHA_VANTAGE_POOL_SIZE', pool_size)),
+            connect_timeout=connect_timeout,
+            read_timeout=read_timeout
+        )
+        
+        # Response cache with per-endpoint expiry
+        self.cache = cache or api_cache
+        self.endpoint_ttls = dict(ENDPOINT_TTLS)
+        self.endpoint_ttls['OVERVIEW'] = self._fundamentals_expiry
+        self.endpoint_ttls.update(endpoint_ttls or {})
+        self.endpoint_max_stale = dict(ENDPOINT_MAX_STALE)
+        self.endpoint_max_stale.update(endpoint_max_stale or {})
+        self.negative_ttls = dict(NEGATIVE_TTLS)
+        self.negative_ttls.update(negative_ttls or {})
+        
+        # One upstream call per canonical request, shared by concurrent sessions
+        self.single_flight = SingleFlight(redis=shared_client())
         
-        if time_since_last < self.request_interval:
-            sleep_time = self.request_interval - time_since_last
-            print(f"Rate limiting: waiting {sleep_time:.1f} seconds...")
-            time.sleep(sleep_time)
+        # Cache keys with a background refresh in flight, so each gets only one
+        self._refreshing = set()
+        self._refresh_lock = threading.Lock()
         
-        params['apikey'] = self.api_key
+        # Priority lane of the calling thread, and the lanes of every caller waiting on each
+        # upstream call, so a shared call waits in the most urgent of them
+        self._local = threading.local()
+        self._flight_lanes = {}
+        self._flight_lock = threading.Lock()
         
+        # Local columnar history of daily bars
+        self.price_store = store or price_store
+        
+        # Downloaded listing of active US symbols, to recognise unknown tickers without a call
+        self.listings = listings or listing_index
+        
+        # Decides which endpoints a lookup actually needs
+        self.planner = RequestPlanner(self)
+    
+    @staticmethod
+    def _get_cache_key(params):
+        """Build a canonical (symbol, data_type) cache key from the full request parameters"""
+        symbol = str(params.get('symbol') or params.get('keywords') or '').strip().upper()
+        parts = []
+        for name in CACHE_KEY_PARAMS:
+            if params.get(name) is not None:
+                parts.append(f"{name}={str(params[name]).strip().upper()}")
+        return symbol, '&'.join(parts)
+    
+    def _get_ttl(self, function, symbol=None):
+        """Return the cache expiry for an endpoint and symbol as a timedelta or datetime"""
+        ttl = self.endpoint_ttls.get(function)
+        if callable(ttl):
+            return ttl(symbol)
+        return ttl
+    
+    def _fundamentals_expiry(self, symbol):
+        """
+        Keep OVERVIEW until the ticker's next results release plus a grace period,
+        when its fundamentals next change. Only the cached earnings calendar is read;
+        if it is missing or stale a background refresh is started, and tickers with
+        no known date fall back to the default OVERVIEW expiry.
+        """
+        calendar = self._cached_earnings_calendar()
+        report_date = next_report_date(calendar, symbol) if calendar else None
+        if report_date is None:
+            return ENDPOINT_TTLS['OVERVIEW'](symbol)
+        return datetime.combine(report_date + EARNINGS_GRACE, datetime.min.time())
+    
+    def _cached_earnings_calendar(self):
+        """Return the cached earnings calendar without waiting on the API, refreshing it if needed"""
+        entry = self.cache.get_cached_entry(*self._get_cache_key(EARNINGS_CALENDAR_PARAMS), track=False)
+        if entry is None or entry['is_stale']:
+            self._schedule_refresh(EARNINGS_CALENDAR_PARAMS, lane='background')
+        return entry['data'] if entry else None
+    
+    @contextmanager
+    def lane(self, name):
+        """
+        Make upstream calls from this thread in a priority lane: 'interactive' (the
+        default, for page loads), 'prefetch' or 'background'. A waiting call from a
+        more urgent lane takes the next token, at request boundaries; waiting long
+        enough promotes a call, so the lower lanes still progress.
+        """
+        lane_priority(name)
+        previous = getattr(self._local, 'lane', None)
+        self._local.lane = name
+        try:
+            yield
+        finally:
+            self._local.lane = previous
+    
+    def _current_lane(self):
+        return getattr(self._local, 'lane', None) or DEFAULT_LANE
+    
+    @contextmanager
+    def _joining(self, flight_key):
+        """Register the calling thread's lane as waiting on an upstream call"""
+        lane = self._current_lane()
+        with self._flight_lock:
+            self._flight_lanes.setdefault(flight_key, []).append(lane)
         try:
-            response = requests.get(self.base_url, params=params, timeout=30)
-            self.last_request_time = time.time()
+            yield
+        finally:
+            with self._flight_lock:
+                lanes = self._flight_lanes[flight_key]
+                lanes.remove(lane)
+                if not lanes:
+                    del self._flight_lanes[flight_key]
+    
+    def _upstream_lane(self, flight_key, lane):
+        """The most urgent lane among the callers sharing an upstream call"""
+        with self._flight_lock:
+            lanes = self._flight_lanes.get(flight_key, []) + [lane]
+        return min(lanes, key=lane_priority)
+    
+    def _make_request(self, params, use_cache=True, stream_parser=None):
+        """
+        Make rate-limited request to Alpha Vantage API.
+        A cached response past its expiry but inside its stale window is returned at
+        once, marked with '_stale', while one background refresh replaces it.
+        With a stream_parser the body is fed to it chunk by chunk and its result is
+        returned instead of the fully decoded JSON document.
+        Concurrent misses for the same request share a single upstream call, and a
+        caller that waited on another process's call checks the cache again first.
+        """
+        cache_symbol, cache_type = self._get_cache_key(params)
+        if use_cache:
+            entry = self.cache.get_cached_entry(cache_symbol, cache_type)
+            if entry is not None:
+                if not entry['is_stale']:
+                    return entry['data']
+                self._schedule_refresh(params)
+                # Copy so the flag never reaches the shared cached dictionary
+                return dict(entry['data'], _stale=True)
+        
+        with self._joining((cache_symbol, cache_type)):
+            return self.single_flight.do(
+                (cache_symbol, cache_type),
+                lambda: self._request_upstream(params, store=use_cache, stream_parser=stream_parser),
+                (lambda: self.cache.get_cached_data(cache_symbol, cache_type)) if use_cache else None
+            )
+    
+    def _schedule_refresh(self, params, lane='prefetch', fetch=None):
+        """
+        Refresh a stale cache entry in a background thread unless one is already running.
+        fetch replaces the default refresh for data kept outside the response cache.
+        """
+        cache_key = self._get_cache_key(params)
+        with self._refresh_lock:
+            if cache_key in self._refreshing:
+                return
+            self._refreshing.add(cache_key)
+        
+        def refresh():
+            try:
+                with self.lane(lane):
+                    result = (fetch or self._refresh_now)(params)
+                if 'error' in result:
+                    # The stale entry stays in place until its window closes
+                    print(f"Background refresh of {cache_key[1]} failed: {result['error']}")
+            finally:
+                with self._refresh_lock:
+                    self._refreshing.discard(cache_key)
+        
+        threading.Thread(target=refresh, daemon=True).start()
+    
+    def _refresh_now(self, params):
+        """Fetch a request upstream and cache it, whatever is cached, sharing the call with concurrent callers"""
+        cache_key = self._get_cache_key(params)
+        with self._joining(cache_key):
+            return self.single_flight.do(
+                cache_key, lambda: self._request_upstream(params),
+                lambda: self.cache.get_cached_data(*cache_key)
+            )
+    
+    def _failure_entry(self, cache_key):
+        """Return the cache entry of a remembered failure for a request, or None"""
+        symbol, data_type = cache_key
+        return self.cache.get_cached_entry(symbol, NEGATIVE_CACHE_PREFIX + data_type, track=False)
+    
+    def _remember_failure(self, cache_key, kind, result):
+        """Remember a failed or empty reply for its kind's TTL and return it"""
+        symbol, data_type = cache_key
+        self.cache.cache_data(symbol, result, NEGATIVE_CACHE_PREFIX + data_type, ttl=self.negative_ttls[kind])
+        return result
+    
+    @staticmethod
+    def _is_empty(function, data):
+        """True if a reply is really empty: no payload at all, or its payload field holds nothing"""
+        field = RESULT_FIELDS.get(function)
+        if field is None:
+            return False
+        return not data or (field in data and not data[field])
+    
+    @staticmethod
+    def _is_limit_notice(data):
+        """True if a 'Note' or 'Information' reply reports a per-minute or daily limit"""
+        notice = str(data.get('Note') or data.get('Information') or '').lower()
+        return any(wording in notice for wording in LIMIT_NOTICE_WORDING)
+    
+    def _request_upstream(self, params, store=True, stream_parser=None):
+        """
+        Call the API, bypassing the cache, and store a successful response unless told not to.
+        Failed and empty replies are remembered for a short while and answered from there.
+        """
+        started = time.perf_counter()
+        flight_key, lane = self._get_cache_key(params), self._current_lane()
+        failure = self._failure_entry(flight_key)
+        if failure is not None:
+            return failure['data']
+        
+        # Route to the key with the most capacity, waiting for its rate limit if every key is busy.
+        # The lane is re-read while waiting, so a more urgent caller joining the call promotes it.
+        api_key, waited = self.key_pool.acquire(lane=lambda: self._upstream_lane(flight_key, lane))
+        if api_key is None:
+            if all(key.invalid for key in self.key_pool.keys):
+                return {'error': 'Every Alpha Vantage API key was rejected. Please check the configured keys.'}
+            return {'error': 'Daily API call limit reached. Please try again tomorrow.'}
+        if waited >= 0.1:
+            print(f"Rate limiting: waited {waited:.1f} seconds...")
+        
+        params = dict(params, apikey=api_key.key)
+        
+        try:
+            response = self.session.get(self.base_url, params=params, stream=stream_parser is not None)
             
             if response.status_code == 200:
-                data = response.json()
+                if params['function'] in CSV_ENDPOINTS:
+                    data = CSV_ENDPOINTS[params['function']](response.text)
+                elif stream_parser is None:
+                    data = response.json()
+                else:
+                    # Parse the body as it arrives instead of holding the whole document
+                    for chunk in response.iter_content(chunk_size=STREAM_CHUNK_SIZE):
+                        stream_parser.feed(chunk)
+                    data = stream_parser.close()
                 
                 # Check for API error messages
                 if 'Error Message' in data:
-                    return {'error': data['Error Message']}
-                elif 'Note' in data:
+                    if 'apikey' in data['Error Message'].lower():
+                        # The key's fault, not the request's: another key may answer it
+                        api_key.mark_invalid()
+                        return {'error': data['Error Message']}
+                    return self._remember_failure(flight_key, 'invalid_symbol', {'error': data['Error Message']})
+                elif ('Note' in data or 'Information' in data) and self._is_limit_notice(data):
+                    # Per-minute and daily limit notices; the request itself may be fine
+                    api_key.mark_rate_limited()
                     return {'error': 'API call frequency limit reached. Please try again later.'}
+                elif 'Note' in data or 'Information' in data:
+                    # Not available on this plan: the key is healthy, the request is not worth repeating
+                    return self._remember_failure(flight_key, 'not_entitled',
+                                                  {'error': data.get('Information') or data.get('Note')})
+                elif 'error' in data:
+                    # A CSV endpoint answered with a JSON document that is not its data
+                    return self._remember_failure(flight_key, 'provider_error', data)
                 else:
+                    api_key.mark_ok()
+                    cache_symbol, cache_type = self._get_cache_key(params)
+                    # Includes the rate-limit wait: the time a cache hit saves the caller
+                    self.cache.stats.record_upstream(cache_type, time.perf_counter() - started)
+                    if self._is_empty(params['function'], data):
+                        return self._remember_failure(flight_key, 'not_found', data)
+                    if store and stream_parser is None:
+                        self.cache.cache_data(cache_symbol, data, cache_type,
+                                              ttl=self._get_ttl(params['function'], cache_symbol),
+                                              max_stale=self.endpoint_max_stale.get(params['function']))
                     return data
             else:
-                return {'error': f'HTTP {response.status_code}: {response.text}'}
+                return self._remember_failure(flight_key, 'provider_error',
+                                              {'error': f'HTTP {response.status_code}: {response.text}'})
                 
         except requests.exceptions.Timeout:
-            return {'error': 'Request timeout - please try again'}
+            return self._remember_failure(flight_key, 'provider_error', {'error': 'Request timeout - please try again'})
         except requests.exceptions.RequestException as e:
-            return {'error': f'Network error: {str(e)}'}
+            # The message quotes the request URL; keep the key itself out of the cache
+            message = str(e).replace(api_key.key, api_key.label) if api_key.key else str(e)
+            return self._remember_failure(flight_key, 'provider_error', {'error': f'Network error: {message}'})
         except json.JSONDecodeError:
-            return {'error': 'Invalid response format'}
+            return self._remember_failure(flight_key, 'provider_error', {'error': 'Invalid response format'})
+    
+    def get_lane_stats(self):
+        """Get today's API calls and the callers currently waiting, per priority lane"""
+        used = self.key_pool.used_by_lane()
+        return {lane: {'calls_today': used[lane], 'waiting': self.key_pool.queue_length(lane)} for lane in LANES}
+    
+    def get_key_pool_stats(self):
+        """Get the budget, usage and health of each API key"""
+        return self.key_pool.get_stats()
+    
+    def get_connection_stats(self):
+        """Get connection reuse and latency statistics for the HTTP pool"""
+        return self.session.get_stats()
     
     def get_company_overview(self, symbol):
         """Get fundamental company data"""
@@ -63,15 +411,89 @@ class AlphaVantageDataFetcher:
         }
         return self._make_request(params)
     
-    def get_daily_prices(self, symbol):
-        """Get daily price data"""
-        params = {
+    def _daily_prices_params(self, symbol, latest=None):
+        """Request compact bars when the stored history overlaps them, full history otherwise"""
+        if latest is None:
+            latest = self.price_store.latest_date(symbol)
+        outputsize = 'full'
+        if latest is not None:
+            age = np.datetime64(datetime.now().date(), 'D') - latest
+            if age < np.timedelta64(COMPACT_WINDOW.days, 'D'):
+                outputsize = 'compact'
+        return {
             'function': 'TIME_SERIES_DAILY',
             'symbol': symbol,
-            'outputsize': 'full'
+            'outputsize': outputsize
+        }
+    
+    def get_earnings_calendar(self):
+        """Get upcoming results release dates for every listed company, fetched once and cached"""
+        return self._make_request(dict(EARNINGS_CALENDAR_PARAMS))
+    
+    def get_global_quote(self, symbol):
+        """Get the latest price quote"""
+        params = {
+            'function': 'GLOBAL_QUOTE',
+            'symbol': symbol
         }
         return self._make_request(params)
     
+    def get_daily_prices(self, symbol):
+        """
+        Get daily price data and record it in the local price store.
+        The full history is downloaded once; later calls fetch only the compact
+        window, whose bars are merged into the stored history by date.
+        Streamed full downloads return decoded columns under 'bars' rather than
+        a 'Time Series (Daily)' mapping.
+        """
+        latest = self.price_store.latest_date(symbol)
+        params = self._daily_prices_params(symbol, latest)
+        if params['outputsize'] == 'full':
+            # Stream the multi-megabyte backfill straight into arrays; it lands in the
+            # price store, so the raw JSON is not cached as well. The store is written
+            # inside the shared call so a process waiting on it finds the bars there.
+            def backfill():
+                data = self._request_upstream(params, store=False, stream_parser=DailySeriesStreamParser())
+                if 'bars' in data and len(data['bars']['date']):
+                    self.price_store.append(symbol, data['bars'])
+                return data
+            
+            with self._joining(self._get_cache_key(params)):
+                return self.single_flight.do(
+                    self._get_cache_key(params), backfill, lambda: self._backfilled_history(symbol, latest)
+                )
+        
+        price_data = self._make_request(params)
+        if 'error' in price_data:
+            return price_data
+        
+        bars = price_data.get('bars')
+        if bars is None and price_data.get('Time Series (Daily)'):
+            bars = decode_daily_series(price_data['Time Series (Daily)'])
+        # Compare with the store as it is now: a coalesced caller may already have appended these bars
+        stored = self.price_store.latest_date(symbol)
+        if bars is not None and len(bars['date']) and (stored is None or bars['date'][-1] > to_day_number(stored)):
+            self.price_store.append(symbol, bars)
+        
+        return price_data
+    
+    def _backfilled_history(self, symbol, latest):
+        """Return the stored bars if another process finished the backfill since latest was read"""
+        if self.price_store.latest_date(symbol) == latest:
+            return None
+        return {'Meta Data': {'2. Symbol': symbol}, 'bars': self.price_store.read(symbol)}
+    
+    def get_price_history(self, symbol, start=None, end=None):
+        """
+        Bring the stored history up to date and return memory-mapped OHLCV columns.
+        Returns an error dictionary if no history could be fetched.
+        """
+        price_data = self.get_daily_prices(symbol)
+        history = self.price_store.read(symbol, start, end)
+        if history is None:
+            return price_data if 'error' in price_data else {'error': f"No price history available for {symbol}"}
+        return history
+    
     def get_technical_indicators(self, symbol, indicator='RSI'):
         """Get technical indicators"""
         params = {
@@ -91,32 +513,154 @@ class AlphaVantageDataFetcher:
         }
         return self._make_request(params)
     
-    def fetch_stock_data(self, input_value):
+    def refresh_listings(self):
+        """
+        Download the active listings into the local index, sharing the download with
+        other callers. Returns {'listings': count} or an error dictionary.
+        """
+        cache_key = self._get_cache_key(LISTING_STATUS_PARAMS)
+        
+        def download():
+            data = self._request_upstream(dict(LISTING_STATUS_PARAMS), store=False)
+            if not data.get('listings'):
+                return data if 'error' in data else {'error': 'Listing download was empty'}
+            self.listings.replace(data['listings'])
+            return {'listings': len(data['listings'])}
+        
+        def reloaded():
+            # Another process finished the download while this one waited
+            self.listings.load()
+            return None if self.listings.is_stale() else {'listings': self.listings.count()}
+        
+        with self._joining(cache_key):
+            return self.single_flight.do(cache_key, download, reloaded)
+    
+    def _listing_index(self):
+        """
+        Return the listing index, or None before the first download. A listing past its
+        refresh time is still used while a background download replaces it.
+        """
+        if self.listings.is_stale():
+            # Another process may have downloaded a newer listing
+            self.listings.load()
+            if self.listings.is_stale():
+                self._schedule_refresh(LISTING_STATUS_PARAMS, lane='background',
+                                       fetch=lambda _: self.refresh_listings())
+        return self.listings if self.listings.is_loaded() else None
+    
+    @staticmethod
+    def _looks_like_ticker(input_value):
+        """Heuristic check for ticker symbols versus company names"""
+        return len(input_value) <= 6 and input_value.replace('.', '').replace('-', '').isalpha()
+    
+    def _is_ticker_input(self, input_value):
+        """
+        Ticker-shaped input is looked up directly, unless the listing index knows no
+        such symbol is listed; it is then searched for as a company name instead
+        """
+        if not self._looks_like_ticker(input_value):
+            return False
+        listings = self._listing_index()
+        return listings is None or listings.might_be_listed(input_value.upper())
+    
+    def _listing_rejection(self, ticker_symbol):
+        """Return an error for a listed symbol the evaluator cannot score, or None"""
+        listings = self._listing_index()
+        listing = listings.lookup(ticker_symbol) if listings is not None else None
+        if listing is None or listing['asset_type'] in EVALUATED_ASSET_TYPES:
+            return None
+        return (f"{ticker_symbol} ({listing['name']}) is listed on {listing['exchange']} as an "
+                f"{listing['asset_type']}, which has no company fundamentals to evaluate.")
+    
+    @staticmethod
+    def _viable_matches(best_matches):
+        """Filter symbol search results down to the matches worth offering"""
+        # Filter for US/major exchanges and high match scores
+        viable_matches = []
+        for match in best_matches:
+            symbol = match.get('1. symbol', '')
+            name = match.get('2. name', '')
+            region = match.get('4. region', '')
+            match_score = float(match.get('9. matchScore', '0'))
+            
+            # Prioritize US stocks and high match scores
+            if region == 'United States' and match_score >= 0.5:
+                viable_matches.append({
+                    'symbol': symbol,
+                    'name': name,
+                    'region': region,
+                    'score': match_score
+                })
+        
+        if not viable_matches:
+            # Show all matches if no US matches found
+            for match in best_matches[:5]:
+                symbol = match.get('1. symbol', '')
+                name = match.get('2. name', '')
+                region = match.get('4. region', '')
+                match_score = float(match.get('9. matchScore', '0'))
+                
+                if match_score >= 0.3:
+                    viable_matches.append({
+                        'symbol': symbol,
+                        'name': name,
+                        'region': region,
+                        'score': match_score
+                    })
+        
+        return viable_matches
+    
+    def _select_search_match(self, search_results):
+        """Return the symbol of a single high-confidence US match, or None"""
+        viable_matches = self._viable_matches(search_results.get('bestMatches', []))
+        if len(viable_matches) == 1 and viable_matches[0]['region'] == 'United States' and viable_matches[0]['score'] >= 0.8:
+            return viable_matches[0]['symbol']
+        return None
+    
+    def plan_requests(self, input_value, view='evaluation', estimate_latency=True):
+        """Report the API calls and expected latency a lookup would need"""
+        return self.planner.plan(input_value, view, estimate_latency)
+    
+    def _fetch_price_data(self, ticker_symbol, view='evaluation'):
+        """Fetch the price data the planner chose for the view"""
+        price_params = self.planner.price_request(ticker_symbol, view)
+        if price_params['function'] == 'TIME_SERIES_DAILY':
+            return self.get_daily_prices(ticker_symbol)
+        return self._make_request(price_params)
+    
+    def _fetch_ticker(self, ticker_symbol, view='evaluation'):
+        """Fetch and evaluate one ticker symbol: its overview, then the price data the view needs"""
+        rejection = self._listing_rejection(ticker_symbol)
+        if rejection:
+            return {"error": rejection}
+        print(f"Fetching data for ticker {ticker_symbol} using Alpha Vantage...")
+        
+        overview_data = self.get_company_overview(ticker_symbol)
+        if 'error' in overview_data:
+            # Keep the cause, so callers can tell a spent quota from an unknown ticker
+            return {"error": f"Unable to fetch company data for {ticker_symbol}: {overview_data['error']}"}
+        if overview_data.get('Symbol') != ticker_symbol:
+            return {"error": f"No data found for ticker symbol '{ticker_symbol}'. For international stocks, try company name search or verify the correct ticker format."}
+        
+        price_data = self._fetch_price_data(ticker_symbol, view)
+        if 'error' in price_data:
+            return {"error": f"Unable to fetch price data for {ticker_symbol}: {price_data['error']}"}
+        
+        try:
+            return self._process_alpha_vantage_data(ticker_symbol, overview_data, price_data)
+        except Exception as e:
+            return {"error": f"Error processing data for {ticker_symbol}: {str(e)}"}
+    
+    def fetch_stock_data(self, input_value, view='evaluation'):
         """
         Fetch comprehensive stock data using Alpha Vantage API
         Handles both ticker symbols and company names
         """
         input_value = input_value.strip()
         
-        # Check if it's likely a ticker symbol (short and mostly uppercase)
-        if len(input_value) <= 6 and input_value.replace('.', '').replace('-', '').isalpha():
-            ticker_symbol = input_value.upper()
-            print(f"Fetching data for ticker {ticker_symbol} using Alpha Vantage...")
-            
-            # Try direct lookup first
-            overview_data = self.get_company_overview(ticker_symbol)
-            if 'error' not in overview_data and overview_data.get('Symbol') == ticker_symbol:
-                # Direct lookup successful
-                price_data = self.get_daily_prices(ticker_symbol)
-                if 'error' in price_data:
-                    return {"error": f"Unable to fetch price data for {ticker_symbol}: {price_data['error']}"}
-                
-                try:
-                    return self._process_alpha_vantage_data(ticker_symbol, overview_data, price_data)
-                except Exception as e:
-                    return {"error": f"Error processing data for {ticker_symbol}: {str(e)}"}
-            else:
-                return {"error": f"No data found for ticker symbol '{ticker_symbol}'. For international stocks, try company name search or verify the correct ticker format."}
+        # Check if it's likely a ticker symbol (short and mostly uppercase) that may be listed
+        if self._is_ticker_input(input_value):
+            return self._fetch_ticker(input_value.upper(), view)
         else:
             # Treat as company name - search for symbols
             print(f"Searching for company '{input_value}' using Alpha Vantage...")
@@ -129,47 +673,14 @@ class AlphaVantageDataFetcher:
             if not best_matches:
                 return {"error": f"No companies found matching '{input_value}'. Try using the exact ticker symbol instead."}
             
-            # Filter for US/major exchanges and high match scores
-            viable_matches = []
-            for match in best_matches:
-                symbol = match.get('1. symbol', '')
-                name = match.get('2. name', '')
-                region = match.get('4. region', '')
-                match_score = float(match.get('9. matchScore', '0'))
-                
-                # Prioritize US stocks and high match scores
-                if region == 'United States' and match_score >= 0.5:
-                    viable_matches.append({
-                        'symbol': symbol,
-                        'name': name,
-                        'region': region,
-                        'score': match_score
-                    })
-            
+            viable_matches = self._viable_matches(best_matches)
             if not viable_matches:
-                # Show all matches if no US matches found
-                viable_matches = []
-                for match in best_matches[:5]:
-                    symbol = match.get('1. symbol', '')
-                    name = match.get('2. name', '')
-                    region = match.get('4. region', '')
-                    match_score = float(match.get('9. matchScore', '0'))
-                    
-                    if match_score >= 0.3:
-                        viable_matches.append({
-                            'symbol': symbol,
-                            'name': name,
-                            'region': region,
-                            'score': match_score
-                        })
-                
-                if not viable_matches:
-                    return {"error": f"No suitable matches found for '{input_value}'. Please try a more specific company name or ticker symbol."}
+                return {"error": f"No suitable matches found for '{input_value}'. Please try a more specific company name or ticker symbol."}
             
             # If single high-confidence US match, fetch directly
-            if len(viable_matches) == 1 and viable_matches[0]['region'] == 'United States' and viable_matches[0]['score'] >= 0.8:
-                best_symbol = viable_matches[0]['symbol']
-                return self.fetch_stock_data(best_symbol)
+            best_symbol = self._select_search_match(search_results)
+            if best_symbol:
+                return self.fetch_stock_data(best_symbol, view)
             
             # Multiple matches - return for user selection
             match_dict = {}
@@ -179,6 +690,61 @@ class AlphaVantageDataFetcher:
             
             return {"company_matches": match_dict}
     
+    @staticmethod
+    def _reprice_overview(overview, price):
+        """
+        Return a copy of the overview with P/E, P/B, dividend yield and market cap
+        recomputed at the given price from its per-share figures. Fields whose
+        inputs are missing keep the overview's own value.
+        """
+        def number(field):
+            try:
+                return float(overview.get(field))
+            except (TypeError, ValueError):
+                return None
+        
+        repriced = dict(overview)
+        eps = number('EPS')
+        if eps is not None:
+            # A P/E is not meaningful without positive earnings
+            repriced['PERatio'] = price / eps if eps > 0 else None
+        book_value = number('BookValue')
+        if book_value is not None and book_value > 0:
+            repriced['PriceToBookRatio'] = price / book_value
+        dividend = number('DividendPerShare')
+        if dividend is not None:
+            repriced['DividendYield'] = dividend / price
+        shares = number('SharesOutstanding')
+        if shares is not None and shares > 0:
+            repriced['MarketCapitalization'] = price * shares
+        return repriced
+    
+    def _fifty_two_week_range(self, ticker_symbol, overview, price, quote=None):
+        """
+        Return the 52-week (high, low). Recent stored daily history gives the range;
+        without it, the overview's range, which is as old as the overview, is widened
+        to take in the quote's day range and the current price.
+        """
+        today = np.datetime64(datetime.now().date(), 'D')
+        latest = self.price_store.latest_date(ticker_symbol)
+        if latest is not None and today - latest <= np.timedelta64(RANGE_HISTORY_MAX_AGE.days, 'D'):
+            history = self.price_store.read(ticker_symbol, start=today - np.timedelta64(365, 'D'))
+            if history is not None and len(history['date']):
+                return (max(float(history['high'].max()), price), min(float(history['low'].min()), price))
+        
+        def number(value):
+            try:
+                return float(value)
+            except (TypeError, ValueError):
+                return None
+        
+        quote = quote or {}
+        highs = [value for value in (number(overview.get('52WeekHigh')), number(quote.get('03. high')), price)
+                 if value]
+        lows = [value for value in (number(overview.get('52WeekLow')), number(quote.get('04. low')), price)
+                if value]
+        return max(highs), min(lows)
+    
     def _process_alpha_vantage_data(self, ticker_symbol, overview, price_data):
         """Process Alpha Vantage data into our standard format"""
         try:
@@ -190,28 +756,40 @@ class AlphaVantageDataFetcher:
             if sector:
                 sector = sector.title()  # Convert "TECHNOLOGY" to "Technology"
             
-            # Current price and 52-week range
+            # Current price
             current_price = float(overview.get('Price', 0)) if overview.get('Price') else None
-            fifty_two_week_high = float(overview.get('52WeekHigh', 0)) if overview.get('52WeekHigh') else None
-            fifty_two_week_low = float(overview.get('52WeekLow', 0)) if overview.get('52WeekLow') else None
-            
-            # Process daily price data for technical analysis
-            time_series = price_data.get('Time Series (Daily)', {})
-            if not time_series:
-                return {"error": f"No price history available for {ticker_symbol}"}
-            
-            # Convert to DataFrame for analysis
-            df = pd.DataFrame.from_dict(time_series, orient='index')
-            df.columns = ['Open', 'High', 'Low', 'Close', 'Volume']
-            df.index = pd.to_datetime(df.index)
-            df = df.astype(float).sort_index()
             
-            if df.empty:
-                return {"error": f"No valid price data for {ticker_symbol}"}
+            # The quote is current; the overview may be weeks old. Use the latest daily bar
+            # if the overview has no price.
+            quote = price_data.get('Global Quote')
+            if quote:
+                if quote.get('05. price'):
+                    current_price = float(quote['05. price'])
+            elif 'bars' in price_data or 'Time Series (Daily)' in price_data:
+                bars = price_data.get('bars')
+                if bars is None:
+                    time_series = price_data.get('Time Series (Daily)', {})
+                    if not time_series:
+                        return {"error": f"No price history available for {ticker_symbol}"}
+                    
+                    # Decode straight into sorted NumPy columns
+                    bars = decode_daily_series(time_series)
+                
+                if len(bars['close']) == 0:
+                    return {"error": f"No valid price data for {ticker_symbol}"}
+                
+                if not current_price:
+                    current_price = float(bars['close'][-1])
             
-            # Get current price from latest data if not available in overview
             if not current_price:
-                current_price = df['Close'].iloc[-1]
+                return {"error": f"No price data available for {ticker_symbol}"}
+            
+            # Price-driven ratios follow the current price, not the cached overview's
+            overview = self._reprice_overview(overview, current_price)
+            # So does the 52-week range, which the overview only updates at its next refresh
+            fifty_two_week_high, fifty_two_week_low = self._fifty_two_week_range(
+                ticker_symbol, overview, current_price, quote
+            )
             
             # Initialize parameters dictionary for refined 10-parameter system
             parameters = {}
@@ -329,7 +907,9 @@ class AlphaVantageDataFetcher:
                 'fifty_two_week_low': fifty_two_week_low,
                 'parameters': parameters,
                 'data_confidence': data_confidence,
-                'currency': 'USD'  # Alpha Vantage primarily provides USD data
+                'currency': 'USD',  # Alpha Vantage primarily provides USD data
+                # Served from an expired cache entry while a refresh runs in the background
+                'data_stale': bool(overview.get('_stale') or price_data.get('_stale'))
             }
             
         except Exception as e:
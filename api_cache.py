@@ -4,87 +4,304 @@ Handles Yahoo Finance API rate limits and caches responses
 """
 
 import time
-import json
 import os
 from datetime import datetime, timedelta
 import hashlib
+import threading
+from collections import OrderedDict
+from rate_limiter import create_rate_limiter
+from resp_client import shared_client
+from cache_backends import FileCacheBackend, SQLiteCacheBackend, RedisCacheBackend, DEFAULT_MAX_BYTES
+from cache_stats import CacheStats, summarize, to_json, to_prometheus
+from cache_serializers import entry_type
+from cache_snapshot import export_snapshot, import_snapshot
+from market_calendar import market_hours_ttl
+
+# Bump to invalidate every existing cache entry after a change to the cached data format
+CACHE_KEY_VERSION = 1
+
+class MemoryCacheTier:
+    """
+    Bounded, process-local LRU of cache entries kept in front of the storage backend.
+    Entries leave after their own TTL even if the record itself is still valid, so
+    changes written by other processes are picked up within ttl_seconds.
+    Cached data is shared between callers and must be treated as read-only.
+    """
+    
+    def __init__(self, max_entries=512, ttl_seconds=300):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+    
+    def get(self, cache_key):
+        """Return a still-valid entry, or None"""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(cache_key)
+            if entry is not None:
+                value, expires_at = entry
+                if now < expires_at:
+                    self._entries.move_to_end(cache_key)
+                    self.hits += 1
+                    return value
+                del self._entries[cache_key]
+            self.misses += 1
+            return None
+    
+    def set(self, cache_key, entry, entry_expires_at):
+        """Promote an entry into memory; the least recently used entry is demoted when full"""
+        expires_at = min(entry_expires_at, time.time() + self.ttl_seconds)
+        with self._lock:
+            self._entries[cache_key] = (entry, expires_at)
+            self._entries.move_to_end(cache_key)
+            while len(self._entries) > self.max_entries:
+                # Every entry is also in the backend, so demotion is just dropping the memory copy
+                self._entries.popitem(last=False)
+                self.evictions += 1
+    
+    def delete(self, cache_key):
+        with self._lock:
+            self._entries.pop(cache_key, None)
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+    
+    def __len__(self):
+        return len(self._entries)
 
 class APICache:
-    def __init__(self, cache_dir="cache", cache_duration_minutes=30):
+    def __init__(self, cache_dir="cache", cache_duration_minutes=30, key_version=CACHE_KEY_VERSION,
+                 backend=None, max_bytes=DEFAULT_MAX_BYTES, memory_max_entries=512, memory_ttl_seconds=300,
+                 ttl_policy=market_hours_ttl):
         self.cache_dir = cache_dir
         self.cache_duration = timedelta(minutes=cache_duration_minutes)
-        self.last_request_time = 0
+        # Default expiry follows the ticker's market hours; None keeps a flat cache_duration
+        self.ttl_policy = ttl_policy
+        self.key_version = key_version
         self.min_request_interval = 1.5  # Minimum seconds between requests
+        self.rate_limiter = create_rate_limiter('yfinance', rate=1, per=self.min_request_interval)
         
         # Create cache directory if it doesn't exist
         if not os.path.exists(cache_dir):
             os.makedirs(cache_dir)
+        
+        # Storage backend: 'sqlite', 'file', 'redis' (the default when REDIS_URL is set), or a backend instance
+        backend = backend or os.getenv('API_CACHE_BACKEND') or ('redis' if os.getenv('REDIS_URL') else 'sqlite')
+        if backend == 'sqlite':
+            self.backend = SQLiteCacheBackend(os.path.join(cache_dir, 'api_cache.db'), max_bytes=max_bytes)
+        elif backend == 'file':
+            self.backend = FileCacheBackend(cache_dir)
+        elif backend == 'redis':
+            self.backend = RedisCacheBackend(shared_client())
+        else:
+            self.backend = backend
+        
+        # Process-local L1 tier so repeated reads skip disk I/O and JSON decoding
+        self.memory = MemoryCacheTier(max_entries=memory_max_entries, ttl_seconds=memory_ttl_seconds)
+        self.disk_hits = 0
+        self.disk_misses = 0
+        
+        # Per-endpoint hit, miss and latency counters for this process
+        self.stats = CacheStats()
     
     def _get_cache_key(self, ticker_symbol, data_type="stock_info"):
         """Generate a unique cache key for the ticker and data type"""
-        key_string = f"{ticker_symbol}_{data_type}"
+        key_string = f"v{self.key_version}_{ticker_symbol}_{data_type}"
         return hashlib.md5(key_string.encode()).hexdigest()
     
-    def _get_cache_file_path(self, cache_key):
-        """Get the full path to the cache file"""
-        return os.path.join(self.cache_dir, f"{cache_key}.json")
+    def _entry_window(self, record):
+        """Return (fresh_until, stale_until) timestamps for a stored record"""
+        if record.get('expires_at'):
+            fresh_until = datetime.fromisoformat(record['expires_at']).timestamp()
+        else:
+            fresh_until = (datetime.fromisoformat(record['timestamp']) + self.cache_duration).timestamp()
+        if record.get('stale_until'):
+            stale_until = max(fresh_until, datetime.fromisoformat(record['stale_until']).timestamp())
+        else:
+            stale_until = fresh_until
+        return fresh_until, stale_until
     
-    def get_cached_data(self, ticker_symbol, data_type="stock_info"):
-        """Retrieve cached data if it exists and is still valid"""
+    def get_cached_entry(self, ticker_symbol, data_type="stock_info", track=True):
+        """
+        Retrieve a cached entry that is fresh or still inside its stale window.
+        Returns {'data', 'is_stale', 'fresh_until', 'stale_until'} or None.
+        Pass track=False to look without counting the read in the statistics.
+        """
+        started = time.perf_counter()
         cache_key = self._get_cache_key(ticker_symbol, data_type)
-        cache_file = self._get_cache_file_path(cache_key)
-        
-        if not os.path.exists(cache_file):
-            return None
+        now = time.time()
+        tier = 'memory'
         
-        try:
-            with open(cache_file, 'r') as f:
-                cached_data = json.load(f)
-            
-            # Check if cache is still valid
-            cache_time = datetime.fromisoformat(cached_data['timestamp'])
-            if datetime.now() - cache_time < self.cache_duration:
+        entry = self.memory.get(cache_key)
+        if entry is None:
+            tier = 'disk'
+            try:
+                record = self.backend.get(cache_key)
+                if record is None:
+                    self.disk_misses += 1
+                    if track:
+                        self.stats.record_read(data_type, time.perf_counter() - started)
+                    return None
+                
+                fresh_until, stale_until = self._entry_window(record)
+                if now >= stale_until:
+                    # Past the stale window too, remove entry
+                    self.disk_misses += 1
+                    self.backend.delete(cache_key)
+                    if track:
+                        self.stats.record_read(data_type, time.perf_counter() - started, expired=True)
+                    return None
+                
+                self.disk_hits += 1
                 print(f"Using cached data for {ticker_symbol}")
-                return cached_data['data']
-            else:
-                # Cache expired, remove file
-                os.remove(cache_file)
+                entry = (record, fresh_until, stale_until)
+                self.memory.set(cache_key, entry, stale_until)
+            except Exception as e:
+                print(f"Error reading cache for {ticker_symbol}: {str(e)}")
                 return None
-                
-        except Exception as e:
-            print(f"Error reading cache for {ticker_symbol}: {str(e)}")
+        
+        record, fresh_until, stale_until = entry
+        is_stale = now >= fresh_until
+        if track:
+            self.stats.record_read(data_type, time.perf_counter() - started, tier=tier, stale=is_stale)
+        return {
+            'data': record['data'],
+            'is_stale': is_stale,
+            'fresh_until': datetime.fromtimestamp(fresh_until),
+            'stale_until': datetime.fromtimestamp(stale_until)
+        }
+    
+    def get_cached_data(self, ticker_symbol, data_type="stock_info"):
+        """Retrieve cached data if it exists and is still fresh"""
+        entry = self.get_cached_entry(ticker_symbol, data_type)
+        if entry is None or entry['is_stale']:
             return None
+        return entry['data']
     
-    def cache_data(self, ticker_symbol, data, data_type="stock_info"):
-        """Store data in cache with timestamp"""
+    def cache_data(self, ticker_symbol, data, data_type="stock_info", ttl=None, max_stale=None):
+        """
+        Store data in cache with timestamp.
+        ttl may be a timedelta or an absolute expiry datetime. By default entries
+        last cache_duration while the ticker's market is open and until the next
+        open while it is closed.
+        max_stale is how long past that expiry the entry may still be served as stale
+        while it is refreshed; by default expired entries are never served.
+        """
         cache_key = self._get_cache_key(ticker_symbol, data_type)
-        cache_file = self._get_cache_file_path(cache_key)
         
         try:
+            now = datetime.now()
+            if ttl is None and self.ttl_policy is not None:
+                expires_at = self.ttl_policy.quote_expiry(ticker_symbol, intraday=self.cache_duration)
+            elif ttl is None:
+                expires_at = now + self.cache_duration
+            elif isinstance(ttl, datetime):
+                expires_at = ttl
+            else:
+                expires_at = now + ttl
+            stale_until = expires_at + (max_stale or timedelta(0))
+            
             cached_data = {
-                'timestamp': datetime.now().isoformat(),
+                'timestamp': now.isoformat(),
+                'expires_at': expires_at.isoformat(),
+                'stale_until': stale_until.isoformat(),
                 'ticker': ticker_symbol,
                 'data_type': data_type,
                 'data': data
             }
             
-            with open(cache_file, 'w') as f:
-                json.dump(cached_data, f, default=str)
+            # Write through both tiers
+            self.backend.set(cache_key, cached_data)
+            self.memory.set(cache_key, (cached_data, expires_at.timestamp(), stale_until.timestamp()),
+                            stale_until.timestamp())
                 
         except Exception as e:
             print(f"Error caching data for {ticker_symbol}: {str(e)}")
     
+    def get_tier_stats(self):
+        """Return hit and miss counters for the memory and disk tiers"""
+        return {
+            'memory': {
+                'hits': self.memory.hits,
+                'misses': self.memory.misses,
+                'evictions': self.memory.evictions,
+                'entries': len(self.memory)
+            },
+            'disk': {
+                'hits': self.disk_hits,
+                'misses': self.disk_misses
+            }
+        }
+    
+    def get_encoding_stats(self):
+        """Return bytes saved by compression and average decode time per entry type"""
+        codec = getattr(self.backend, 'codec', None)
+        return codec.get_stats() if codec else {}
+    
+    def get_stats(self):
+        """
+        Return cache statistics: per-endpoint hits, misses, stale serves, read time,
+        stored bytes and estimated upstream seconds and API calls saved, plus totals
+        and tier, backend and encoding details.
+        """
+        endpoints = self.stats.snapshot()
+        # usage() scans the whole backend, so it is read once and the total derived from it
+        total_bytes = 0
+        for data_type, entries, size in self.backend.usage():
+            stats = endpoints.setdefault(entry_type(data_type), {})
+            stats['entries'] = stats.get('entries', 0) + entries
+            stats['bytes'] = stats.get('bytes', 0) + size
+            total_bytes += size
+        
+        tiers = self.get_tier_stats()
+        return {
+            'endpoints': endpoints,
+            'totals': summarize(endpoints),
+            'memory': tiers['memory'],
+            'disk': tiers['disk'],
+            'backend': {
+                'type': type(self.backend).__name__,
+                'bytes': total_bytes,
+                'evictions': getattr(self.backend, 'evictions', 0)
+            },
+            'encoding': self.get_encoding_stats()
+        }
+    
+    def get_stats_json(self, stats=None):
+        """Return get_stats(), or a report already taken from it, as a JSON document"""
+        return to_json(stats or self.get_stats())
+    
+    def get_stats_prometheus(self, stats=None):
+        """Return get_stats(), or a report already taken from it, in the Prometheus text exposition format"""
+        return to_prometheus(stats or self.get_stats())
+    
+    def export_snapshot(self, path, max_age=None, tickers=None, endpoints=None):
+        """Write live entries, optionally filtered by age, ticker and endpoint, to a bundle file"""
+        return export_snapshot(self, path, max_age=max_age, tickers=tickers, endpoints=endpoints)
+    
+    def import_snapshot(self, path):
+        """Merge a bundle file into this cache, keeping whichever copy of an entry is newer"""
+        return import_snapshot(self, path)
+    
     def enforce_rate_limit(self):
         """Enforce rate limiting between API calls"""
-        current_time = time.time()
-        time_since_last_request = current_time - self.last_request_time
-        
-        if time_since_last_request < self.min_request_interval:
-            sleep_time = self.min_request_interval - time_since_last_request
-            print(f"Rate limiting: waiting {sleep_time:.1f} seconds...")
-            time.sleep(sleep_time)
-        
-        self.last_request_time = time.time()
+        waited = self.rate_limiter.acquire()
+        if waited >= 0.1:
+            print(f"Rate limiting: waited {waited:.1f} seconds...")
 
 # Global cache instance
-api_cache = APICache()
\ No newline at end of file
+api_cache = APICache()
+
+# Warm-start a fresh node from a snapshot bundle, e.g. last night's export from another node
+_snapshot_path = os.getenv('API_CACHE_SNAPSHOT')
+if _snapshot_path and os.path.exists(_snapshot_path):
+    try:
+        _summary = api_cache.import_snapshot(_snapshot_path)
+        print(f"Loaded {_summary['imported']} cache entries from {_snapshot_path}")
+    except Exception as e:
+        print(f"Error loading cache snapshot {_snapshot_path}: {str(e)}")
\ No newline at end of file
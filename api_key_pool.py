@@ -0,0 +1,236 @@
+"""
+Alpha Vantage API Key Pool
+Spreads calls over several API keys, each with its own per-minute and per-day
+budget, so throughput grows with the number of keys
+"""
+
+import os
+import time
+import hashlib
+import threading
+from rate_limiter import (create_rate_limiter, create_daily_quota, RateLimitTimeout, LANES, DEFAULT_LANE,
+                          resolve_lane)
+
+# Requests per minute and per day for each Alpha Vantage plan. Premium plans have
+# no daily cap, so theirs is what the per-minute rate allows in a day.
+KEY_TIERS = {
+    'free': {'per_minute': 5, 'per_day': 25},
+    'premium-75': {'per_minute': 75, 'per_day': 75 * 1440},
+    'premium-150': {'per_minute': 150, 'per_day': 150 * 1440},
+    'premium-300': {'per_minute': 300, 'per_day': 300 * 1440},
+    'premium-600': {'per_minute': 600, 'per_day': 600 * 1440},
+    'premium-1200': {'per_minute': 1200, 'per_day': 1200 * 1440},
+}
+
+DEFAULT_TIER = 'free'
+
+# How long a key rests after a 'Note' or 'Information' call frequency reply
+NOTE_COOLDOWN_SECONDS = 60
+
+# The note text names both the minute and the day limit, so a key is treated as spent for
+# the day once this many notes arrive in a row, each after the previous rest ended, with
+# no successful call in between
+DAILY_NOTE_STREAK = 2
+
+
+class APIKey:
+    """One API key with its own token bucket, daily quota and health state"""
+
+    def __init__(self, key, tier=DEFAULT_TIER, per_minute=None, per_day=None):
+        if tier not in KEY_TIERS:
+            raise ValueError(f"Unknown Alpha Vantage tier '{tier}'. Expected one of: {', '.join(KEY_TIERS)}")
+        self.key = key
+        self.tier = tier
+        self.per_minute = per_minute or KEY_TIERS[tier]['per_minute']
+        self.per_day = per_day or KEY_TIERS[tier]['per_day']
+        # Shared limiter state is named by a digest so the key itself never reaches disk, Redis or logs
+        self.label = 'key-' + hashlib.sha256(key.encode()).hexdigest()[:8]
+
+        # Calls are spaced evenly at the tier's interval
+        self.rate_limiter = create_rate_limiter(f'alpha_vantage:{self.label}', rate=1, per=60.0 / self.per_minute)
+        self.daily_quota = create_daily_quota(f'alpha_vantage:{self.label}', limit=self.per_day)
+
+        self.invalid = False
+        self.exhausted_until = 0.0
+        self.calls = 0
+        self.notes = 0
+        self.note_streak = 0
+
+    def usable(self):
+        """True unless the key was rejected or is resting after a limit reply"""
+        return not self.invalid and time.time() >= self.exhausted_until
+
+    def mark_ok(self):
+        """A successful reply ends any run of limit notes"""
+        self.note_streak = 0
+
+    def mark_rate_limited(self):
+        """
+        Rest the key for a minute after a limit note. If the notes continue after
+        the rest, the key has hit its daily limit: the rest of today's quota is used
+        up, which every process sharing the quota then sees.
+
+        Notes answering calls that were already in flight when the rest began only
+        repeat the per-minute limit, so they do not count towards the daily streak.
+        """
+        now = time.time()
+        self.notes += 1
+        if now < self.exhausted_until:
+            return
+        self.note_streak += 1
+        if self.note_streak >= DAILY_NOTE_STREAK:
+            remaining = self.daily_quota.remaining()
+            if remaining:
+                self.daily_quota.try_consume(remaining)
+            # Another process may have spent a call in between, so the claim above failed:
+            # rest for the day only once the quota really reads empty
+            if self.daily_quota.remaining() == 0:
+                self.exhausted_until = now + self.daily_quota.seconds_until_reset()
+                return
+        self.exhausted_until = now + NOTE_COOLDOWN_SECONDS
+
+    def mark_invalid(self):
+        """Stop routing calls to a key the API rejected"""
+        self.invalid = True
+
+    def get_stats(self):
+        return {
+            'key': self.label,
+            'tier': self.tier,
+            'per_minute': self.per_minute,
+            'per_day': self.per_day,
+            'used_today': self.daily_quota.used(),
+            'remaining_today': self.daily_quota.remaining(),
+            'calls': self.calls,
+            'notes': self.notes,
+            'status': 'invalid' if self.invalid else ('resting' if not self.usable() else 'ok')
+        }
+
+
+class APIKeyPool:
+    """
+    Routes each call to the usable key with the most remaining capacity: the most
+    tokens available now, then the most calls left today. Keys that can answer at
+    once are tried first; only if none can does the caller wait, on the key whose
+    next token is closest.
+
+    The pool also reports its combined capacity through rate, per,
+    available_tokens(), limit and remaining(), like a single limiter and quota.
+    """
+
+    def __init__(self, keys):
+        self.keys = list(keys)
+        self.per = 60.0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls):
+        """
+        Build the pool from ALPHA_VANTAGE_API_KEYS, a comma-separated list of
+        key[:tier] entries, or else from the single ALPHA_VANTAGE_API_KEY with
+        ALPHA_VANTAGE_TIER and ALPHA_VANTAGE_DAILY_LIMIT.
+        """
+        entries = [entry.strip() for entry in os.getenv('ALPHA_VANTAGE_API_KEYS', '').split(',') if entry.strip()]
+        if entries:
+            keys = []
+            for entry in entries:
+                key, _, tier = entry.partition(':')
+                keys.append(APIKey(key.strip(), tier.strip() or DEFAULT_TIER))
+            return cls(keys)
+
+        key = os.getenv('ALPHA_VANTAGE_API_KEY') or ''
+        daily_limit = os.getenv('ALPHA_VANTAGE_DAILY_LIMIT')
+        return cls([APIKey(key, os.getenv('ALPHA_VANTAGE_TIER', DEFAULT_TIER),
+                           per_day=int(daily_limit) if daily_limit else None)])
+
+    def _candidates(self):
+        """Usable keys with calls left today, most capacity first"""
+        capacity = []
+        for key in self.keys:
+            if not key.usable():
+                continue
+            remaining = key.daily_quota.remaining()
+            if remaining > 0:
+                capacity.append((key.rate_limiter.available_tokens(), remaining, key))
+        capacity.sort(key=lambda entry: entry[:2], reverse=True)
+        return [key for _, _, key in capacity]
+
+    def _claim(self, key, started, lane):
+        if not key.daily_quota.try_consume(lane=resolve_lane(lane)):
+            # Another process took the key's last call of the day
+            return None
+        with self._lock:
+            key.calls += 1
+        return key, time.time() - started
+
+    def _resting_until(self):
+        """When the first valid key with calls left today comes back from a rest, or None if there is none"""
+        resting = [key.exhausted_until for key in self.keys
+                   if not key.invalid and key.daily_quota.remaining() > 0]
+        return min(resting) if resting else None
+
+    def acquire(self, lane=DEFAULT_LANE):
+        """
+        Reserve one call and return (key, seconds waited), or (None, 0.0) once every
+        valid key has used its daily budget. If the only keys with calls left are
+        resting after a limit note, the call waits for the first to come back.
+        The call waits, and is counted against the quota, in the given priority lane.
+        """
+        started = time.time()
+        while True:
+            candidates = self._candidates()
+            if not candidates:
+                resting_until = self._resting_until()
+                if resting_until is None:
+                    return None, 0.0
+                time.sleep(max(resting_until - time.time(), 0.0))
+                continue
+
+            for key in candidates:
+                try:
+                    key.rate_limiter.acquire(timeout=0, lane=lane)
+                except RateLimitTimeout:
+                    continue
+                claimed = self._claim(key, started, lane)
+                if claimed:
+                    return claimed
+
+            for key in candidates:
+                key.rate_limiter.acquire(lane=lane)
+                claimed = self._claim(key, started, lane)
+                if claimed:
+                    return claimed
+            # Other processes took the last calls of these keys; look again
+
+    @property
+    def rate(self):
+        """Calls per minute across the usable keys"""
+        return sum(key.per_minute for key in self.keys if key.usable()) or 1
+
+    def available_tokens(self):
+        return sum(key.rate_limiter.available_tokens() for key in self.keys if key.usable())
+
+    @property
+    def limit(self):
+        """Calls per day across every valid key"""
+        return sum(key.per_day for key in self.keys if not key.invalid)
+
+    def remaining(self):
+        """Calls left today across the valid keys, including any resting after a limit note"""
+        return sum(key.daily_quota.remaining() for key in self.keys if not key.invalid)
+
+    def used_by_lane(self):
+        """Calls made today in each lane, across every key"""
+        usage = dict.fromkeys(LANES, 0)
+        for key in self.keys:
+            for lane, used in key.daily_quota.used_by_lane().items():
+                usage[lane] += used
+        return usage
+
+    def queue_length(self, lane=None):
+        """Callers waiting for a token on any key, across lanes or in one"""
+        return sum(key.rate_limiter.queue_length(lane) for key in self.keys)
+
+    def get_stats(self):
+        """Budget, usage and health for each key"""
+        return [key.get_stats() for key in self.keys]
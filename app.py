@@ -3,12 +3,16 @@ import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 import numpy as np
+import time
 from alpha_vantage_fetcher import alpha_vantage_fetcher
 from investment_parameters import (
     get_sector_specific_weights, calculate_parameter_score,
     generate_investment_recommendation, get_parameter_thresholds
 )
 from utils import fetch_stock_news
+from batch_evaluator import BatchEvaluator
+from popularity import popularity
+from cache_warmer import start_nightly_warming
 from tabular_evaluator import (
     create_evaluation_table, display_company_header, 
     style_evaluation_table, create_parameter_chart, display_sector_insights
@@ -22,6 +26,9 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+# Refresh popular tickers overnight so the morning's first lookups hit the cache
+start_nightly_warming(alpha_vantage_fetcher)
+
 # Custom CSS for enhanced styling
 st.markdown("""
 <style>
@@ -84,6 +91,55 @@ st.sidebar.markdown("""
 - Note: Focus on US markets for best data coverage
 """)
 
+# Batch watchlist evaluation
+run_batch = False
+with st.sidebar.expander("📋 Batch Watchlist Evaluation"):
+    watchlist_input = st.text_area(
+        "Watchlist tickers",
+        placeholder="AAPL, MSFT, GOOGL",
+        help="Separate tickers with commas or new lines."
+    )
+    watchlist = [t for t in watchlist_input.replace(',', '\n').split('\n') if t.strip()]
+    
+    if watchlist:
+        batch_evaluator = BatchEvaluator(alpha_vantage_fetcher)
+        # Re-plan when the watchlist changes or the plan is a minute old, not on every rerun
+        plan_key = (tuple(watchlist), int(time.time() // 60))
+        if st.session_state.get('watchlist_plan_key') != plan_key:
+            st.session_state.watchlist_plan = batch_evaluator.plan(watchlist)
+            st.session_state.watchlist_plan_key = plan_key
+        job_plan = st.session_state.watchlist_plan
+        st.caption(
+            f"{len(job_plan['scheduled'])} of {len(job_plan['tickers'])} tickers fit today's quota "
+            f"({job_plan['planned_calls']} API calls, about {job_plan['estimated_seconds'] / 60:.0f} min, "
+            f"finishing around {job_plan['estimated_completion'].strftime('%H:%M')})."
+        )
+        if job_plan['deferred']:
+            st.caption(f"{len(job_plan['deferred'])} tickers will be deferred until the quota resets.")
+        run_batch = st.button("Evaluate Watchlist")
+
+if run_batch:
+    st.header("📋 Watchlist Evaluation")
+    batch_progress = st.progress(0.0)
+    batch_status = st.empty()
+    
+    def update_batch_progress(completed, total, ticker, eta_seconds):
+        batch_progress.progress(completed / total)
+        batch_status.write(f"Evaluated {ticker} ({completed}/{total}) - about {eta_seconds / 60:.1f} min remaining")
+    
+    st.session_state.batch_results = batch_evaluator.run(watchlist, progress_callback=update_batch_progress)
+    batch_status.write("Watchlist evaluation complete.")
+
+if 'batch_results' in st.session_state:
+    with st.expander("📋 Latest Watchlist Results", expanded=run_batch):
+        st.dataframe(st.session_state.batch_results, use_container_width=True)
+        st.download_button(
+            "Download Results (CSV)",
+            st.session_state.batch_results.to_csv(index=False),
+            file_name="watchlist_evaluation.csv",
+            mime="text/csv"
+        )
+
 if search_input:
     with st.spinner(f"Fetching data for {search_input}..."):
         stock_data = alpha_vantage_fetcher.fetch_stock_data(search_input)
@@ -127,12 +183,20 @@ if search_input:
             st.json(stock_data)  # Show the actual data structure
             st.stop()
         
+        # Count each ticker once per lookup, not on every rerun of the page
+        if st.session_state.get('last_counted_ticker') != ticker:
+            popularity.record(ticker)
+            st.session_state.last_counted_ticker = ticker
+        
         # Create comprehensive evaluation table
         evaluation_df, nineteen_h_score, total_weighted, total_possible = create_evaluation_table(stock_data)
         
         # Display company header with 19H score
         display_company_header(stock_data, nineteen_h_score)
         
+        if stock_data.get('data_stale'):
+            st.info("Showing the last saved data for this company. Fresh figures are being fetched in the background.")
+        
         st.markdown("---")
         
         # Main evaluation table
@@ -397,6 +461,12 @@ if ticker and fetch_button:
             # Store in session state
             st.session_state.evaluated_shares.append(evaluation_result)
             
+            # Count each ticker once per lookup, not on every rerun of the page
+            counted_ticker = stock_data.get('ticker', search_input)
+            if st.session_state.get('last_counted_ticker') != counted_ticker:
+                popularity.record(counted_ticker)
+                st.session_state.last_counted_ticker = counted_ticker
+            
             # Display the results
             st.success(f"Evaluation Complete: {stock_data['name']} ({search_input})")
             
@@ -813,3 +883,57 @@ if ticker and fetch_button:
               - Japanese stocks: Add .T (e.g., 7203.T for Toyota)
               - Hong Kong stocks: Add .HK (e.g., 0700.HK for Tencent)
             """)
+
+# Cache diagnostics, rendered last so the numbers include this run's lookups
+with st.sidebar.expander("🩺 Cache Diagnostics"):
+    cache_stats = alpha_vantage_fetcher.cache.get_stats()
+    cache_totals = cache_stats['totals']
+    
+    diag_col1, diag_col2 = st.columns(2)
+    diag_col1.metric("Hit Rate", f"{cache_totals['hit_rate']:.0%}")
+    diag_col2.metric("API Calls Saved", cache_totals['quota_saved'])
+    diag_col1.metric("Time Saved", f"{cache_totals['upstream_seconds_saved']:.0f}s")
+    diag_col2.metric("Disk Used", f"{cache_stats['backend']['bytes'] / (1024 * 1024):.1f} MB")
+    st.caption(
+        f"{cache_totals['stale_serves']} stale serves, {cache_totals['misses']} misses, "
+        f"{cache_stats['backend']['evictions'] + cache_stats['memory']['evictions']} evictions"
+    )
+    
+    if cache_stats['endpoints']:
+        endpoint_table = pd.DataFrame([
+            {
+                'Endpoint': endpoint,
+                'Hits': values.get('hits', 0),
+                'Stale': values.get('stale_serves', 0),
+                'Misses': values.get('misses', 0),
+                'Avg Read (ms)': round(values.get('avg_read_seconds', 0.0) * 1000, 2),
+                'Entries': values.get('entries', 0),
+                'KB': round(values.get('bytes', 0) / 1024, 1)
+            }
+            for endpoint, values in sorted(cache_stats['endpoints'].items())
+        ])
+        st.dataframe(endpoint_table, use_container_width=True, hide_index=True)
+    
+    lane_stats = alpha_vantage_fetcher.get_lane_stats()
+    st.caption("API calls today by lane: " + ", ".join(
+        f"{lane} {values['calls_today']}" + (f" ({values['waiting']} waiting)" if values['waiting'] else "")
+        for lane, values in lane_stats.items()
+    ))
+    
+    key_stats = alpha_vantage_fetcher.get_key_pool_stats()
+    if len(key_stats) > 1:
+        st.dataframe(pd.DataFrame([
+            {
+                'API Key': key['key'],
+                'Tier': key['tier'],
+                'Used Today': key['used_today'],
+                'Left Today': key['remaining_today'],
+                'Status': key['status']
+            }
+            for key in key_stats
+        ]), use_container_width=True, hide_index=True)
+    
+    st.download_button("Stats (JSON)", alpha_vantage_fetcher.cache.get_stats_json(cache_stats),
+                       file_name="cache_stats.json", mime="application/json")
+    st.download_button("Stats (Prometheus)", alpha_vantage_fetcher.cache.get_stats_prometheus(cache_stats),
+                       file_name="cache_stats.prom", mime="text/plain")
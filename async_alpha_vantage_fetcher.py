@@ -0,0 +1,88 @@
+"""
+Async Alpha Vantage Data Fetcher
+Concurrent batch fetching on top of the shared AlphaVantageDataFetcher
+"""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from alpha_vantage_fetcher import alpha_vantage_fetcher
+
+
+class AsyncAlphaVantageDataFetcher:
+    """
+    Coroutine interface to Alpha Vantage.
+
+    Requests run on a dedicated I/O thread pool through the wrapped fetcher, so they
+    share its connection pool and token-bucket rate limiter, in the priority lane
+    of the code awaiting them.
+    """
+
+    def __init__(self, fetcher=None, max_concurrency=None):
+        self.fetcher = fetcher or alpha_vantage_fetcher
+        self.max_concurrency = max_concurrency or self.fetcher.session.pool_size
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.max_concurrency,
+            thread_name_prefix='alpha-vantage-io'
+        )
+
+    async def _call(self, method, *args):
+        """Run one blocking fetcher call on the I/O pool"""
+        loop = asyncio.get_running_loop()
+        # The lane is per thread, so carry the caller's over to the pool thread
+        lane = self.fetcher._current_lane()
+
+        def run():
+            with self.fetcher.lane(lane):
+                return method(*args)
+
+        return await loop.run_in_executor(self._executor, run)
+
+    async def get_company_overview(self, symbol):
+        """Get fundamental company data"""
+        return await self._call(self.fetcher.get_company_overview, symbol)
+
+    async def get_daily_prices(self, symbol):
+        """Get daily price data"""
+        return await self._call(self.fetcher.get_daily_prices, symbol)
+
+    async def get_technical_indicators(self, symbol, indicator='RSI'):
+        """Get technical indicators"""
+        return await self._call(self.fetcher.get_technical_indicators, symbol, indicator)
+
+    async def search_symbol(self, query):
+        """Search for stock symbols using company name"""
+        return await self._call(self.fetcher.search_symbol, query)
+
+    async def fetch_stock_data(self, input_value, view='evaluation'):
+        """
+        Fetch comprehensive stock data for one ticker or company name.
+        Returns the same dictionary as AlphaVantageDataFetcher.fetch_stock_data.
+        """
+        input_value = input_value.strip()
+
+        if not self.fetcher._is_ticker_input(input_value):
+            # Company name searches may recurse into a ticker lookup, keep them on the sync path
+            return await self._call(self.fetcher.fetch_stock_data, input_value, view)
+        return await self._call(self.fetcher._fetch_ticker, input_value.upper(), view)
+
+    async def fetch_many(self, tickers, view='evaluation'):
+        """
+        Fetch several tickers concurrently within the shared rate budget.
+        Returns a dictionary mapping each input to its fetch_stock_data result.
+        """
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def fetch_one(ticker):
+            async with semaphore:
+                try:
+                    return await self.fetch_stock_data(ticker, view)
+                except Exception as e:
+                    return {"error": f"Error fetching {ticker}: {str(e)}"}
+
+        unique_tickers = list(dict.fromkeys(tickers))
+        results = await asyncio.gather(*(fetch_one(ticker) for ticker in unique_tickers))
+        return dict(zip(unique_tickers, results))
+
+    def close(self):
+        """Shut down the I/O thread pool"""
+        self._executor.shutdown(wait=False)
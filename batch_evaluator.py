@@ -0,0 +1,150 @@
+"""
+19th Hole Investment Club - Batch Watchlist Evaluator
+Evaluates a whole watchlist against the Alpha Vantage per-minute and daily quotas
+"""
+
+import math
+import time
+from datetime import datetime, timedelta
+import pandas as pd
+from alpha_vantage_fetcher import alpha_vantage_fetcher
+from tabular_evaluator import create_evaluation_table
+
+# Only a spent daily quota stops the batch; a per-minute limit note is retried once the key has rested
+DAILY_QUOTA_ERROR = 'Daily API call limit'
+FREQUENCY_LIMIT_ERROR = 'frequency limit'
+FREQUENCY_RETRIES = 2
+
+
+class BatchEvaluator:
+    def __init__(self, fetcher=None):
+        self.fetcher = fetcher or alpha_vantage_fetcher
+
+    def _seconds_per_call(self):
+        """Steady-state spacing between calls allowed by every API key together"""
+        key_pool = self.fetcher.key_pool
+        return key_pool.per / key_pool.rate
+
+    def plan(self, tickers):
+        """
+        Plan the API calls for a watchlist without making any of them.
+        Tickers that do not fit in today's remaining quota are deferred.
+        """
+        tickers = [t.strip().upper() for t in tickers if t and t.strip()]
+        tickers = list(dict.fromkeys(tickers))
+
+        daily_limit = self.fetcher.key_pool.limit
+        remaining_calls = self.fetcher.key_pool.remaining()
+
+        # Cached endpoints cost nothing, so ask the planner what each ticker really needs
+        scheduled = []
+        deferred = []
+        planned_calls = 0
+        total_calls = 0
+        for ticker in tickers:
+            calls = self.fetcher.plan_requests(ticker, estimate_latency=False)['max_api_calls']
+            total_calls += calls
+            if not deferred and planned_calls + calls <= remaining_calls:
+                scheduled.append(ticker)
+                planned_calls += calls
+            else:
+                deferred.append(ticker)
+
+        estimated_seconds = planned_calls * self._seconds_per_call()
+
+        return {
+            'tickers': tickers,
+            'scheduled': scheduled,
+            'deferred': deferred,
+            'planned_calls': planned_calls,
+            'remaining_daily_calls': remaining_calls,
+            'estimated_seconds': estimated_seconds,
+            'estimated_completion': datetime.now() + timedelta(seconds=estimated_seconds),
+            'days_required': math.ceil(total_calls / daily_limit) if daily_limit else None
+        }
+
+    def _evaluate_ticker(self, ticker):
+        """Fetch and score a single ticker, returning one result row"""
+        stock_data = self.fetcher.fetch_stock_data(ticker)
+
+        if not stock_data or 'error' in stock_data:
+            error = stock_data.get('error', 'No data received') if stock_data else 'No data received'
+            return {'Ticker': ticker, 'Status': 'Error', 'Error': error}
+
+        evaluation_df, nineteen_h_score, total_weighted, total_possible = create_evaluation_table(stock_data)
+
+        row = {
+            'Ticker': stock_data.get('ticker', ticker),
+            'Name': stock_data.get('name'),
+            'Sector': stock_data.get('sector'),
+            'Current Price': stock_data.get('current_price'),
+            '19H Score': round(nineteen_h_score, 1),
+            'Total Weighted': round(total_weighted, 1),
+            'Max Possible': round(total_possible, 1),
+            'Status': 'Evaluated',
+            'Error': None
+        }
+        for _, param_row in evaluation_df.iterrows():
+            row[param_row['Parameter']] = float(param_row['Performance (e)'])
+        return row
+
+    def _evaluate_in_lane(self, ticker, lane):
+        """
+        Evaluate a ticker with its calls in the given lane. A per-minute limit note is
+        retried, as the key pool waits out the key's rest; if it persists, the error
+        is recorded for this ticker only.
+        """
+        for attempt in range(FREQUENCY_RETRIES + 1):
+            try:
+                with self.fetcher.lane(lane):
+                    row = self._evaluate_ticker(ticker)
+            except Exception as e:
+                return {'Ticker': ticker, 'Status': 'Error', 'Error': f"Error evaluating {ticker}: {str(e)}"}
+            if row['Status'] != 'Error' or FREQUENCY_LIMIT_ERROR not in row['Error']:
+                return row
+        return row
+
+    def run(self, tickers, progress_callback=None, lane='background'):
+        """
+        Evaluate every ticker in the watchlist and return one combined DataFrame.
+
+        progress_callback(completed, total, ticker, eta_seconds) is called after each
+        ticker. If the quota runs out part way through, the remaining tickers are
+        returned with a 'Deferred' status so the job can be resumed later.
+        API calls wait in the given priority lane, so page loads go first.
+        """
+        job_plan = self.plan(tickers)
+        scheduled = job_plan['scheduled']
+        total = len(job_plan['tickers'])
+        rows = []
+        started = time.time()
+        quota_exhausted = False
+
+        for index, ticker in enumerate(scheduled):
+            if quota_exhausted:
+                row = {'Ticker': ticker, 'Status': 'Deferred', 'Error': 'API quota exhausted'}
+            else:
+                row = self._evaluate_in_lane(ticker, lane)
+                if row['Status'] == 'Error' and DAILY_QUOTA_ERROR in row['Error']:
+                    quota_exhausted = True
+                    row = {'Ticker': ticker, 'Status': 'Deferred', 'Error': 'API quota exhausted'}
+            rows.append(row)
+
+            completed = index + 1
+            if progress_callback:
+                elapsed = time.time() - started
+                eta_seconds = 0 if quota_exhausted else elapsed / completed * (len(scheduled) - completed)
+                progress_callback(completed, total, ticker, eta_seconds)
+
+        for ticker in job_plan['deferred']:
+            rows.append({'Ticker': ticker, 'Status': 'Deferred', 'Error': 'Daily API quota exhausted'})
+
+        results_df = pd.DataFrame(rows)
+        if '19H Score' in results_df.columns:
+            results_df = results_df.sort_values('19H Score', ascending=False, na_position='last')
+        return results_df.reset_index(drop=True)
+
+
+def evaluate_watchlist(tickers, progress_callback=None, fetcher=None):
+    """Convenience wrapper to evaluate a watchlist with the shared fetcher"""
+    return BatchEvaluator(fetcher).run(tickers, progress_callback=progress_callback)
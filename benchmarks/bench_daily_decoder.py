@@ -0,0 +1,139 @@
+"""
+Daily Series Decoder Benchmark
+Compares decode_daily_series with the previous DataFrame parsing path, and the
+peak memory of streaming parsing against decoding the whole response body
+
+Usage:
+    python benchmarks/bench_daily_decoder.py [payload.json] [--repeat N]
+
+payload.json should be a recorded TIME_SERIES_DAILY response with outputsize=full.
+Without one, a synthetic 25-year payload in the same format is generated.
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tracemalloc
+from datetime import date, timedelta
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from price_decoder import decode_daily_series, DailySeriesStreamParser
+
+
+def synthetic_payload(bars=6500):
+    """Build a newest-first full-history payload shaped like Alpha Vantage's"""
+    random.seed(19)
+    series = {}
+    day = date.today()
+    price = 150.0
+    while len(series) < bars:
+        if day.weekday() < 5:
+            price *= 1 + random.gauss(0, 0.015)
+            series[day.isoformat()] = {
+                '1. open': f"{price * 0.995:.4f}",
+                '2. high': f"{price * 1.01:.4f}",
+                '3. low': f"{price * 0.99:.4f}",
+                '4. close': f"{price:.4f}",
+                '5. volume': str(random.randint(100000, 90000000))
+            }
+        day -= timedelta(days=1)
+    # Round-trip through JSON so the strings look exactly like a parsed response
+    return json.loads(json.dumps({'Meta Data': {}, 'Time Series (Daily)': series}))
+
+
+def dataframe_path(time_series):
+    """The parsing path _process_alpha_vantage_data used before the decoder"""
+    df = pd.DataFrame.from_dict(time_series, orient='index')
+    df.columns = ['Open', 'High', 'Low', 'Close', 'Volume']
+    df.index = pd.to_datetime(df.index)
+    return df.astype(float).sort_index()
+
+
+def measure(func, time_series, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(time_series)
+        timings.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    func(time_series)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return min(timings), sorted(timings)[len(timings) // 2], peak
+
+
+def whole_body_path(body):
+    """json.loads the full body first, as response.json() does"""
+    return decode_daily_series(json.loads(body)['Time Series (Daily)'])
+
+
+def streaming_path(body, chunk_size=64 * 1024):
+    parser = DailySeriesStreamParser()
+    view = memoryview(body)
+    for start in range(0, len(body), chunk_size):
+        parser.feed(view[start:start + chunk_size])
+    return parser.close()['bars']
+
+
+def peak_memory(func, body):
+    tracemalloc.start()
+    func(body)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('payload', nargs='?', help='Recorded TIME_SERIES_DAILY JSON response')
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    if args.payload:
+        with open(args.payload, 'r') as f:
+            payload = json.load(f)
+        source = args.payload
+    else:
+        payload = synthetic_payload()
+        source = 'synthetic'
+
+    time_series = payload['Time Series (Daily)']
+    print(f"Payload: {source} ({len(time_series)} bars)")
+
+    # Both paths must agree before their speed is worth comparing
+    df = dataframe_path(time_series)
+    columns = decode_daily_series(time_series)
+    assert np.array_equal(df['Close'].to_numpy(), columns['close'])
+    assert np.array_equal(df.index.values.astype('datetime64[D]').astype(np.int32), columns['date'])
+
+    results = {
+        'DataFrame path': measure(dataframe_path, time_series, args.repeat),
+        'decode_daily_series': measure(decode_daily_series, time_series, args.repeat),
+    }
+
+    print(f"{'Method':<22}{'best ms':>10}{'median ms':>12}{'peak KiB':>12}")
+    for name, (best, median, peak) in results.items():
+        print(f"{name:<22}{best * 1000:>10.2f}{median * 1000:>12.2f}{peak / 1024:>12.0f}")
+
+    baseline = results['DataFrame path'][1]
+    decoder = results['decode_daily_series'][1]
+    print(f"Speedup (median): {baseline / decoder:.1f}x")
+
+    print()
+    print(f"{'Bars':>6}{'body KiB':>10}{'whole-body peak KiB':>22}{'streaming peak KiB':>21}")
+    for bars in (500, 2000, 6500):
+        body = json.dumps(synthetic_payload(bars), indent=4).encode()
+        # Streamed bytes would never be resident all at once, so the body itself is not counted
+        whole = peak_memory(whole_body_path, body)
+        streamed = peak_memory(streaming_path, body)
+        print(f"{bars:>6}{len(body) / 1024:>10.0f}{whole / 1024:>22.0f}{streamed / 1024:>21.0f}")
+
+
+if __name__ == '__main__':
+    main()
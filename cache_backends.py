@@ -0,0 +1,404 @@
+"""
+API Cache Storage Backends
+Where APICache keeps its entries: one file per key, an SQLite database, or a
+Redis-compatible server shared by every replica
+"""
+
+import os
+import json
+import time
+import sqlite3
+import tempfile
+import threading
+from datetime import datetime
+from cache_serializers import PayloadCodec
+from resp_client import RESPClient
+
+# Default byte budget for the SQLite backend before least-recently-used entries are evicted
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+# Evict down to this fraction of the budget so every write near the limit doesn't evict
+EVICTION_TARGET = 0.9
+
+# Leading bytes of a Redis entry read to find its header line
+REDIS_HEADER_BYTES = 4096
+
+
+class CacheBackend:
+    """
+    Storage interface used by APICache. A record is a dictionary with 'timestamp',
+    'expires_at' and 'stale_until' (ISO datetimes), 'ticker', 'data_type' and 'data'.
+    Backends may drop a record once its stale window has passed.
+    """
+
+    codec = None
+    evictions = 0
+
+    def get(self, cache_key):
+        """Return the stored record for a key, or None"""
+        raise NotImplementedError
+
+    def set(self, cache_key, record):
+        """Store a record, replacing any existing one"""
+        raise NotImplementedError
+
+    def delete(self, cache_key):
+        raise NotImplementedError
+
+    def iter_records(self):
+        """Yield (cache_key, record) for every stored entry"""
+        raise NotImplementedError
+
+    def usage(self):
+        """Return (data_type, entries, bytes) for every data type stored"""
+        raise NotImplementedError
+
+    def size_bytes(self):
+        """Return the total bytes stored"""
+        raise NotImplementedError
+
+    def _pack(self, record):
+        """Encode a record as a JSON header line followed by the encoded payload"""
+        payload, encoding = self.codec.encode(record['data'], record.get('data_type'))
+        header = {name: value for name, value in record.items() if name != 'data'}
+        header['encoding'] = encoding
+        return json.dumps(header).encode('utf-8') + b'\n' + payload
+
+    def _unpack(self, blob):
+        """Reverse _pack()"""
+        header, _, payload = blob.partition(b'\n')
+        record = json.loads(header)
+        record['data'] = self.codec.decode(payload, record.pop('encoding'), record.get('data_type'))
+        return record
+
+
+class FileCacheBackend(CacheBackend):
+    """
+    One file per cache key in a flat directory: a JSON header line with the
+    record's metadata and encoding, followed by the encoded payload bytes.
+    """
+
+    def __init__(self, cache_dir="cache", codec=None):
+        self.cache_dir = cache_dir
+        self.codec = codec or PayloadCodec()
+        if not os.path.exists(cache_dir):
+            os.makedirs(cache_dir)
+
+    def _get_cache_file_path(self, cache_key):
+        """Get the full path to the cache file"""
+        return os.path.join(self.cache_dir, f"{cache_key}.cache")
+
+    def get(self, cache_key):
+        """Return the stored record for a key, or None"""
+        cache_file = self._get_cache_file_path(cache_key)
+        if not os.path.exists(cache_file):
+            return None
+        with open(cache_file, 'rb') as f:
+            return self._unpack(f.read())
+
+    def set(self, cache_key, record):
+        """Write a record atomically so readers never see a truncated file"""
+        blob = self._pack(record)
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(blob)
+            os.replace(tmp_path, self._get_cache_file_path(cache_key))
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def delete(self, cache_key):
+        cache_file = self._get_cache_file_path(cache_key)
+        if os.path.exists(cache_file):
+            os.remove(cache_file)
+
+    def iter_records(self):
+        """Yield (cache_key, record) for every stored entry"""
+        for entry in self._cache_files():
+            try:
+                record = self.get(entry.name[:-len('.cache')])
+            except (OSError, ValueError):
+                continue
+            if record is not None:
+                yield entry.name[:-len('.cache')], record
+
+    def _cache_files(self):
+        with os.scandir(self.cache_dir) as entries:
+            return [entry for entry in entries if entry.is_file() and entry.name.endswith('.cache')]
+
+    def usage(self):
+        """Return (data_type, entries, bytes) for every data type stored"""
+        totals = {}
+        for entry in self._cache_files():
+            try:
+                with open(entry.path, 'rb') as f:
+                    data_type = json.loads(f.readline()).get('data_type')
+                size = entry.stat().st_size
+            except (OSError, ValueError):
+                continue
+            entries, total = totals.get(data_type, (0, 0))
+            totals[data_type] = (entries + 1, total + size)
+        return [(data_type, entries, size) for data_type, (entries, size) in totals.items()]
+
+    def size_bytes(self):
+        """Return the total bytes of every cache file"""
+        return sum(entry.stat().st_size for entry in self._cache_files())
+
+
+class SQLiteCacheBackend(CacheBackend):
+    """
+    Cache entries in a single SQLite database.
+
+    Lookups go through the primary key index, writes are transactional, and the
+    total payload size is kept under max_bytes by dropping entries past their
+    stale window first and then the least recently used ones.
+    """
+
+    def __init__(self, db_path=os.path.join("cache", "api_cache.db"), max_bytes=DEFAULT_MAX_BYTES, codec=None):
+        self.db_path = db_path
+        self.max_bytes = max_bytes
+        self.codec = codec or PayloadCodec()
+        self._local = threading.local()
+        self.evictions = 0
+
+        db_dir = os.path.dirname(db_path)
+        if db_dir and not os.path.exists(db_dir):
+            os.makedirs(db_dir, exist_ok=True)
+
+        conn = self._connect()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY,
+                ticker TEXT,
+                data_type TEXT,
+                created_at TEXT NOT NULL,
+                expires_at REAL NOT NULL,
+                stale_until REAL NOT NULL,
+                last_access REAL NOT NULL,
+                size INTEGER NOT NULL,
+                encoding TEXT NOT NULL,
+                payload BLOB NOT NULL
+            )
+        """)
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_entries_stale ON entries (stale_until)')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_entries_access ON entries (last_access)')
+        conn.execute('CREATE TABLE IF NOT EXISTS cache_meta (name TEXT PRIMARY KEY, value INTEGER NOT NULL)')
+        conn.execute("INSERT OR IGNORE INTO cache_meta (name, value) "
+                     "SELECT 'total_bytes', COALESCE(SUM(size), 0) FROM entries")
+
+    def _connect(self):
+        """Return this thread's connection, opening it on first use"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def get(self, cache_key):
+        """Return the stored record for a key, or None"""
+        conn = self._connect()
+        row = conn.execute(
+            'SELECT ticker, data_type, created_at, expires_at, stale_until, encoding, payload '
+            'FROM entries WHERE key = ?',
+            (cache_key,)
+        ).fetchone()
+        if row is None:
+            return None
+
+        conn.execute('UPDATE entries SET last_access = ? WHERE key = ?', (time.time(), cache_key))
+        ticker, data_type, created_at, expires_at, stale_until, encoding, payload = row
+        return {
+            'timestamp': created_at,
+            'expires_at': datetime.fromtimestamp(expires_at).isoformat(),
+            'stale_until': datetime.fromtimestamp(stale_until).isoformat(),
+            'ticker': ticker,
+            'data_type': data_type,
+            'data': self.codec.decode(payload, encoding, data_type)
+        }
+
+    def iter_records(self):
+        """Yield (cache_key, record) for every stored entry without touching its access time"""
+        rows = self._connect().execute(
+            'SELECT key, ticker, data_type, created_at, expires_at, stale_until, encoding, payload FROM entries'
+        )
+        for key, ticker, data_type, created_at, expires_at, stale_until, encoding, payload in rows:
+            yield key, {
+                'timestamp': created_at,
+                'expires_at': datetime.fromtimestamp(expires_at).isoformat(),
+                'stale_until': datetime.fromtimestamp(stale_until).isoformat(),
+                'ticker': ticker,
+                'data_type': data_type,
+                'data': self.codec.decode(payload, encoding, data_type)
+            }
+
+    def set(self, cache_key, record):
+        """Insert or replace a record and evict entries if the byte budget is exceeded"""
+        payload, encoding = self.codec.encode(record['data'], record.get('data_type'))
+        size = len(payload)
+        expires_at = datetime.fromisoformat(record['expires_at']).timestamp()
+        stale_until = datetime.fromisoformat(record.get('stale_until') or record['expires_at']).timestamp()
+
+        conn = self._connect()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            old = conn.execute('SELECT size FROM entries WHERE key = ?', (cache_key,)).fetchone()
+            conn.execute(
+                'INSERT OR REPLACE INTO entries '
+                '(key, ticker, data_type, created_at, expires_at, stale_until, last_access, size, encoding, payload) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (cache_key, record.get('ticker'), record.get('data_type'), record['timestamp'],
+                 expires_at, stale_until, time.time(), size, encoding, payload)
+            )
+            self._adjust_total(conn, size - (old[0] if old else 0))
+            if self._total_bytes(conn) > self.max_bytes:
+                self._evict(conn)
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+    def delete(self, cache_key):
+        conn = self._connect()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            old = conn.execute('SELECT size FROM entries WHERE key = ?', (cache_key,)).fetchone()
+            if old:
+                conn.execute('DELETE FROM entries WHERE key = ?', (cache_key,))
+                self._adjust_total(conn, -old[0])
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+    @staticmethod
+    def _adjust_total(conn, delta):
+        conn.execute("UPDATE cache_meta SET value = value + ? WHERE name = 'total_bytes'", (delta,))
+
+    @staticmethod
+    def _total_bytes(conn):
+        return conn.execute("SELECT value FROM cache_meta WHERE name = 'total_bytes'").fetchone()[0]
+
+    def _evict(self, conn):
+        """Drop entries past their stale window, then least recently used ones, until under the target size"""
+        target = self.max_bytes * EVICTION_TARGET
+        now = time.time()
+        freed = conn.execute(
+            'SELECT COALESCE(SUM(size), 0) FROM entries WHERE stale_until < ?', (now,)
+        ).fetchone()[0]
+        evicted = conn.execute('DELETE FROM entries WHERE stale_until < ?', (now,)).rowcount
+        self._adjust_total(conn, -freed)
+
+        total = self._total_bytes(conn)
+        while total > target:
+            rows = conn.execute(
+                'SELECT key, size FROM entries ORDER BY last_access LIMIT 100'
+            ).fetchall()
+            if not rows:
+                break
+            for key, size in rows:
+                conn.execute('DELETE FROM entries WHERE key = ?', (key,))
+                self._adjust_total(conn, -size)
+                total -= size
+                evicted += 1
+                if total <= target:
+                    break
+        self.evictions += evicted
+        return evicted
+
+    def purge_expired(self):
+        """Delete every entry past its stale window and return how many were removed"""
+        conn = self._connect()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            now = time.time()
+            count, freed = conn.execute(
+                'SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries WHERE stale_until < ?', (now,)
+            ).fetchone()
+            conn.execute('DELETE FROM entries WHERE stale_until < ?', (now,))
+            self._adjust_total(conn, -freed)
+            conn.execute('COMMIT')
+            return count
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+    def usage(self):
+        """Return (data_type, entries, bytes) for every data type stored"""
+        return self._connect().execute(
+            'SELECT data_type, COUNT(*), COALESCE(SUM(size), 0) FROM entries GROUP BY data_type'
+        ).fetchall()
+
+    def size_bytes(self):
+        """Return the total payload bytes currently stored"""
+        return self._total_bytes(self._connect())
+
+
+class RedisCacheBackend(CacheBackend):
+    """
+    Cache entries on a Redis-compatible server shared by every replica.
+
+    Each entry is one string value (the same header-plus-payload layout as the
+    file backend) that the server expires at the end of its stale window, so
+    replicas share both the data and its lifetime. Memory limits and eviction
+    are left to the server's maxmemory policy.
+    """
+
+    def __init__(self, client=None, prefix='api_cache:', codec=None):
+        self.client = client or RESPClient()
+        self.prefix = prefix
+        self.codec = codec or PayloadCodec()
+
+    def _key(self, cache_key):
+        return f"{self.prefix}{cache_key}"
+
+    def get(self, cache_key):
+        """Return the stored record for a key, or None"""
+        blob = self.client.get(self._key(cache_key))
+        return self._unpack(blob) if blob is not None else None
+
+    def set(self, cache_key, record):
+        """Store a record that the server drops once its stale window has passed"""
+        stale_until = datetime.fromisoformat(record.get('stale_until') or record['expires_at'])
+        ttl_ms = (stale_until.timestamp() - time.time()) * 1000
+        if ttl_ms <= 0:
+            self.delete(cache_key)
+            return
+        self.client.set(self._key(cache_key), self._pack(record), px=ttl_ms)
+
+    def delete(self, cache_key):
+        self.client.delete(self._key(cache_key))
+
+    def _keys(self):
+        """Every key under the prefix; this walks the whole keyspace with SCAN"""
+        return self.client.scan_iter(match=f"{self.prefix}*")
+
+    def iter_records(self):
+        """Yield (cache_key, record) for every stored entry"""
+        for key in self._keys():
+            blob = self.client.get(key)
+            if blob is not None:
+                yield key.decode('utf-8')[len(self.prefix):], self._unpack(blob)
+
+    def usage(self):
+        """Return (data_type, entries, bytes) for every data type stored"""
+        totals = {}
+        for key in self._keys():
+            # Only the header line is needed to group entries; skip the payload
+            header = self.client.execute('GETRANGE', key, 0, REDIS_HEADER_BYTES - 1)
+            if not header:
+                continue
+            try:
+                data_type = json.loads(header.partition(b'\n')[0]).get('data_type')
+            except ValueError:
+                data_type = None
+            entries, total = totals.get(data_type, (0, 0))
+            totals[data_type] = (entries + 1, total + self.client.execute('STRLEN', key))
+        return [(data_type, entries, size) for data_type, (entries, size) in totals.items()]
+
+    def size_bytes(self):
+        """Return the total bytes of every entry under the prefix"""
+        return sum(self.client.execute('STRLEN', key) for key in self._keys())
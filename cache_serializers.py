@@ -0,0 +1,245 @@
+"""
+API Cache Serializers
+Encode cached payloads as compact bytes: fast JSON, MessagePack or NumPy .npz,
+optionally compressed with zstd or gzip depending on payload size
+"""
+
+import io
+import os
+import json
+import gzip
+import time
+import threading
+import numpy as np
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Payloads smaller than this are stored uncompressed; the frame overhead outweighs the gain
+COMPRESS_MIN_BYTES = 1024
+
+# Above this size gzip drops to its fastest level so large writes stay quick
+FAST_COMPRESS_BYTES = 1024 * 1024
+
+ZSTD_LEVEL = 3
+
+# Array-free payloads in an .npz entry are stored as JSON under this name
+NPZ_JSON_KEY = '__json__'
+NPZ_PATH_SEP = '/'
+
+
+class JSONSerializer:
+    """Strict JSON: orjson when installed, the standard library otherwise. Unsupported types raise TypeError."""
+
+    name = 'json'
+
+    def dumps(self, data):
+        if orjson is not None:
+            return orjson.dumps(data, option=orjson.OPT_SERIALIZE_NUMPY)
+        return json.dumps(data, separators=(',', ':')).encode('utf-8')
+
+    def loads(self, payload):
+        if orjson is not None:
+            return orjson.loads(payload)
+        return json.loads(payload)
+
+
+class MsgPackSerializer:
+    """MessagePack; requires the optional msgpack package"""
+
+    name = 'msgpack'
+
+    def dumps(self, data):
+        return msgpack.packb(data, use_bin_type=True)
+
+    def loads(self, payload):
+        return msgpack.unpackb(payload, raw=False, strict_map_key=False)
+
+
+class NpzSerializer:
+    """
+    NumPy .npz for payloads holding arrays, such as decoded price columns.
+    Arrays anywhere in nested dictionaries are stored natively under their key path;
+    everything else is kept as a JSON document beside them.
+    """
+
+    name = 'npz'
+
+    def __init__(self):
+        self._json = JSONSerializer()
+
+    @staticmethod
+    def handles(data):
+        """True if the payload contains at least one NumPy array"""
+        if isinstance(data, np.ndarray):
+            return True
+        if isinstance(data, dict):
+            return any(NpzSerializer.handles(value) for value in data.values())
+        return False
+
+    def _split(self, data, path, arrays):
+        if isinstance(data, np.ndarray):
+            arrays[NPZ_PATH_SEP.join(path)] = data
+            return None
+        if isinstance(data, dict):
+            rest = {}
+            for key, value in data.items():
+                if NPZ_PATH_SEP in str(key):
+                    raise TypeError(f"Key {key!r} cannot be stored in an npz payload")
+                remainder = self._split(value, path + [str(key)], arrays)
+                if not isinstance(value, np.ndarray):
+                    rest[key] = remainder
+            return rest
+        return data
+
+    def dumps(self, data):
+        arrays = {}
+        rest = self._split(data, [], arrays)
+        arrays[NPZ_JSON_KEY] = np.frombuffer(self._json.dumps(rest), dtype=np.uint8)
+        buffer = io.BytesIO()
+        np.savez(buffer, **arrays)
+        return buffer.getvalue()
+
+    def loads(self, payload):
+        with np.load(io.BytesIO(payload), allow_pickle=False) as archive:
+            data = self._json.loads(archive[NPZ_JSON_KEY].tobytes())
+            for name in archive.files:
+                if name == NPZ_JSON_KEY:
+                    continue
+                path = name.split(NPZ_PATH_SEP)
+                if path == ['']:
+                    return archive[name]
+                target = data
+                for key in path[:-1]:
+                    target = target.setdefault(key, {})
+                target[path[-1]] = archive[name]
+        return data
+
+
+def entry_type(data_type):
+    """
+    Group cache entries for reporting: the API function for Alpha Vantage keys, else the data type.
+    Entries kept under a prefix such as 'negative|' are grouped as e.g. 'negative:OVERVIEW'.
+    """
+    prefix, separator, rest = str(data_type).partition('|')
+    if separator and '=' not in prefix:
+        return f"{prefix}:{entry_type(rest)}"
+    for part in str(data_type).split('&'):
+        if part.startswith('function='):
+            return part[len('function='):]
+    return str(data_type)
+
+
+class PayloadCodec:
+    """
+    Turns cached data into (payload bytes, encoding) and back.
+
+    The encoding names the serializer and the compression, e.g. 'msgpack+zstd',
+    so entries written with other settings stay readable. Payloads with arrays
+    always use npz; others use the configured serializer, which defaults to
+    MessagePack when installed and JSON otherwise.
+    """
+
+    def __init__(self, serializer=None, compression=None):
+        self._serializers = {'json': JSONSerializer(), 'npz': NpzSerializer()}
+        if msgpack is not None:
+            self._serializers['msgpack'] = MsgPackSerializer()
+
+        serializer = serializer or os.getenv('API_CACHE_SERIALIZER') or ('msgpack' if msgpack else 'json')
+        if serializer == 'msgpack' and msgpack is None:
+            raise ValueError("The msgpack serializer needs the msgpack package installed")
+        self.serializer = self._serializers[serializer]
+        self.npz = self._serializers['npz']
+
+        # 'auto' picks zstd when installed and gzip otherwise
+        self.compression = compression or os.getenv('API_CACHE_COMPRESSION', 'auto')
+        if self.compression == 'auto':
+            self.compression = 'zstd' if zstandard else 'gzip'
+        if self.compression == 'zstd' and zstandard is None:
+            raise ValueError("zstd compression needs the zstandard package installed")
+
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def _compress(self, payload):
+        """Compress by size: small payloads as-is, larger ones with the configured codec"""
+        if self.compression == 'none' or len(payload) < COMPRESS_MIN_BYTES:
+            return payload, None
+        if self.compression == 'zstd':
+            compressed = zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(payload)
+        else:
+            level = 1 if len(payload) >= FAST_COMPRESS_BYTES else 6
+            compressed = gzip.compress(payload, compresslevel=level, mtime=0)
+        if len(compressed) >= len(payload):
+            return payload, None
+        return compressed, self.compression
+
+    @staticmethod
+    def _decompress(payload, compression):
+        if compression == 'zstd':
+            return zstandard.ZstdDecompressor().decompress(payload)
+        if compression == 'gzip':
+            return gzip.decompress(payload)
+        return payload
+
+    def encode(self, data, data_type=None):
+        """Serialize and compress data; returns (payload bytes, encoding)"""
+        serializer = self.npz if NpzSerializer.handles(data) else self.serializer
+        serialized = serializer.dumps(data)
+        payload, compression = self._compress(serialized)
+        encoding = f"{serializer.name}+{compression}" if compression else serializer.name
+        self._record(data_type, encoding, written=(len(serialized), len(payload)))
+        return payload, encoding
+
+    def decode(self, payload, encoding='json', data_type=None):
+        """Reverse encode(); plain-text JSON from older entries is accepted too"""
+        started = time.perf_counter()
+        name, _, compression = encoding.partition('+')
+        if isinstance(payload, str):
+            payload = payload.encode('utf-8')
+        data = self._serializers[name].loads(self._decompress(payload, compression))
+        self._record(data_type, encoding, decode_seconds=time.perf_counter() - started)
+        return data
+
+    def _record(self, data_type, encoding, written=None, decode_seconds=None):
+        with self._lock:
+            stats = self._stats.setdefault(entry_type(data_type), {
+                'encodings': {}, 'writes': 0, 'serialized_bytes': 0, 'stored_bytes': 0,
+                'reads': 0, 'decode_seconds': 0.0
+            })
+            if written:
+                stats['encodings'][encoding] = stats['encodings'].get(encoding, 0) + 1
+                stats['writes'] += 1
+                stats['serialized_bytes'] += written[0]
+                stats['stored_bytes'] += written[1]
+            if decode_seconds is not None:
+                stats['reads'] += 1
+                stats['decode_seconds'] += decode_seconds
+
+    def get_stats(self):
+        """Bytes saved by compression and average decode time, per entry type"""
+        report = {}
+        with self._lock:
+            for name, stats in self._stats.items():
+                report[name] = {
+                    'encodings': dict(stats['encodings']),
+                    'writes': stats['writes'],
+                    'serialized_bytes': stats['serialized_bytes'],
+                    'stored_bytes': stats['stored_bytes'],
+                    'bytes_saved': stats['serialized_bytes'] - stats['stored_bytes'],
+                    'reads': stats['reads'],
+                    'avg_decode_ms': (stats['decode_seconds'] / stats['reads'] * 1000) if stats['reads'] else 0.0
+                }
+        return report
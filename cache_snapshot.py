@@ -0,0 +1,209 @@
+"""
+API Cache Snapshot Bundles
+Export cache entries to one compressed, checksummed file and merge them into
+another node's cache, so a fresh deployment starts warm
+
+Usage:
+    python cache_snapshot.py export snapshot.tar.gz --max-age-hours 24 --endpoints OVERVIEW,GLOBAL_QUOTE
+    python cache_snapshot.py import snapshot.tar.gz
+"""
+
+import io
+import os
+import json
+import base64
+import hashlib
+import tarfile
+import argparse
+import tempfile
+from datetime import datetime, timedelta
+from cache_serializers import PayloadCodec, entry_type
+
+BUNDLE_FORMAT = 1
+MANIFEST_NAME = 'manifest.json'
+ENTRIES_NAME = 'entries.jsonl'
+
+# Data types describing the exporting node rather than API data, never exported: the
+# nightly warming marker (cache_warmer.RUN_MARKER_TYPE), which would make the importing
+# node skip tonight's run, and remembered failures (alpha_vantage_fetcher.NEGATIVE_CACHE_PREFIX)
+NODE_LOCAL_DATA_TYPES = ('cache_warmer_run', 'negative|')
+
+
+def _portable_codec():
+    # Standard-library encodings only, so any node can read the bundle; the tarball compresses it
+    return PayloadCodec(serializer='json', compression='none')
+
+
+def export_snapshot(cache, path, max_age=None, tickers=None, endpoints=None):
+    """
+    Write the cache's live entries to a gzip-compressed bundle at path.
+
+    max_age (timedelta) keeps entries fetched within that long, tickers keeps the
+    given symbols and endpoints keeps the given entry types (e.g. 'OVERVIEW').
+    Entries past their stale window and node-local entries are never exported.
+    Returns a summary.
+    """
+    now = datetime.now()
+    tickers = {ticker.upper() for ticker in tickers} if tickers else None
+    endpoints = {endpoint.upper() for endpoint in endpoints} if endpoints else None
+    codec = _portable_codec()
+    checksum = hashlib.sha256()
+    exported = 0
+
+    with tempfile.TemporaryFile() as entries_file:
+        for _, record in cache.backend.iter_records():
+            if datetime.fromisoformat(record.get('stale_until') or record['expires_at']) <= now:
+                continue
+            if str(record.get('data_type') or '').startswith(NODE_LOCAL_DATA_TYPES):
+                continue
+            if max_age is not None and now - datetime.fromisoformat(record['timestamp']) > max_age:
+                continue
+            if tickers is not None and str(record.get('ticker') or '').upper() not in tickers:
+                continue
+            if endpoints is not None and entry_type(record.get('data_type')).upper() not in endpoints:
+                continue
+
+            payload, encoding = codec.encode(record['data'])
+            line = json.dumps({
+                'ticker': record.get('ticker'),
+                'data_type': record.get('data_type'),
+                'timestamp': record['timestamp'],
+                'expires_at': record['expires_at'],
+                'stale_until': record.get('stale_until') or record['expires_at'],
+                'encoding': encoding,
+                'payload': base64.b64encode(payload).decode('ascii')
+            }).encode('utf-8') + b'\n'
+            entries_file.write(line)
+            checksum.update(line)
+            exported += 1
+
+        manifest = {
+            'format': BUNDLE_FORMAT,
+            'created_at': now.isoformat(),
+            'key_version': cache.key_version,
+            'entries': exported,
+            'sha256': checksum.hexdigest(),
+            'filters': {
+                'max_age_seconds': max_age.total_seconds() if max_age is not None else None,
+                'tickers': sorted(tickers) if tickers else None,
+                'endpoints': sorted(endpoints) if endpoints else None
+            }
+        }
+        manifest_bytes = json.dumps(manifest, indent=2).encode('utf-8')
+
+        # Write to a temporary file first so a failed export never leaves a truncated bundle
+        directory = os.path.dirname(os.path.abspath(path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f, tarfile.open(fileobj=f, mode='w:gz') as bundle:
+                info = tarfile.TarInfo(MANIFEST_NAME)
+                info.size = len(manifest_bytes)
+                info.mtime = int(now.timestamp())
+                bundle.addfile(info, io.BytesIO(manifest_bytes))
+
+                info = tarfile.TarInfo(ENTRIES_NAME)
+                info.size = entries_file.tell()
+                info.mtime = int(now.timestamp())
+                entries_file.seek(0)
+                bundle.addfile(info, entries_file)
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    return {'path': path, 'entries': exported, 'sha256': manifest['sha256']}
+
+
+def read_manifest(path):
+    """Return a bundle's manifest without reading its entries"""
+    with tarfile.open(path, mode='r:gz') as bundle:
+        return json.load(bundle.extractfile(MANIFEST_NAME))
+
+
+def import_snapshot(cache, path):
+    """
+    Merge a bundle into the cache. An entry replaces the local one only if it was
+    fetched more recently; entries past their stale window are skipped. Raises
+    ValueError if the bundle is corrupt or was written for another key version.
+    """
+    now = datetime.now()
+    codec = _portable_codec()
+    summary = {'path': path, 'imported': 0, 'skipped_older': 0, 'skipped_expired': 0}
+
+    with tarfile.open(path, mode='r:gz') as bundle:
+        manifest = json.load(bundle.extractfile(MANIFEST_NAME))
+        if manifest.get('format') != BUNDLE_FORMAT:
+            raise ValueError(f"Unsupported cache bundle format: {manifest.get('format')}")
+        if manifest.get('key_version') != cache.key_version:
+            raise ValueError(f"Cache bundle was written for key version {manifest.get('key_version')}, "
+                             f"this cache uses {cache.key_version}")
+
+        # Verify the whole bundle before touching the cache
+        checksum = hashlib.sha256()
+        entries = bundle.extractfile(ENTRIES_NAME)
+        for line in entries:
+            checksum.update(line)
+        if checksum.hexdigest() != manifest.get('sha256'):
+            raise ValueError(f"Cache bundle {path} failed its checksum")
+
+        entries = bundle.extractfile(ENTRIES_NAME)
+        for line in entries:
+            entry = json.loads(line)
+            if datetime.fromisoformat(entry['stale_until']) <= now:
+                summary['skipped_expired'] += 1
+                continue
+
+            cache_key = cache._get_cache_key(entry['ticker'], entry['data_type'])
+            existing = cache.backend.get(cache_key)
+            if (existing is not None and
+                    datetime.fromisoformat(existing['timestamp']) >= datetime.fromisoformat(entry['timestamp'])):
+                summary['skipped_older'] += 1
+                continue
+
+            cache.backend.set(cache_key, {
+                'timestamp': entry['timestamp'],
+                'expires_at': entry['expires_at'],
+                'stale_until': entry['stale_until'],
+                'ticker': entry['ticker'],
+                'data_type': entry['data_type'],
+                'data': codec.decode(base64.b64decode(entry['payload']), entry['encoding'], entry['data_type'])
+            })
+            cache.memory.delete(cache_key)
+            summary['imported'] += 1
+
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    export_parser = subparsers.add_parser('export', help='Write cache entries to a bundle')
+    export_parser.add_argument('path')
+    export_parser.add_argument('--max-age-hours', type=float, help='Only entries fetched within this many hours')
+    export_parser.add_argument('--tickers', help='Comma-separated ticker symbols to include')
+    export_parser.add_argument('--endpoints', help='Comma-separated endpoints to include, e.g. OVERVIEW')
+
+    import_parser = subparsers.add_parser('import', help='Merge a bundle into the cache')
+    import_parser.add_argument('path')
+    args = parser.parse_args()
+
+    from api_cache import api_cache
+
+    if args.command == 'export':
+        summary = export_snapshot(
+            api_cache, args.path,
+            max_age=timedelta(hours=args.max_age_hours) if args.max_age_hours else None,
+            tickers=args.tickers.split(',') if args.tickers else None,
+            endpoints=args.endpoints.split(',') if args.endpoints else None
+        )
+        print(f"Exported {summary['entries']} entries to {summary['path']} (sha256 {summary['sha256'][:12]})")
+    else:
+        summary = import_snapshot(api_cache, args.path)
+        print(f"Imported {summary['imported']} entries from {summary['path']} "
+              f"({summary['skipped_older']} older than local, {summary['skipped_expired']} expired)")
+
+
+if __name__ == '__main__':
+    main()
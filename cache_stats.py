@@ -0,0 +1,145 @@
+"""
+API Cache Statistics
+Per-endpoint hit, miss and latency counters for APICache, with JSON and
+Prometheus text output
+"""
+
+import json
+import threading
+from cache_serializers import entry_type
+
+# Assumed cost of one upstream call until a real one has been timed
+DEFAULT_UPSTREAM_SECONDS = 1.0
+
+PROMETHEUS_PREFIX = 'api_cache'
+
+# (metric, per-endpoint field, type, help text)
+PROMETHEUS_METRICS = (
+    ('hits_total', 'hits', 'counter', 'Reads served fresh from the cache'),
+    ('stale_serves_total', 'stale_serves', 'counter', 'Reads served stale while a refresh ran'),
+    ('misses_total', 'misses', 'counter', 'Reads that found no usable entry'),
+    ('expirations_total', 'expirations', 'counter', 'Entries dropped on read after their stale window'),
+    ('read_seconds_avg', 'avg_read_seconds', 'gauge', 'Average cache read time'),
+    ('upstream_calls_total', 'upstream_calls', 'counter', 'Upstream API calls made on a miss'),
+    ('upstream_seconds_avg', 'avg_upstream_seconds', 'gauge', 'Average upstream call time including rate-limit waits'),
+    ('upstream_seconds_saved', 'upstream_seconds_saved', 'gauge', 'Estimated upstream seconds avoided'),
+    ('quota_saved_total', 'quota_saved', 'counter', 'API calls the cache answered instead'),
+    ('entries', 'entries', 'gauge', 'Entries stored in the backend'),
+    ('bytes', 'bytes', 'gauge', 'Payload bytes stored in the backend'),
+)
+
+
+class CacheStats:
+    """Thread-safe counters keyed by entry type (the API function for Alpha Vantage requests)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._endpoints = {}
+
+    def _counters(self, data_type):
+        return self._endpoints.setdefault(entry_type(data_type), {
+            'memory_hits': 0, 'disk_hits': 0, 'stale_serves': 0, 'misses': 0, 'expirations': 0,
+            'reads': 0, 'read_seconds': 0.0, 'upstream_calls': 0, 'upstream_seconds': 0.0
+        })
+
+    def record_read(self, data_type, seconds, tier=None, stale=False, expired=False):
+        """Record one lookup; tier is 'memory' or 'disk' for a hit and None for a miss"""
+        with self._lock:
+            counters = self._counters(data_type)
+            counters['reads'] += 1
+            counters['read_seconds'] += seconds
+            if tier is None:
+                counters['misses'] += 1
+                if expired:
+                    counters['expirations'] += 1
+            elif stale:
+                counters['stale_serves'] += 1
+            else:
+                counters[f'{tier}_hits'] += 1
+
+    def record_upstream(self, data_type, seconds):
+        """Record the wall time of an upstream call made because of a miss"""
+        with self._lock:
+            counters = self._counters(data_type)
+            counters['upstream_calls'] += 1
+            counters['upstream_seconds'] += seconds
+
+    def reset(self):
+        with self._lock:
+            self._endpoints.clear()
+
+    def snapshot(self):
+        """Return per-endpoint counters with derived rates and savings estimates"""
+        with self._lock:
+            endpoints = {name: dict(counters) for name, counters in self._endpoints.items()}
+
+        calls = sum(counters['upstream_calls'] for counters in endpoints.values())
+        overall_upstream = (sum(counters['upstream_seconds'] for counters in endpoints.values()) / calls
+                            if calls else DEFAULT_UPSTREAM_SECONDS)
+
+        report = {}
+        for name, counters in endpoints.items():
+            hits = counters['memory_hits'] + counters['disk_hits']
+            served = hits + counters['stale_serves']
+            avg_upstream = (counters['upstream_seconds'] / counters['upstream_calls']
+                            if counters['upstream_calls'] else overall_upstream)
+            report[name] = {
+                'hits': hits,
+                'memory_hits': counters['memory_hits'],
+                'disk_hits': counters['disk_hits'],
+                'stale_serves': counters['stale_serves'],
+                'misses': counters['misses'],
+                'expirations': counters['expirations'],
+                'hit_rate': served / counters['reads'] if counters['reads'] else 0.0,
+                'avg_read_seconds': counters['read_seconds'] / counters['reads'] if counters['reads'] else 0.0,
+                'upstream_calls': counters['upstream_calls'],
+                'avg_upstream_seconds': avg_upstream,
+                # Stale serves still refresh in the background, so they save waiting but not quota
+                'upstream_seconds_saved': served * avg_upstream,
+                'quota_saved': hits
+            }
+        return report
+
+
+def summarize(endpoints):
+    """Totals across every endpoint in a report"""
+    totals = {name: sum(stats.get(name, 0) for stats in endpoints.values())
+              for name in ('hits', 'stale_serves', 'misses', 'expirations', 'upstream_calls',
+                           'upstream_seconds_saved', 'quota_saved', 'entries', 'bytes')}
+    reads = totals['hits'] + totals['stale_serves'] + totals['misses']
+    totals['hit_rate'] = (totals['hits'] + totals['stale_serves']) / reads if reads else 0.0
+    return totals
+
+
+def to_json(stats):
+    """Render an APICache.get_stats() report as JSON"""
+    return json.dumps(stats, indent=2, default=str)
+
+
+def _escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def to_prometheus(stats):
+    """Render an APICache.get_stats() report in the Prometheus text exposition format"""
+    lines = []
+    for metric, field, metric_type, help_text in PROMETHEUS_METRICS:
+        name = f'{PROMETHEUS_PREFIX}_{metric}'
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {metric_type}')
+        for endpoint, values in sorted(stats['endpoints'].items()):
+            lines.append(f'{name}{{endpoint="{_escape_label(endpoint)}"}} {values.get(field, 0)}')
+
+    backend = stats['backend']
+    for metric, value, help_text in (
+        ('backend_bytes', backend['bytes'], 'Total payload bytes stored in the backend'),
+        ('backend_evictions_total', backend['evictions'], 'Entries evicted to stay under the byte budget'),
+        ('memory_entries', stats['memory']['entries'], 'Entries held in the in-memory tier'),
+        ('memory_evictions_total', stats['memory']['evictions'], 'Entries demoted from the in-memory tier'),
+    ):
+        name = f'{PROMETHEUS_PREFIX}_{metric}'
+        metric_type = 'counter' if metric.endswith('_total') else 'gauge'
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {metric_type}')
+        lines.append(f'{name} {value}')
+    return '\n'.join(lines) + '\n'
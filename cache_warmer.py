@@ -0,0 +1,164 @@
+"""
+Nightly Cache Warming
+While the market is closed, refresh the most popular tickers' fundamentals and
+quotes within a share of the daily API quota, so the morning's first page loads
+are cache hits
+
+Usage:
+    python cache_warmer.py --quota-share 0.3 --max-tickers 20
+"""
+
+import os
+import time
+import argparse
+import threading
+from datetime import datetime
+from market_calendar import NYSE, calendar_for
+from popularity import popularity
+
+# Share of the pool's daily quota one warming run may spend; 0 disables the nightly job
+DEFAULT_QUOTA_SHARE = float(os.getenv('CACHE_WARM_QUOTA_SHARE', 0.3))
+DEFAULT_MAX_TICKERS = int(os.getenv('CACHE_WARM_MAX_TICKERS', 20))
+
+# How often the nightly thread checks whether a run is due
+CHECK_INTERVAL_SECONDS = 15 * 60
+
+# Cache entry marking that tonight's run has finished; it expires at the next NYSE open
+RUN_MARKER_TYPE = 'cache_warmer_run'
+
+
+class CacheWarmer:
+    """
+    Refreshes the cache entries the most-opened tickers will need next session.
+
+    An entry is refreshed if it is missing or would expire before its exchange
+    next opens. Calls go through the fetcher's 'background' lane, so a member
+    loading a page is always served first.
+    """
+
+    def __init__(self, fetcher=None, tracker=None, quota_share=DEFAULT_QUOTA_SHARE, max_tickers=DEFAULT_MAX_TICKERS):
+        if fetcher is None:
+            from alpha_vantage_fetcher import alpha_vantage_fetcher as fetcher
+        self.fetcher = fetcher
+        self.tracker = tracker or popularity
+        self.quota_share = quota_share
+        self.max_tickers = max_tickers
+
+    def _requests(self, ticker):
+        """The requests a ticker's evaluation page makes"""
+        return [
+            {'function': 'OVERVIEW', 'symbol': ticker},
+            self.fetcher.planner.price_request(ticker, 'evaluation')
+        ]
+
+    def _needs_refresh(self, params, warm_until):
+        symbol, data_type = self.fetcher._get_cache_key(params)
+        entry = self.fetcher.cache.get_cached_entry(symbol, data_type, track=False)
+        return entry is None or entry['is_stale'] or entry['fresh_until'] < warm_until
+
+    def budget(self):
+        """API calls this run may make: the configured share of the daily quota, at most what is left"""
+        key_pool = self.fetcher.key_pool
+        return min(int(key_pool.limit * self.quota_share), key_pool.remaining())
+
+    def due(self):
+        """True while the NYSE is closed and tonight's run has not yet finished"""
+        if self.quota_share <= 0 or NYSE.is_open():
+            return False
+        return self.fetcher.cache.get_cached_data('', RUN_MARKER_TYPE) is None
+
+    def run(self):
+        """Warm the cache once and return a summary of what was refreshed"""
+        started = time.time()
+        budget = self.budget()
+        summary = {'budget': budget, 'calls': 0, 'warmed': [], 'up_to_date': [], 'market_open': [],
+                   'deferred': [], 'errors': {}}
+
+        for ticker, _ in self.tracker.top(self.max_tickers):
+            calendar = calendar_for(ticker)
+            if calendar.is_open():
+                summary['market_open'].append(ticker)
+                continue
+
+            # Cache expiries are naive local times
+            warm_until = calendar.next_open().astimezone().replace(tzinfo=None)
+            stale = [params for params in self._requests(ticker) if self._needs_refresh(params, warm_until)]
+            if not stale:
+                summary['up_to_date'].append(ticker)
+                continue
+            if summary['calls'] + len(stale) > budget:
+                summary['deferred'].append(ticker)
+                continue
+
+            with self.fetcher.lane('background'):
+                for params in stale:
+                    summary['calls'] += 1
+                    result = self.fetcher._refresh_now(params)
+                    if 'error' in result:
+                        summary['errors'][ticker] = result['error']
+                        break
+                else:
+                    summary['warmed'].append(ticker)
+
+        summary['seconds'] = time.time() - started
+        # Mark the night as done, for this and every other process sharing the cache
+        self.fetcher.cache.cache_data('', {'finished_at': datetime.now().isoformat(), 'calls': summary['calls']},
+                                      RUN_MARKER_TYPE, ttl=NYSE.next_open().astimezone().replace(tzinfo=None))
+        print(f"Cache warming: refreshed {len(summary['warmed'])} tickers with {summary['calls']} "
+              f"API calls in {summary['seconds']:.0f} seconds")
+        return summary
+
+
+_nightly_thread = None
+_nightly_lock = threading.Lock()
+
+
+def start_nightly_warming(fetcher=None, check_interval=CHECK_INTERVAL_SECONDS):
+    """
+    Start one daemon thread per process that runs the warmer once each night the
+    NYSE is closed. Does nothing when CACHE_WARM_QUOTA_SHARE is 0.
+    """
+    global _nightly_thread
+    if DEFAULT_QUOTA_SHARE <= 0:
+        return None
+    with _nightly_lock:
+        if _nightly_thread is not None:
+            return _nightly_thread
+        warmer = CacheWarmer(fetcher)
+
+        def loop():
+            while True:
+                try:
+                    if warmer.due():
+                        warmer.run()
+                except Exception as e:
+                    print(f"Cache warming failed: {str(e)}")
+                time.sleep(check_interval)
+
+        _nightly_thread = threading.Thread(target=loop, name='cache-warmer', daemon=True)
+        _nightly_thread.start()
+        return _nightly_thread
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--quota-share', type=float, default=DEFAULT_QUOTA_SHARE,
+                        help='Share of the daily API quota to spend')
+    parser.add_argument('--max-tickers', type=int, default=DEFAULT_MAX_TICKERS,
+                        help='Most popular tickers to consider')
+    parser.add_argument('--force', action='store_true', help='Run even if tonight\'s run already finished')
+    args = parser.parse_args()
+
+    warmer = CacheWarmer(quota_share=args.quota_share, max_tickers=args.max_tickers)
+    if not args.force and not warmer.due():
+        print("Cache warming is not due: the market is open or tonight's run already finished")
+        return
+    summary = warmer.run()
+    if summary['deferred']:
+        print(f"Deferred for lack of quota: {', '.join(summary['deferred'])}")
+    for ticker, error in summary['errors'].items():
+        print(f"{ticker}: {error}")
+
+
+if __name__ == '__main__':
+    main()
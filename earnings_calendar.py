@@ -0,0 +1,50 @@
+"""
+Earnings Calendar
+Parses Alpha Vantage's EARNINGS_CALENDAR CSV and finds each ticker's next
+results release, which is when its fundamentals actually change
+"""
+
+import csv
+import io
+import json
+from datetime import date, datetime, timedelta
+
+# Alpha Vantage updates OVERVIEW figures a day or two after a results release
+EARNINGS_GRACE = timedelta(days=2)
+
+EARNINGS_CALENDAR_PARAMS = {'function': 'EARNINGS_CALENDAR', 'horizon': '3month'}
+
+
+def parse_earnings_calendar(text):
+    """
+    Decode the CSV body into {'reports': {symbol: [report dates, ascending]}}.
+    Errors and limit notices come back as a JSON document rather than CSV; they
+    are returned with an 'error' added, so they are never taken for a calendar.
+    """
+    if text.lstrip().startswith('{'):
+        data = json.loads(text)
+        if 'reports' in data:
+            return data
+        message = data.get('Error Message') or data.get('Note') or data.get('Information') or text.strip()[:200]
+        return dict(data, error=f"Unexpected earnings calendar response: {message}")
+    reports = {}
+    for row in csv.DictReader(io.StringIO(text)):
+        symbol = (row.get('symbol') or '').strip().upper()
+        report_date = (row.get('reportDate') or '').strip()
+        if not symbol or not report_date:
+            continue
+        reports.setdefault(symbol, set()).add(report_date)
+    return {'reports': {symbol: sorted(dates) for symbol, dates in reports.items()}}
+
+
+def next_report_date(calendar, symbol, now=None, grace=EARNINGS_GRACE):
+    """
+    The first report date for the symbol whose grace period has not yet run out,
+    or None if the calendar does not list one.
+    """
+    today = (now or datetime.now()).date()
+    for report_date in (calendar or {}).get('reports', {}).get(str(symbol).upper(), ()):
+        report_date = date.fromisoformat(report_date)
+        if report_date + grace > today:
+            return report_date
+    return None
@@ -0,0 +1,133 @@
+"""
+Pooled HTTP Session Module
+Keep-alive connection pooling for upstream data providers
+"""
+
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.poolmanager import PoolManager
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+
+class _CountingPoolMixin:
+    """Report every newly opened socket back to the owning session"""
+    on_new_connection = None
+
+    def _new_conn(self):
+        conn = super()._new_conn()
+        if self.on_new_connection:
+            self.on_new_connection()
+        return conn
+
+
+class _CountingHTTPConnectionPool(_CountingPoolMixin, HTTPConnectionPool):
+    pass
+
+
+class _CountingHTTPSConnectionPool(_CountingPoolMixin, HTTPSConnectionPool):
+    pass
+
+
+class _CountingPoolManager(PoolManager):
+    def __init__(self, *args, on_new_connection=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.on_new_connection = on_new_connection
+        self.pool_classes_by_scheme = {
+            'http': _CountingHTTPConnectionPool,
+            'https': _CountingHTTPSConnectionPool,
+        }
+
+    def _new_pool(self, scheme, host, port, request_context=None):
+        pool = super()._new_pool(scheme, host, port, request_context)
+        pool.on_new_connection = self.on_new_connection
+        return pool
+
+
+class _CountingHTTPAdapter(HTTPAdapter):
+    def __init__(self, on_new_connection=None, **kwargs):
+        self._on_new_connection = on_new_connection
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, connections, maxsize, block=False, **pool_kwargs):
+        self._pool_connections = connections
+        self._pool_maxsize = maxsize
+        self._pool_block = block
+        self.poolmanager = _CountingPoolManager(
+            num_pools=connections,
+            maxsize=maxsize,
+            block=block,
+            on_new_connection=self._on_new_connection,
+            **pool_kwargs,
+        )
+
+
+class PooledSession:
+    """
+    Thread-safe wrapper around a requests.Session with a bounded keep-alive pool.
+    One instance can be shared by every Streamlit session in the process.
+    """
+
+    def __init__(self, pool_size=10, connect_timeout=5, read_timeout=30, block_when_full=True):
+        self.pool_size = pool_size
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self._stats_lock = threading.Lock()
+        self._requests_sent = 0
+        self._connections_opened = 0
+        self._timed_requests = 0
+        self._total_latency = 0.0
+
+        self.session = requests.Session()
+        self.session.headers.update({
+            'Accept-Encoding': 'gzip, deflate',
+            'Connection': 'keep-alive',
+        })
+        # Blocking keeps concurrent sessions inside the pool instead of opening
+        # throwaway sockets that are discarded after a single request
+        adapter = _CountingHTTPAdapter(
+            on_new_connection=self._record_new_connection,
+            pool_connections=pool_size,
+            pool_maxsize=pool_size,
+            pool_block=block_when_full,
+        )
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def _record_new_connection(self):
+        with self._stats_lock:
+            self._connections_opened += 1
+
+    def get(self, url, params=None, timeout=None, **kwargs):
+        """Issue a GET through the shared pool using (connect, read) timeouts"""
+        if timeout is None:
+            timeout = (self.connect_timeout, self.read_timeout)
+        try:
+            response = self.session.get(url, params=params, timeout=timeout, **kwargs)
+        finally:
+            with self._stats_lock:
+                self._requests_sent += 1
+        with self._stats_lock:
+            self._timed_requests += 1
+            self._total_latency += response.elapsed.total_seconds()
+        return response
+
+    def get_stats(self):
+        """Return connection reuse and latency counters"""
+        with self._stats_lock:
+            requests_sent = self._requests_sent
+            opened = self._connections_opened
+            timed = self._timed_requests
+            total_latency = self._total_latency
+        reused = max(requests_sent - opened, 0)
+        return {
+            'requests': requests_sent,
+            'connections_opened': opened,
+            'connections_reused': reused,
+            'reuse_ratio': reused / requests_sent if requests_sent else 0.0,
+            'avg_latency_seconds': total_latency / timed if timed else 0.0,
+        }
+
+    def close(self):
+        """Close all pooled connections"""
+        self.session.close()
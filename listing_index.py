@@ -0,0 +1,211 @@
+"""
+Listing Index
+A local copy of Alpha Vantage's LISTING_STATUS listing of active US securities,
+with a Bloom filter for membership tests, so an unknown ticker is recognised
+without spending an API call
+"""
+
+import os
+import csv
+import io
+import json
+import math
+import time
+import sqlite3
+import hashlib
+
+DEFAULT_DB_PATH = os.getenv('LISTING_DB_PATH', os.path.join('cache', 'listings.db'))
+
+LISTING_STATUS_PARAMS = {'function': 'LISTING_STATUS'}
+
+# How long a downloaded listing is trusted before a background refresh replaces it
+LISTING_REFRESH_SECONDS = 24 * 3600
+
+# Share of unlisted symbols the filter lets through to a lookup: about 14 bits per listing
+BLOOM_ERROR_RATE = 0.001
+
+
+def parse_listing_status(text):
+    """
+    Decode the CSV body into {'listings': [{'symbol', 'name', 'exchange', 'asset_type', 'ipo_date'}]}.
+    Errors and limit notices come back as a JSON document rather than CSV; they
+    are returned with an 'error' added, so they are never taken for a listing.
+    """
+    if text.lstrip().startswith('{'):
+        data = json.loads(text)
+        if 'listings' in data:
+            return data
+        message = data.get('Error Message') or data.get('Note') or data.get('Information') or text.strip()[:200]
+        return dict(data, error=f"Unexpected listing status response: {message}")
+    listings = []
+    for row in csv.DictReader(io.StringIO(text)):
+        symbol = (row.get('symbol') or '').strip().upper()
+        if not symbol:
+            continue
+        listings.append({
+            'symbol': symbol,
+            'name': (row.get('name') or '').strip(),
+            'exchange': (row.get('exchange') or '').strip(),
+            'asset_type': (row.get('assetType') or '').strip(),
+            'ipo_date': (row.get('ipoDate') or '').strip() or None
+        })
+    return {'listings': listings}
+
+
+class BloomFilter:
+    """Set membership in a fixed bit array: no false negatives, false positives at about error_rate"""
+
+    def __init__(self, capacity, error_rate=BLOOM_ERROR_RATE, bits=None, hashes=None):
+        capacity = max(int(capacity), 1)
+        self.size = bits or max(int(-capacity * math.log(error_rate) / math.log(2) ** 2), 8)
+        self.hashes = hashes or max(int(round(self.size / capacity * math.log(2))), 1)
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, item):
+        # Double hashing: k positions from two 64-bit halves of one digest
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        first, second = int.from_bytes(digest[:8], 'little'), int.from_bytes(digest[8:], 'little') | 1
+        return ((first + i * second) % self.size for i in range(self.hashes))
+
+    def add(self, item):
+        for position in self._positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, item):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+    def to_bytes(self):
+        return self.size.to_bytes(4, 'little') + self.hashes.to_bytes(1, 'little') + bytes(self.bits)
+
+    @classmethod
+    def from_bytes(cls, blob):
+        bloom = cls(1, bits=int.from_bytes(blob[:4], 'little'), hashes=blob[4])
+        bloom.bits = bytearray(blob[5:])
+        return bloom
+
+
+class ListingIndex:
+    """
+    Active listings in SQLite, shared by every process on the host, plus the
+    Bloom filter of their symbols kept in memory.
+
+    The listing covers US exchanges only, so symbols with an exchange suffix
+    (e.g. VOD.L) are never rejected.
+    """
+
+    def __init__(self, db_path=None, error_rate=BLOOM_ERROR_RATE):
+        self.db_path = db_path or DEFAULT_DB_PATH
+        self.error_rate = error_rate
+        self.bloom = None
+        self.refreshed_at = None
+        db_dir = os.path.dirname(self.db_path)
+        if db_dir and not os.path.exists(db_dir):
+            os.makedirs(db_dir, exist_ok=True)
+        conn = self._connect()
+        try:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS listings (
+                    symbol TEXT PRIMARY KEY,
+                    name TEXT,
+                    exchange TEXT,
+                    asset_type TEXT,
+                    ipo_date TEXT
+                )
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS listing_meta (
+                    name TEXT PRIMARY KEY,
+                    value BLOB
+                )
+            """)
+        finally:
+            conn.close()
+        self.load()
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+
+    def load(self):
+        """Read the filter another process (or an earlier run) stored; returns True if there is one"""
+        conn = self._connect()
+        try:
+            meta = dict(conn.execute("SELECT name, value FROM listing_meta"))
+        finally:
+            conn.close()
+        if 'bloom' not in meta:
+            return False
+        refreshed_at = float(meta['refreshed_at'])
+        if refreshed_at != self.refreshed_at:
+            self.bloom = BloomFilter.from_bytes(meta['bloom'])
+            self.refreshed_at = refreshed_at
+        return True
+
+    def replace(self, listings):
+        """Replace the stored listing and its filter with a fresh download"""
+        bloom = BloomFilter(len(listings), self.error_rate)
+        for listing in listings:
+            bloom.add(listing['symbol'])
+        refreshed_at = time.time()
+
+        conn = self._connect()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            conn.execute('DELETE FROM listings')
+            conn.executemany(
+                'INSERT OR REPLACE INTO listings (symbol, name, exchange, asset_type, ipo_date) VALUES (?, ?, ?, ?, ?)',
+                [(listing['symbol'], listing['name'], listing['exchange'], listing['asset_type'], listing['ipo_date'])
+                 for listing in listings]
+            )
+            conn.executemany('INSERT OR REPLACE INTO listing_meta (name, value) VALUES (?, ?)',
+                             [('bloom', bloom.to_bytes()), ('refreshed_at', str(refreshed_at))])
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        finally:
+            conn.close()
+
+        self.bloom = bloom
+        self.refreshed_at = refreshed_at
+
+    def is_loaded(self):
+        return self.bloom is not None
+
+    def is_stale(self):
+        """True if there is no listing yet or it is due for a refresh"""
+        return self.refreshed_at is None or time.time() - self.refreshed_at >= LISTING_REFRESH_SECONDS
+
+    def might_be_listed(self, symbol):
+        """
+        False only if the symbol is certainly not an active US listing. True for
+        listed symbols, rare false positives, suffixed symbols and when nothing
+        has been downloaded yet.
+        """
+        symbol = str(symbol).strip().upper()
+        if self.bloom is None or '.' in symbol:
+            return True
+        return symbol in self.bloom
+
+    def lookup(self, symbol):
+        """Return the stored listing for a symbol, or None"""
+        conn = self._connect()
+        try:
+            row = conn.execute(
+                'SELECT symbol, name, exchange, asset_type, ipo_date FROM listings WHERE symbol = ?',
+                (str(symbol).strip().upper(),)
+            ).fetchone()
+        finally:
+            conn.close()
+        if row is None:
+            return None
+        return dict(zip(('symbol', 'name', 'exchange', 'asset_type', 'ipo_date'), row))
+
+    def count(self):
+        conn = self._connect()
+        try:
+            return conn.execute('SELECT COUNT(*) FROM listings').fetchone()[0]
+        finally:
+            conn.close()
+
+
+listing_index = ListingIndex()
@@ -0,0 +1,274 @@
+"""
+Exchange Calendars
+Trading sessions, holidays and early closes for NYSE/NASDAQ and the London Stock
+Exchange, and a cache expiry policy that follows them
+"""
+
+from datetime import date, datetime, time, timedelta
+from functools import lru_cache
+from zoneinfo import ZoneInfo
+
+# Published prices settle a little after the close; entries stay valid until then
+DEFAULT_SETTLE = timedelta(minutes=20)
+
+# How long an intraday price stays valid while the market is open
+DEFAULT_INTRADAY_TTL = timedelta(minutes=15)
+
+# Guard against a misconfigured calendar looping forever
+MAX_SESSION_SEARCH_DAYS = 30
+
+
+def easter_sunday(year):
+    """Gregorian Easter Sunday (anonymous Gregorian algorithm)"""
+    a = year % 19
+    b, c = divmod(year, 100)
+    d, e = divmod(b, 4)
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    month, day = divmod(h + l - 7 * m + 114, 31)
+    return date(year, month, day + 1)
+
+
+def nth_weekday(year, month, weekday, n):
+    """The nth given weekday of a month (Monday is 0); n=-1 is the last one"""
+    if n > 0:
+        first = date(year, month, 1)
+        return first + timedelta(days=(weekday - first.weekday()) % 7 + 7 * (n - 1))
+    last = date(year + month // 12, month % 12 + 1, 1) - timedelta(days=1)
+    return last - timedelta(days=(last.weekday() - weekday) % 7)
+
+
+def _observed_us(day):
+    """US rule: a Saturday holiday moves to Friday, a Sunday holiday to Monday"""
+    if day.weekday() == 5:
+        return day - timedelta(days=1)
+    if day.weekday() == 6:
+        return day + timedelta(days=1)
+    return day
+
+
+def nyse_holidays(year):
+    """Full-day closures and 13:00 early closes for NYSE and NASDAQ"""
+    holidays = set()
+    new_year = date(year, 1, 1)
+    # NYSE does not observe New Year's Day on the Friday before when it falls on a Saturday
+    if new_year.weekday() != 5:
+        holidays.add(_observed_us(new_year))
+    holidays.add(nth_weekday(year, 1, 0, 3))    # Martin Luther King Jr. Day
+    holidays.add(nth_weekday(year, 2, 0, 3))    # Washington's Birthday
+    holidays.add(easter_sunday(year) - timedelta(days=2))   # Good Friday
+    holidays.add(nth_weekday(year, 5, 0, -1))   # Memorial Day
+    if year >= 2022:
+        holidays.add(_observed_us(date(year, 6, 19)))   # Juneteenth
+    holidays.add(_observed_us(date(year, 7, 4)))
+    holidays.add(nth_weekday(year, 9, 0, 1))    # Labor Day
+    thanksgiving = nth_weekday(year, 11, 3, 4)
+    holidays.add(thanksgiving)
+    holidays.add(_observed_us(date(year, 12, 25)))
+
+    early_closes = {date(year, 7, 3), thanksgiving + timedelta(days=1), date(year, 12, 24)}
+    early_closes = {day for day in early_closes if day.weekday() < 5 and day not in holidays}
+    return holidays, {day: time(13, 0) for day in early_closes}
+
+
+def lse_holidays(year):
+    """Full-day closures (England and Wales bank holidays) and 12:30 early closes for the LSE"""
+    holidays = set()
+    new_year = date(year, 1, 1)
+    holidays.add(new_year + timedelta(days={5: 2, 6: 1}.get(new_year.weekday(), 0)))
+    easter = easter_sunday(year)
+    holidays.add(easter - timedelta(days=2))    # Good Friday
+    holidays.add(easter + timedelta(days=1))    # Easter Monday
+    holidays.add(nth_weekday(year, 5, 0, 1))    # Early May bank holiday
+    holidays.add(nth_weekday(year, 5, 0, -1))   # Spring bank holiday
+    holidays.add(nth_weekday(year, 8, 0, -1))   # Summer bank holiday
+
+    # Christmas and Boxing Day move to the next free weekdays when they fall at a weekend
+    for day in (date(year, 12, 25), date(year, 12, 26)):
+        while day.weekday() >= 5 or day in holidays:
+            day += timedelta(days=1)
+        holidays.add(day)
+
+    early_closes = {day for day in (date(year, 12, 24), date(year, 12, 31))
+                    if day.weekday() < 5 and day not in holidays}
+    return holidays, {day: time(12, 30) for day in early_closes}
+
+
+class ExchangeCalendar:
+    """
+    Regular sessions for one exchange in its local time zone.
+
+    holiday_rules(year) returns (closed dates, {date: early close time}).
+    special_closures and special_sessions override the rules for one-off
+    events, such as national days of mourning or moved bank holidays.
+    """
+
+    def __init__(self, name, timezone, open_time, close_time, holiday_rules,
+                 special_closures=(), special_sessions=()):
+        self.name = name
+        self.tz = ZoneInfo(timezone)
+        self.open_time = open_time
+        self.close_time = close_time
+        self.holiday_rules = holiday_rules
+        self.special_closures = frozenset(special_closures)
+        self.special_sessions = frozenset(special_sessions)
+        self._year_rules = lru_cache(maxsize=16)(holiday_rules)
+
+    def is_trading_day(self, day):
+        if day in self.special_sessions:
+            return True
+        if day.weekday() >= 5 or day in self.special_closures:
+            return False
+        return day not in self._year_rules(day.year)[0]
+
+    def session(self, day):
+        """(open, close) as aware datetimes for a trading day, or None if the exchange is closed"""
+        if not self.is_trading_day(day):
+            return None
+        close_time = self._year_rules(day.year)[1].get(day, self.close_time)
+        return (datetime.combine(day, self.open_time, tzinfo=self.tz),
+                datetime.combine(day, close_time, tzinfo=self.tz))
+
+    def _local_now(self, now):
+        return (now or datetime.now().astimezone()).astimezone(self.tz)
+
+    def sessions_from(self, now=None):
+        """Yield (open, close) for every session that has not yet closed, starting today"""
+        now = self._local_now(now)
+        day = now.date()
+        for _ in range(MAX_SESSION_SEARCH_DAYS):
+            session = self.session(day)
+            if session is not None and session[1] > now:
+                yield session
+            day += timedelta(days=1)
+
+    def is_open(self, now=None):
+        """True while a session is in progress"""
+        now = self._local_now(now)
+        for open_at, close_at in self.sessions_from(now):
+            return open_at <= now < close_at
+        return False
+
+    def next_open(self, now=None):
+        """Start of the next session that has not yet opened"""
+        now = self._local_now(now)
+        for open_at, _ in self.sessions_from(now):
+            if open_at > now:
+                return open_at
+        raise RuntimeError(f"No {self.name} session found within {MAX_SESSION_SEARCH_DAYS} days")
+
+    def next_close(self, now=None):
+        """End of the current session, or of the next one if the exchange is closed"""
+        for _, close_at in self.sessions_from(now):
+            return close_at
+        raise RuntimeError(f"No {self.name} session found within {MAX_SESSION_SEARCH_DAYS} days")
+
+    def previous_close(self, now=None):
+        """End of the most recent session that has already closed"""
+        now = self._local_now(now)
+        day = now.date()
+        for _ in range(MAX_SESSION_SEARCH_DAYS):
+            session = self.session(day)
+            if session is not None and session[1] <= now:
+                return session[1]
+            day -= timedelta(days=1)
+        raise RuntimeError(f"No {self.name} session found within {MAX_SESSION_SEARCH_DAYS} days")
+
+
+NYSE = ExchangeCalendar(
+    'NYSE', 'America/New_York', time(9, 30), time(16, 0), nyse_holidays,
+    special_closures={
+        date(2018, 12, 5),   # National day of mourning, President George H. W. Bush
+        date(2025, 1, 9),    # National day of mourning, President Jimmy Carter
+    }
+)
+
+LSE = ExchangeCalendar(
+    'LSE', 'Europe/London', time(8, 0), time(16, 30), lse_holidays,
+    special_closures={
+        date(2020, 5, 8),    # VE Day, moved Early May bank holiday
+        date(2022, 6, 2),    # Spring bank holiday, moved for the Platinum Jubilee
+        date(2022, 6, 3),    # Platinum Jubilee
+        date(2022, 9, 19),   # State funeral of Queen Elizabeth II
+        date(2023, 5, 8),    # Coronation of King Charles III
+    },
+    special_sessions={
+        date(2020, 5, 4),    # Early May bank holiday moved to 8 May
+        date(2022, 5, 30),   # Spring bank holiday moved to 2 June
+    }
+)
+
+# NASDAQ keeps the NYSE schedule
+EXCHANGES = {'NYSE': NYSE, 'NASDAQ': NYSE, 'LSE': LSE}
+
+# Ticker suffixes that identify a non-US listing: '.L' as used by utils.py, '.LON' as
+# Alpha Vantage writes London symbols
+SUFFIX_EXCHANGES = {'.L': 'LSE', '.LON': 'LSE'}
+
+
+def calendar_for(symbol=None, exchange=None):
+    """The calendar for an exchange name, or else for a ticker's suffix; US listings by default"""
+    if exchange and exchange.upper() in EXCHANGES:
+        return EXCHANGES[exchange.upper()]
+    symbol = str(symbol or '').upper()
+    for suffix, name in SUFFIX_EXCHANGES.items():
+        if symbol.endswith(suffix):
+            return EXCHANGES[name]
+    return NYSE
+
+
+def _naive_local(moment):
+    # Cache records store naive local datetimes
+    return moment.astimezone().replace(tzinfo=None)
+
+
+class MarketHoursTTL:
+    """
+    Cache expiry that follows the listing's exchange instead of a fixed duration.
+
+    Prices can only change while the market is open, so an entry fetched after the
+    close (plus a settle delay for the final print) stays valid until the next
+    relevant event: the next open for quotes, the next close for daily bars.
+    Weekends and holidays therefore cause no refetches at all.
+    """
+
+    def __init__(self, intraday=DEFAULT_INTRADAY_TTL, settle=DEFAULT_SETTLE):
+        self.intraday = intraday
+        self.settle = settle
+
+    def _trading(self, calendar, now):
+        """(in session, session end including settle delay) for the moment given"""
+        session_end = calendar.previous_close(now) + self.settle
+        if now < session_end:
+            return True, session_end
+        if calendar.is_open(now):
+            return True, calendar.next_close(now) + self.settle
+        return False, None
+
+    def quote_expiry(self, symbol=None, exchange=None, now=None, intraday=None):
+        """Intraday prices: a short TTL while trading, otherwise until the next open"""
+        calendar = calendar_for(symbol, exchange)
+        now = (now or datetime.now().astimezone()).astimezone(calendar.tz)
+        trading, session_end = self._trading(calendar, now)
+        if trading:
+            return _naive_local(min(now + (intraday or self.intraday), session_end))
+        return _naive_local(calendar.next_open(now))
+
+    def daily_expiry(self, symbol=None, exchange=None, now=None, at_least=None):
+        """
+        Daily bars: until the current or next session has closed and settled.
+        at_least pushes the expiry past a minimum lifetime, rounded up to a session end.
+        """
+        calendar = calendar_for(symbol, exchange)
+        now = (now or datetime.now().astimezone()).astimezone(calendar.tz) + (at_least or timedelta(0))
+        trading, session_end = self._trading(calendar, now)
+        if trading:
+            return _naive_local(session_end)
+        return _naive_local(calendar.next_close(now) + self.settle)
+
+
+market_hours_ttl = MarketHoursTTL()
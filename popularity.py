@@ -0,0 +1,134 @@
+"""
+Ticker Popularity
+Counts how often members open each ticker, as daily counters that fade with
+age, so cache warming can favour what is actually being looked at
+"""
+
+import os
+import time
+import sqlite3
+from datetime import date, timedelta
+from resp_client import shared_client
+
+DEFAULT_DB_PATH = os.getenv('POPULARITY_DB_PATH', os.path.join('cache', 'popularity.db'))
+
+# An open counts half as much after this many days
+HALF_LIFE_DAYS = 14
+
+# Opens older than this are forgotten
+WINDOW_DAYS = 60
+
+
+def _today():
+    return date.fromisoformat(time.strftime('%Y-%m-%d', time.gmtime()))
+
+
+def decayed_scores(counts, today=None):
+    """Turn {ticker: {day: opens}} into {ticker: score}, halving each open's weight every HALF_LIFE_DAYS"""
+    today = today or _today()
+    scores = {}
+    for ticker, days in counts.items():
+        scores[ticker] = sum(
+            opens * 0.5 ** ((today - date.fromisoformat(day)).days / HALF_LIFE_DAYS)
+            for day, opens in days.items()
+        )
+    return scores
+
+
+class PopularityTracker:
+    """Least-frequently-used style counters shared by every process on the host through SQLite"""
+
+    def __init__(self, db_path=None):
+        self.db_path = db_path or DEFAULT_DB_PATH
+        db_dir = os.path.dirname(self.db_path)
+        if db_dir and not os.path.exists(db_dir):
+            os.makedirs(db_dir, exist_ok=True)
+        conn = self._connect()
+        try:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS ticker_opens (
+                    ticker TEXT NOT NULL,
+                    day TEXT NOT NULL,
+                    opens INTEGER NOT NULL,
+                    PRIMARY KEY (ticker, day)
+                )
+            """)
+        finally:
+            conn.close()
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+
+    def record(self, ticker):
+        """Count one open of a ticker"""
+        ticker = str(ticker).strip().upper()
+        if not ticker:
+            return
+        today = _today()
+        conn = self._connect()
+        try:
+            conn.execute(
+                'INSERT INTO ticker_opens (ticker, day, opens) VALUES (?, ?, 1) '
+                'ON CONFLICT (ticker, day) DO UPDATE SET opens = opens + 1',
+                (ticker, today.isoformat())
+            )
+            conn.execute('DELETE FROM ticker_opens WHERE day < ?',
+                         ((today - timedelta(days=WINDOW_DAYS)).isoformat(),))
+        finally:
+            conn.close()
+
+    def counts(self):
+        """Return {ticker: {day: opens}} for the window"""
+        cutoff = (_today() - timedelta(days=WINDOW_DAYS)).isoformat()
+        conn = self._connect()
+        try:
+            counts = {}
+            for ticker, day, opens in conn.execute(
+                'SELECT ticker, day, opens FROM ticker_opens WHERE day >= ?', (cutoff,)
+            ):
+                counts.setdefault(ticker, {})[day] = opens
+            return counts
+        finally:
+            conn.close()
+
+    def top(self, limit=None):
+        """Return [(ticker, score)] with the most popular first"""
+        ranked = sorted(decayed_scores(self.counts()).items(), key=lambda item: item[1], reverse=True)
+        return ranked[:limit] if limit else ranked
+
+
+class RedisPopularityTracker(PopularityTracker):
+    """The same counters, shared by every replica through Redis"""
+
+    def __init__(self, client, prefix='popularity:'):
+        self.client = client
+        self.prefix = prefix
+
+    def record(self, ticker):
+        ticker = str(ticker).strip().upper()
+        if not ticker:
+            return
+        key = f"{self.prefix}{_today().isoformat()}:{ticker}"
+        if self.client.incrby(key) == 1:
+            self.client.pexpire(key, WINDOW_DAYS * 86400 * 1000)
+
+    def counts(self):
+        counts = {}
+        for key in self.client.scan_iter(match=f"{self.prefix}*"):
+            key = key.decode() if isinstance(key, bytes) else key
+            day, _, ticker = key[len(self.prefix):].partition(':')
+            opens = self.client.get(key)
+            if opens is not None:
+                counts.setdefault(ticker, {})[day] = int(opens)
+        return counts
+
+
+def create_popularity_tracker():
+    """Popularity counters shared through Redis when REDIS_URL is set, otherwise through SQLite"""
+    client = shared_client()
+    if client is not None:
+        return RedisPopularityTracker(client)
+    return PopularityTracker()
+
+
+popularity = create_popularity_tracker()
@@ -0,0 +1,124 @@
+"""
+Alpha Vantage Daily Series Decoder
+Turns 'Time Series (Daily)' data straight into sorted NumPy columns
+"""
+
+import re
+import json
+import codecs
+from array import array
+from datetime import date
+from itertools import chain
+from operator import itemgetter
+import numpy as np
+
+DAILY_FIELDS = ('1. open', '2. high', '3. low', '4. close', '5. volume')
+VALUE_COLUMNS = ('open', 'high', 'low', 'close', 'volume')
+
+_get_fields = itemgetter(*DAILY_FIELDS)
+_EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+
+def decode_daily_series(time_series):
+    """
+    Decode an Alpha Vantage daily time series into ascending NumPy columns.
+
+    Returns a dictionary with 'date' (int32 days since 1970-01-01) and float64
+    'open', 'high', 'low', 'close' and 'volume' arrays. All five value columns
+    share one contiguous (5, n) block, so decoding makes a single large allocation
+    instead of one Python float and DataFrame cell per value.
+    """
+    n = len(time_series)
+    if n == 0:
+        columns = {'date': np.empty(0, dtype=np.int32)}
+        columns.update({name: np.empty(0, dtype=np.float64) for name in VALUE_COLUMNS})
+        return columns
+
+    # numpy parses the ISO date strings and the numeric strings in C
+    dates = np.array(list(time_series), dtype='datetime64[D]').astype(np.int32)
+    values = np.array(
+        list(chain.from_iterable(map(_get_fields, time_series.values()))),
+        dtype=np.float64
+    ).reshape(n, len(DAILY_FIELDS))
+
+    return _to_columns(dates, values)
+
+
+def _to_columns(dates, values):
+    """Sort (n,) dates and (n, 5) values ascending into a dictionary of columns"""
+    n = len(dates)
+
+    # Alpha Vantage lists the newest bar first; fall back to a sort for any other order
+    if n > 1 and dates[0] > dates[-1] and np.all(dates[:-1] > dates[1:]):
+        order = slice(None, None, -1)
+    elif n > 1 and not np.all(dates[:-1] < dates[1:]):
+        order = np.argsort(dates, kind='stable')
+    else:
+        order = slice(None)
+
+    block = np.ascontiguousarray(values[order].T)
+    columns = {'date': np.ascontiguousarray(dates[order])}
+    for index, name in enumerate(VALUE_COLUMNS):
+        columns[name] = block[index]
+    return columns
+
+
+class DailySeriesStreamParser:
+    """
+    Incremental parser for TIME_SERIES_DAILY response bodies.
+
+    Feed raw byte chunks as they arrive; each complete bar is parsed and appended
+    to compact typed buffers, and the consumed text is discarded. Memory held by
+    the parser is one network chunk plus 48 bytes per bar, instead of the whole
+    document and its nested dictionaries.
+    """
+
+    SERIES_KEY = '"Time Series (Daily)"'
+    _BAR_RE = re.compile(r'"(\d{4}-\d{2}-\d{2})"\s*:\s*\{([^{}]*)\}')
+    _FIELD_RE = re.compile(r'"([1-5])\.[^"]*"\s*:\s*"([^"]*)"')
+    _META_RE = re.compile(r'"Meta Data"\s*:\s*(\{[^{}]*\})')
+
+    def __init__(self):
+        self._decoder = codecs.getincrementaldecoder('utf-8')()
+        self._buffer = ''
+        self._header = ''
+        self._in_series = False
+        self._dates = array('i')
+        self._values = array('d')
+
+    def feed(self, chunk):
+        """Consume the next chunk of the response body"""
+        self._buffer += self._decoder.decode(chunk)
+
+        if not self._in_series:
+            position = self._buffer.find(self.SERIES_KEY)
+            if position < 0:
+                return
+            self._header = self._buffer[:position]
+            self._buffer = self._buffer[position + len(self.SERIES_KEY):]
+            self._in_series = True
+
+        consumed = 0
+        for match in self._BAR_RE.finditer(self._buffer):
+            fields = dict(self._FIELD_RE.findall(match.group(2)))
+            self._dates.append(date.fromisoformat(match.group(1)).toordinal() - _EPOCH_ORDINAL)
+            self._values.extend(float(fields[str(index)]) for index in range(1, 6))
+            consumed = match.end()
+        self._buffer = self._buffer[consumed:]
+
+    def close(self):
+        """
+        Finish parsing. Returns {'Meta Data': ..., 'bars': columns} for a time series
+        body, or the decoded JSON document for anything else (e.g. an API error).
+        """
+        self._buffer += self._decoder.decode(b'', final=True)
+        if not self._in_series:
+            return json.loads(self._buffer)
+
+        meta_match = self._META_RE.search(self._header)
+        meta = json.loads(meta_match.group(1)) if meta_match else {}
+
+        dates = np.frombuffer(self._dates, dtype=np.int32) if self._dates else np.empty(0, dtype=np.int32)
+        values = np.frombuffer(self._values, dtype=np.float64) if self._values else np.empty(0)
+        values = values.reshape(len(dates), len(VALUE_COLUMNS))
+        return {'Meta Data': meta, 'bars': _to_columns(dates, values)}
@@ -0,0 +1,176 @@
+"""
+Columnar Price Store
+One memory-mapped file of daily OHLCV columns per ticker
+"""
+
+import os
+import struct
+import tempfile
+import threading
+import numpy as np
+
+# File layout: 16-byte header, then each column stored contiguously.
+# Dates are int32 days since 1970-01-01; prices and volume are float64.
+MAGIC = b'PXS1'
+HEADER = struct.Struct('<4sIQ')  # magic, column count, row count
+DATE_DTYPE = np.dtype('<i4')
+VALUE_DTYPE = np.dtype('<f8')
+VALUE_COLUMNS = ('open', 'high', 'low', 'close', 'volume')
+COLUMNS = ('date',) + VALUE_COLUMNS
+
+
+def to_day_number(value):
+    """Convert a date, datetime64 or 'YYYY-MM-DD' string to int32 days since the epoch"""
+    return np.datetime64(value, 'D').astype(DATE_DTYPE)
+
+
+def from_day_number(day):
+    """Convert int32 days since the epoch back to a numpy datetime64[D]"""
+    return np.datetime64(int(day), 'D')
+
+
+class PriceStore:
+    def __init__(self, root=os.path.join('cache', 'prices')):
+        self.root = root
+        self._write_lock = threading.Lock()
+        if not os.path.exists(root):
+            os.makedirs(root, exist_ok=True)
+
+    def _path(self, ticker):
+        safe_ticker = ticker.upper().replace('/', '_')
+        return os.path.join(self.root, f"{safe_ticker}.pxs")
+
+    @staticmethod
+    def _date_block_size(rows):
+        # Pad the int32 date column so the float64 columns stay 8-byte aligned
+        size = rows * DATE_DTYPE.itemsize
+        return size + (-size % VALUE_DTYPE.itemsize)
+
+    def _map(self, ticker):
+        """Memory-map a ticker's file and return column views, or None if it does not exist"""
+        path = self._path(ticker)
+        if not os.path.exists(path):
+            return None
+
+        with open(path, 'rb') as f:
+            magic, column_count, rows = HEADER.unpack(f.read(HEADER.size))
+        if magic != MAGIC or column_count != len(COLUMNS):
+            raise ValueError(f"Unrecognised price store file for {ticker}")
+        if rows == 0:
+            return {name: np.empty(0, DATE_DTYPE if name == 'date' else VALUE_DTYPE) for name in COLUMNS}
+
+        raw = np.memmap(path, dtype=np.uint8, mode='r')
+        offset = HEADER.size
+        columns = {'date': raw[offset:offset + rows * DATE_DTYPE.itemsize].view(DATE_DTYPE)}
+        offset += self._date_block_size(rows)
+        for name in VALUE_COLUMNS:
+            columns[name] = raw[offset:offset + rows * VALUE_DTYPE.itemsize].view(VALUE_DTYPE)
+            offset += rows * VALUE_DTYPE.itemsize
+        return columns
+
+    def _write(self, ticker, columns):
+        """Atomically replace a ticker's file; open readers keep their old mapping"""
+        rows = len(columns['date'])
+        path = self._path(ticker)
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(HEADER.pack(MAGIC, len(COLUMNS), rows))
+                dates = np.ascontiguousarray(columns['date'], dtype=DATE_DTYPE)
+                f.write(dates.tobytes())
+                f.write(b'\0' * (self._date_block_size(rows) - dates.nbytes))
+                for name in VALUE_COLUMNS:
+                    f.write(np.ascontiguousarray(columns[name], dtype=VALUE_DTYPE).tobytes())
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def append(self, ticker, bars):
+        """
+        Merge new bars into a ticker's history.
+        bars maps each column name to an array; 'date' may be int32 day numbers or datetime64.
+        Bars for a date already stored replace the stored values. Returns the number of new dates.
+        """
+        new_dates = np.asarray(bars['date'])
+        if np.issubdtype(new_dates.dtype, np.datetime64):
+            new_dates = new_dates.astype('datetime64[D]').astype(DATE_DTYPE)
+        new_dates = new_dates.astype(DATE_DTYPE, copy=False)
+        if len(new_dates) == 0:
+            return 0
+
+        with self._write_lock:
+            existing = self._map(ticker)
+            if existing is None or len(existing['date']) == 0:
+                merged = {'date': new_dates}
+                merged.update({name: np.asarray(bars[name], dtype=VALUE_DTYPE) for name in VALUE_COLUMNS})
+                added = len(np.unique(new_dates))
+            else:
+                # New bars go last so they win when duplicates are dropped below
+                merged = {'date': np.concatenate([existing['date'], new_dates])}
+                for name in VALUE_COLUMNS:
+                    merged[name] = np.concatenate([existing[name], np.asarray(bars[name], dtype=VALUE_DTYPE)])
+                added = len(np.setdiff1d(new_dates, existing['date']))
+
+            # Keep the last occurrence of each date, sorted ascending
+            order = np.argsort(merged['date'], kind='stable')[::-1]
+            _, first_of_reversed = np.unique(merged['date'][order], return_index=True)
+            keep = order[first_of_reversed]
+            merged = {name: values[keep] for name, values in merged.items()}
+
+            self._write(ticker, merged)
+            return added
+
+    def read(self, ticker, start=None, end=None):
+        """
+        Return memory-mapped column views for bars between start and end (inclusive).
+        Returns None if the ticker has no stored history.
+        """
+        columns = self._map(ticker)
+        if columns is None:
+            return None
+
+        dates = columns['date']
+        lo = 0 if start is None else np.searchsorted(dates, to_day_number(start), side='left')
+        hi = len(dates) if end is None else np.searchsorted(dates, to_day_number(end), side='right')
+        return {name: values[lo:hi] for name, values in columns.items()}
+
+    def latest_date(self, ticker):
+        """Return the most recent stored date as datetime64[D], or None"""
+        columns = self._map(ticker)
+        if columns is None or len(columns['date']) == 0:
+            return None
+        return from_day_number(columns['date'][-1])
+
+    def coverage(self, ticker):
+        """Return the first date, last date and bar count stored for a ticker"""
+        columns = self._map(ticker)
+        if columns is None or len(columns['date']) == 0:
+            return None
+        return {
+            'ticker': ticker.upper(),
+            'start': str(from_day_number(columns['date'][0])),
+            'end': str(from_day_number(columns['date'][-1])),
+            'bars': len(columns['date'])
+        }
+
+    def list_coverage(self):
+        """Return coverage for every ticker in the store"""
+        results = []
+        for filename in sorted(os.listdir(self.root)):
+            if filename.endswith('.pxs'):
+                coverage = self.coverage(filename[:-len('.pxs')])
+                if coverage:
+                    results.append(coverage)
+        return results
+
+    def delete(self, ticker):
+        """Remove a ticker's stored history"""
+        path = self._path(ticker)
+        if os.path.exists(path):
+            os.remove(path)
+
+
+# Global price store instance
+price_store = PriceStore()
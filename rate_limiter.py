@@ -0,0 +1,522 @@
+"""
+Token Bucket Rate Limiter
+Cross-process rate limiting backed by a shared SQLite file, or by a Redis-compatible
+server when several replicas must share one budget
+"""
+
+import os
+import time
+import sqlite3
+from contextlib import contextmanager
+from resp_client import RESPClient, shared_client
+
+DEFAULT_DB_PATH = os.getenv('RATE_LIMIT_DB_PATH', os.path.join('cache', 'rate_limits.db'))
+
+# How long a Redis bucket mutex is held at most if its holder dies mid-update
+REDIS_MUTEX_MS = 5000
+
+# Priority lanes for waiters, most urgent first
+LANES = ('interactive', 'prefetch', 'background')
+DEFAULT_LANE = 'interactive'
+
+# A waiter moves up one lane for every this many seconds it has waited, so lower lanes never starve
+LANE_AGING_SECONDS = 30.0
+
+
+def lane_priority(lane):
+    """Priority class of a lane; 0 is the most urgent"""
+    if lane not in LANES:
+        raise ValueError(f"Unknown lane '{lane}'. Expected one of: {', '.join(LANES)}")
+    return LANES.index(lane)
+
+
+def resolve_lane(lane):
+    """A lane is a name, or a callable returning one for a waiter whose urgency can change"""
+    return lane() if callable(lane) else lane
+
+
+class RateLimitTimeout(Exception):
+    """Raised when a token could not be acquired before the timeout"""
+    pass
+
+
+class TokenBucketRateLimiter:
+    """
+    Token bucket shared by every process on the host that opens the same database.
+
+    Waiters take a ticket in a priority lane. The next token goes to the most
+    urgent lane and, within a lane, strictly in ticket order, so a burst of
+    requests from one Streamlit session cannot starve the others. Waiting ages a
+    ticket into more urgent lanes, so background work still progresses. Tickets
+    from processes that died while waiting are dropped once their heartbeat goes stale.
+    """
+
+    def __init__(self, name, rate, per=60.0, burst=1, db_path=None, stale_after=60.0):
+        self.name = name
+        self.rate = rate
+        self.per = per
+        self.burst = burst
+        self.db_path = db_path or DEFAULT_DB_PATH
+        self.stale_after = stale_after
+        self.poll_interval = 0.25
+
+        db_dir = os.path.dirname(self.db_path)
+        if db_dir and not os.path.exists(db_dir):
+            os.makedirs(db_dir, exist_ok=True)
+        self._init_db()
+
+    @property
+    def tokens_per_second(self):
+        return self.rate / self.per
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.execute('PRAGMA journal_mode=WAL')
+        return conn
+
+    def _init_db(self):
+        conn = self._connect()
+        try:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS buckets (
+                    name TEXT PRIMARY KEY,
+                    tokens REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS waiters (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    bucket TEXT NOT NULL,
+                    heartbeat REAL NOT NULL,
+                    priority INTEGER NOT NULL,
+                    enqueued_at REAL NOT NULL
+                )
+            """)
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_waiters_bucket ON waiters (bucket, id)')
+        finally:
+            conn.close()
+
+    def _refill(self, conn, now):
+        """Return the current token count for this bucket after refilling it"""
+        row = conn.execute(
+            'SELECT tokens, updated_at FROM buckets WHERE name = ?', (self.name,)
+        ).fetchone()
+        if row is None:
+            conn.execute(
+                'INSERT INTO buckets (name, tokens, updated_at) VALUES (?, ?, ?)',
+                (self.name, float(self.burst), now)
+            )
+            return float(self.burst)
+        tokens, updated_at = row
+        elapsed = max(now - updated_at, 0.0)
+        return min(float(self.burst), tokens + elapsed * self.tokens_per_second)
+
+    def _try_acquire(self, conn, ticket, tokens, priority):
+        """Take tokens if this ticket is at the head of the queue; return seconds to wait otherwise"""
+        now = time.time()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.execute(
+                'DELETE FROM waiters WHERE bucket = ? AND heartbeat < ? AND id != ?',
+                (self.name, now - self.stale_after, ticket)
+            )
+            conn.execute('UPDATE waiters SET heartbeat = ?, priority = ? WHERE id = ?', (now, priority, ticket))
+            head = conn.execute(
+                'SELECT id FROM waiters WHERE bucket = ? ORDER BY priority - (? - enqueued_at) / ?, id LIMIT 1',
+                (self.name, now, LANE_AGING_SECONDS)
+            ).fetchone()[0]
+            available = self._refill(conn, now)
+
+            if head == ticket and available >= tokens:
+                conn.execute(
+                    'UPDATE buckets SET tokens = ?, updated_at = ? WHERE name = ?',
+                    (available - tokens, now, self.name)
+                )
+                conn.execute('DELETE FROM waiters WHERE id = ?', (ticket,))
+                conn.execute('COMMIT')
+                return 0.0
+
+            conn.execute(
+                'UPDATE buckets SET tokens = ?, updated_at = ? WHERE name = ?',
+                (available, now, self.name)
+            )
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+        if head == ticket:
+            return (tokens - available) / self.tokens_per_second
+        return self.poll_interval
+
+    def acquire(self, tokens=1, timeout=None, lane=DEFAULT_LANE):
+        """
+        Block until tokens are available and return the number of seconds waited.
+        Raises RateLimitTimeout if the wait would exceed the timeout.
+        A callable lane is re-read while waiting, so a waiter can be promoted.
+        """
+        if tokens > self.burst:
+            raise ValueError(f"Cannot acquire {tokens} tokens from a bucket of size {self.burst}")
+
+        start = time.time()
+        conn = self._connect()
+        try:
+            ticket = conn.execute(
+                'INSERT INTO waiters (bucket, heartbeat, priority, enqueued_at) VALUES (?, ?, ?, ?)',
+                (self.name, start, lane_priority(resolve_lane(lane)), start)
+            ).lastrowid
+            try:
+                while True:
+                    wait = self._try_acquire(conn, ticket, tokens, lane_priority(resolve_lane(lane)))
+                    if wait <= 0:
+                        return time.time() - start
+                    if timeout is not None and time.time() - start + wait > timeout:
+                        raise RateLimitTimeout(
+                            f"Rate limit '{self.name}' not available within {timeout} seconds"
+                        )
+                    # Sleep in short slices so the heartbeat stays fresh
+                    time.sleep(min(wait, self.poll_interval * 4))
+            except BaseException:
+                conn.execute('DELETE FROM waiters WHERE id = ?', (ticket,))
+                raise
+        finally:
+            conn.close()
+
+    def available_tokens(self):
+        """Return the number of tokens that could be taken right now"""
+        conn = self._connect()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            available = self._refill(conn, time.time())
+            conn.execute('ROLLBACK')
+            return available
+        finally:
+            conn.close()
+
+    def queue_length(self, lane=None):
+        """Return the number of waiters currently queued on this bucket, or in one lane of it"""
+        conn = self._connect()
+        try:
+            if lane is None:
+                return conn.execute(
+                    'SELECT COUNT(*) FROM waiters WHERE bucket = ?', (self.name,)
+                ).fetchone()[0]
+            return conn.execute(
+                'SELECT COUNT(*) FROM waiters WHERE bucket = ? AND priority = ?', (self.name, lane_priority(lane))
+            ).fetchone()[0]
+        finally:
+            conn.close()
+
+
+class DailyQuota:
+    """
+    Per-day call counter shared through the same SQLite file as the token buckets.
+    Days roll over at midnight UTC. Calls made for a lane are also counted per lane.
+    """
+
+    def __init__(self, name, limit, db_path=None):
+        self.name = name
+        self.limit = limit
+        self.db_path = db_path or DEFAULT_DB_PATH
+
+        db_dir = os.path.dirname(self.db_path)
+        if db_dir and not os.path.exists(db_dir):
+            os.makedirs(db_dir, exist_ok=True)
+        conn = self._connect()
+        try:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS daily_usage (
+                    name TEXT NOT NULL,
+                    day TEXT NOT NULL,
+                    used INTEGER NOT NULL,
+                    PRIMARY KEY (name, day)
+                )
+            """)
+        finally:
+            conn.close()
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+
+    @staticmethod
+    def _today():
+        return time.strftime('%Y-%m-%d', time.gmtime())
+
+    def used(self):
+        """Return the number of calls recorded today"""
+        conn = self._connect()
+        try:
+            row = conn.execute(
+                'SELECT used FROM daily_usage WHERE name = ? AND day = ?', (self.name, self._today())
+            ).fetchone()
+            return row[0] if row else 0
+        finally:
+            conn.close()
+
+    def remaining(self):
+        """Return the number of calls still available today"""
+        return max(self.limit - self.used(), 0)
+
+    def used_by_lane(self):
+        """Return today's calls for each lane"""
+        conn = self._connect()
+        try:
+            rows = dict(conn.execute(
+                'SELECT name, used FROM daily_usage WHERE name LIKE ? AND day = ?', (f'{self.name}@%', self._today())
+            ).fetchall())
+            return {lane: rows.get(f'{self.name}@{lane}', 0) for lane in LANES}
+        finally:
+            conn.close()
+
+    def try_consume(self, calls=1, lane=None):
+        """Record calls against today's budget, returning False if it would be exceeded"""
+        conn = self._connect()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            day = self._today()
+            row = conn.execute(
+                'SELECT used FROM daily_usage WHERE name = ? AND day = ?', (self.name, day)
+            ).fetchone()
+            used = row[0] if row else 0
+            if used + calls > self.limit:
+                conn.execute('ROLLBACK')
+                return False
+            conn.execute(
+                'INSERT OR REPLACE INTO daily_usage (name, day, used) VALUES (?, ?, ?)',
+                (self.name, day, used + calls)
+            )
+            if lane is not None:
+                conn.execute(
+                    'INSERT INTO daily_usage (name, day, used) VALUES (?, ?, ?) '
+                    'ON CONFLICT (name, day) DO UPDATE SET used = used + excluded.used',
+                    (f'{self.name}@{lane}', day, calls)
+                )
+            conn.execute('COMMIT')
+            return True
+        finally:
+            conn.close()
+
+    def seconds_until_reset(self):
+        """Return the number of seconds until the next UTC midnight"""
+        now = time.time()
+        return 86400 - (now % 86400)
+
+
+class RedisTokenBucketRateLimiter:
+    """
+    The same prioritised, ticket-ordered token bucket, shared by every replica through Redis.
+
+    Bucket updates happen under a short-lived mutex key and use the server clock,
+    so replicas with skewed clocks still refill the bucket consistently. Each lane
+    has its own ticket queue. Each waiter keeps a heartbeat key alive, holding the
+    time it joined; tickets whose heartbeat has expired are skipped when they
+    reach the head of their lane.
+    """
+
+    def __init__(self, name, rate, per=60.0, burst=1, client=None, stale_after=60.0, prefix='ratelimit:'):
+        self.name = name
+        self.rate = rate
+        self.per = per
+        self.burst = burst
+        self.client = client or RESPClient()
+        self.stale_after = stale_after
+        self.poll_interval = 0.25
+        self._base = f"{prefix}{name}"
+
+    @property
+    def tokens_per_second(self):
+        return self.rate / self.per
+
+    def _heartbeat_key(self, lane, ticket):
+        return f"{self._base}:hb:{lane}:{ticket}"
+
+    def _enqueue(self, lane, enqueued_at=None):
+        """Take a ticket in a lane; returns (ticket, time the waiter joined)"""
+        with self._mutex():
+            ticket = self.client.incrby(f"{self._base}:next:{lane}")
+            enqueued_at = enqueued_at or self.client.time()
+            self.client.set(self._heartbeat_key(lane, ticket), repr(enqueued_at), px=self.stale_after * 1000)
+        return ticket, enqueued_at
+
+    def _lane_head(self, lane):
+        """Return (ticket, time it joined) for the lane's first live waiter, or None if the lane is empty"""
+        issued = int(self.client.get(f"{self._base}:next:{lane}") or 0)
+        first = serving = int(self.client.get(f"{self._base}:serving:{lane}") or 1)
+        head = None
+        # Skip tickets whose waiters gave up or died
+        while serving <= issued:
+            enqueued_at = self.client.get(self._heartbeat_key(lane, serving))
+            if enqueued_at is not None:
+                head = (serving, float(enqueued_at))
+                break
+            serving += 1
+        if serving != first:
+            self.client.set(f"{self._base}:serving:{lane}", serving)
+        return head
+
+    @contextmanager
+    def _mutex(self):
+        key = f"{self._base}:lock"
+        token = os.urandom(8).hex()
+        while not self.client.set(key, token, px=REDIS_MUTEX_MS, nx=True):
+            time.sleep(0.005)
+        try:
+            yield
+        finally:
+            # Only release our own lock; it may have expired and been taken by another replica
+            if self.client.get(key) == token.encode():
+                self.client.delete(key)
+
+    def _refill(self, now):
+        """Return the current token count for this bucket after refilling it"""
+        raw = self.client.get(f"{self._base}:bucket")
+        if raw is None:
+            return float(self.burst)
+        tokens, updated_at = map(float, raw.split())
+        elapsed = max(now - updated_at, 0.0)
+        return min(float(self.burst), tokens + elapsed * self.tokens_per_second)
+
+    def _store(self, tokens, now):
+        self.client.set(f"{self._base}:bucket", f"{tokens!r} {now!r}")
+
+    def _try_acquire(self, lane, ticket, enqueued_at, tokens):
+        """Take tokens if this ticket is at the head of the queue; return seconds to wait otherwise"""
+        with self._mutex():
+            now = self.client.time()
+            self.client.set(self._heartbeat_key(lane, ticket), repr(enqueued_at), px=self.stale_after * 1000)
+
+            # The head of the queue is the lane head with the best aged priority
+            head = None
+            for name in LANES:
+                lane_head = self._lane_head(name)
+                if lane_head is not None:
+                    score = lane_priority(name) - (now - lane_head[1]) / LANE_AGING_SECONDS
+                    if head is None or score < head[0]:
+                        head = (score, name, lane_head[0])
+            at_head = head is not None and head[1:] == (lane, ticket)
+
+            available = self._refill(now)
+            if at_head and available >= tokens:
+                self._store(available - tokens, now)
+                self.client.set(f"{self._base}:serving:{lane}", ticket + 1)
+                self.client.delete(self._heartbeat_key(lane, ticket))
+                return 0.0
+            self._store(available, now)
+
+        if at_head:
+            return (tokens - available) / self.tokens_per_second
+        return self.poll_interval
+
+    def acquire(self, tokens=1, timeout=None, lane=DEFAULT_LANE):
+        """
+        Block until tokens are available and return the number of seconds waited.
+        Raises RateLimitTimeout if the wait would exceed the timeout.
+        A callable lane is re-read while waiting, so a waiter can be promoted.
+        """
+        if tokens > self.burst:
+            raise ValueError(f"Cannot acquire {tokens} tokens from a bucket of size {self.burst}")
+
+        start = time.time()
+        current = resolve_lane(lane)
+        lane_priority(current)
+        ticket, enqueued_at = self._enqueue(current)
+        try:
+            while True:
+                wanted = resolve_lane(lane)
+                if wanted != current:
+                    # Move to the new lane's queue, keeping the time already waited
+                    self.client.delete(self._heartbeat_key(current, ticket))
+                    current = wanted
+                    ticket, _ = self._enqueue(current, enqueued_at)
+                wait = self._try_acquire(current, ticket, enqueued_at, tokens)
+                if wait <= 0:
+                    return time.time() - start
+                if timeout is not None and time.time() - start + wait > timeout:
+                    raise RateLimitTimeout(
+                        f"Rate limit '{self.name}' not available within {timeout} seconds"
+                    )
+                time.sleep(min(wait, self.poll_interval * 4))
+        except BaseException:
+            self.client.delete(self._heartbeat_key(current, ticket))
+            raise
+
+    def available_tokens(self):
+        """Return the number of tokens that could be taken right now"""
+        return self._refill(self.client.time())
+
+    def queue_length(self, lane=None):
+        """Return the number of tickets issued but not yet served, across lanes or in one"""
+        total = 0
+        for name in ([lane] if lane else LANES):
+            issued = int(self.client.get(f"{self._base}:next:{name}") or 0)
+            serving = int(self.client.get(f"{self._base}:serving:{name}") or 1)
+            total += max(issued - serving + 1, 0)
+        return total
+
+
+class RedisDailyQuota:
+    """
+    Per-day call counter shared by every replica through Redis. Days roll over at
+    midnight UTC. Calls made for a lane are also counted per lane.
+    """
+
+    def __init__(self, name, limit, client=None, prefix='quota:'):
+        self.name = name
+        self.limit = limit
+        self.client = client or RESPClient()
+        self.prefix = prefix
+
+    def _key(self, lane=None):
+        day = time.strftime('%Y-%m-%d', time.gmtime(self.client.time()))
+        return f"{self.prefix}{self.name}:{day}" + (f":{lane}" if lane else '')
+
+    def used(self):
+        """Return the number of calls recorded today"""
+        return int(self.client.get(self._key()) or 0)
+
+    def remaining(self):
+        """Return the number of calls still available today"""
+        return max(self.limit - self.used(), 0)
+
+    def used_by_lane(self):
+        """Return today's calls for each lane"""
+        return {lane: int(self.client.get(self._key(lane)) or 0) for lane in LANES}
+
+    def _count(self, key, calls):
+        used = self.client.incrby(key, calls)
+        if used == calls:
+            # First call of the day; keep yesterday's counter around briefly for reporting
+            self.client.pexpire(key, 2 * 86400 * 1000)
+        return used
+
+    def try_consume(self, calls=1, lane=None):
+        """Record calls against today's budget, returning False if it would be exceeded"""
+        key = self._key()
+        if self._count(key, calls) > self.limit:
+            self.client.incrby(key, -calls)
+            return False
+        if lane is not None:
+            self._count(self._key(lane), calls)
+        return True
+
+    def seconds_until_reset(self):
+        """Return the number of seconds until the next UTC midnight"""
+        now = self.client.time()
+        return 86400 - (now % 86400)
+
+
+def create_rate_limiter(name, rate, per=60.0, burst=1):
+    """Token bucket shared through Redis when REDIS_URL is set, otherwise through the local SQLite file"""
+    client = shared_client()
+    if client is not None:
+        return RedisTokenBucketRateLimiter(name, rate, per=per, burst=burst, client=client)
+    return TokenBucketRateLimiter(name, rate, per=per, burst=burst)
+
+
+def create_daily_quota(name, limit):
+    """Daily quota shared through Redis when REDIS_URL is set, otherwise through the local SQLite file"""
+    client = shared_client()
+    if client is not None:
+        return RedisDailyQuota(name, limit, client=client)
+    return DailyQuota(name, limit)
@@ -0,0 +1,115 @@
+"""
+Alpha Vantage Request Planner
+Works out the minimum set of API calls needed for a lookup before any are made
+"""
+
+# Views a caller can ask for, and the data each one needs
+VIEWS = {
+    'evaluation': 'Fundamentals and current price',
+    'history': 'Fundamentals and daily price history',
+}
+
+# Used for the latency estimate until the HTTP session has measured real requests
+DEFAULT_CALL_LATENCY = 1.0
+
+# Worst-case calls for a ticker lookup in each view, used before a search resolves
+MAX_TICKER_CALLS = {'evaluation': 2, 'history': 2}
+
+
+class RequestPlanner:
+    def __init__(self, fetcher):
+        self.fetcher = fetcher
+
+    def _cached(self, params):
+        """
+        Return the cache entry for a request, or None. Stale entries count too: they
+        are served at once and refreshed in the background. So do remembered failures,
+        which are answered without a call until they expire.
+        """
+        cache_key = self.fetcher._get_cache_key(params)
+        entry = self.fetcher.cache.get_cached_entry(*cache_key, track=False)
+        return entry if entry is not None else self.fetcher._failure_entry(cache_key)
+
+    def price_request(self, ticker_symbol, view='evaluation'):
+        """
+        Return the cheapest request that supplies the price data a view needs.
+        The overview is cached until the next results release, so its own price
+        is never current enough.
+        """
+        if view == 'history':
+            return self.fetcher._daily_prices_params(ticker_symbol)
+        # A single quote is a few hundred bytes against megabytes of daily history
+        return {'function': 'GLOBAL_QUOTE', 'symbol': ticker_symbol}
+
+    def _ticker_steps(self, ticker_symbol, view):
+        overview_params = {'function': 'OVERVIEW', 'symbol': ticker_symbol}
+        overview_entry = self._cached(overview_params)
+        steps = [self._step(overview_params, overview_entry, 'Company fundamentals')]
+
+        price_params = self.price_request(ticker_symbol, view)
+        reason = 'Daily price history' if view == 'history' else 'Current price'
+        cacheable = price_params['function'] != 'TIME_SERIES_DAILY' or price_params['outputsize'] == 'compact'
+        steps.append(self._step(price_params, self._cached(price_params) if cacheable else None, reason))
+        return steps
+
+    @staticmethod
+    def _step(params, entry, reason):
+        return {
+            'function': params['function'],
+            'params': params,
+            'cached': entry is not None,
+            'stale': bool(entry and entry['is_stale']),
+            'reason': reason
+        }
+
+    def _expected_latency(self, api_calls):
+        """Seconds spent waiting for rate-limit tokens plus network time"""
+        if api_calls == 0:
+            return 0.0
+        key_pool = self.fetcher.key_pool
+        interval = key_pool.per / key_pool.rate
+        queued = max(api_calls - int(key_pool.available_tokens()), 0)
+        per_call = self.fetcher.get_connection_stats()['avg_latency_seconds'] or DEFAULT_CALL_LATENCY
+        return queued * interval + api_calls * per_call
+
+    def plan(self, input_value, view='evaluation', estimate_latency=True):
+        """
+        Plan the calls for a ticker or company-name lookup without making any of them.
+        Returns the planned steps, the number of uncached API calls and the expected latency.
+        The latency estimate reads the rate limiters; without estimate_latency it is None.
+        """
+        if view not in VIEWS:
+            raise ValueError(f"Unknown view '{view}'. Expected one of: {', '.join(VIEWS)}")
+
+        input_value = input_value.strip()
+        steps = []
+        ticker_symbol = None
+        unresolved = False
+
+        if self.fetcher._is_ticker_input(input_value):
+            ticker_symbol = input_value.upper()
+        else:
+            search_params = {'function': 'SYMBOL_SEARCH', 'keywords': input_value}
+            search_entry = self._cached(search_params)
+            steps.append(self._step(search_params, search_entry, 'Resolve company name'))
+            if search_entry is not None:
+                ticker_symbol = self.fetcher._select_search_match(search_entry['data'])
+            unresolved = search_entry is None
+
+        # A listed symbol the evaluator cannot score is turned away without a call
+        if ticker_symbol and not self.fetcher._listing_rejection(ticker_symbol):
+            steps.extend(self._ticker_steps(ticker_symbol, view))
+
+        api_calls = sum(1 for step in steps if not step['cached'])
+        # An uncached search may resolve to a ticker whose own calls are not known yet
+        max_api_calls = api_calls + (MAX_TICKER_CALLS[view] if unresolved else 0)
+
+        return {
+            'input': input_value,
+            'ticker': ticker_symbol,
+            'view': view,
+            'steps': steps,
+            'api_calls': api_calls,
+            'max_api_calls': max_api_calls,
+            'expected_latency_seconds': self._expected_latency(api_calls) if estimate_latency else None
+        }
@@ -0,0 +1,213 @@
+"""
+Minimal Redis Protocol Client
+Just enough RESP2 to share cache entries, rate limits and locks between
+replicas through a Redis-compatible server, without the redis package
+"""
+
+import os
+import select
+import socket
+import threading
+from urllib.parse import urlparse, unquote
+
+DEFAULT_REDIS_URL = 'redis://localhost:6379/0'
+
+
+class RESPError(Exception):
+    """An error reply from the server"""
+    pass
+
+
+class RESPClient:
+    """
+    Blocking RESP2 client with one connection per thread.
+
+    Commands are sent as arrays of bulk strings and replies come back as Python
+    values: simple strings as str, bulk strings as bytes (None for nil), integers
+    as int and arrays as lists. A pooled connection the server has closed is
+    replaced before a command is sent. A failure after sending is raised rather
+    than retried, since the command may already have run (e.g. INCRBY).
+    """
+
+    def __init__(self, url=None, timeout=5.0):
+        self.url = url or os.getenv('REDIS_URL', DEFAULT_REDIS_URL)
+        parsed = urlparse(self.url)
+        if parsed.scheme != 'redis':
+            raise ValueError(f"Unsupported Redis URL scheme '{parsed.scheme}' (expected redis://)")
+        self.host = parsed.hostname or 'localhost'
+        self.port = parsed.port or 6379
+        self.db = int(parsed.path.lstrip('/') or 0)
+        self.username = unquote(parsed.username) if parsed.username else None
+        self.password = unquote(parsed.password) if parsed.password else None
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connect(self):
+        """Return this thread's connection, opening and authenticating it on first use"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None and self._is_closed(conn):
+            self._disconnect()
+            conn = None
+        if conn is None:
+            sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            conn = (sock, sock.makefile('rb'))
+            self._local.conn = conn
+            if self.password:
+                auth = ('AUTH', self.username, self.password) if self.username else ('AUTH', self.password)
+                self._call(conn, auth)
+            if self.db:
+                self._call(conn, ('SELECT', self.db))
+        return conn
+
+    @staticmethod
+    def _is_closed(conn):
+        """
+        An idle connection has nothing to read; if it is readable the server has
+        closed it (or sent something unsolicited), so it cannot be reused
+        """
+        try:
+            readable, _, _ = select.select([conn[0]], [], [], 0)
+        except (OSError, ValueError):
+            return True
+        return bool(readable)
+
+    def _disconnect(self):
+        conn = getattr(self._local, 'conn', None)
+        self._local.conn = None
+        if conn is not None:
+            try:
+                conn[1].close()
+                conn[0].close()
+            except OSError:
+                pass
+
+    @staticmethod
+    def _encode(args):
+        parts = [b'*%d\r\n' % len(args)]
+        for arg in args:
+            if isinstance(arg, bytes):
+                data = arg
+            elif isinstance(arg, str):
+                data = arg.encode('utf-8')
+            else:
+                data = str(arg).encode('ascii')
+            parts.append(b'$%d\r\n' % len(data))
+            parts.append(data)
+            parts.append(b'\r\n')
+        return b''.join(parts)
+
+    def _read_reply(self, reader):
+        line = reader.readline()
+        if not line.endswith(b'\r\n'):
+            raise ConnectionError('Connection closed by Redis server')
+        kind, body = line[:1], line[1:-2]
+        if kind == b'+':
+            return body.decode('utf-8')
+        if kind == b'-':
+            raise RESPError(body.decode('utf-8'))
+        if kind == b':':
+            return int(body)
+        if kind == b'$':
+            length = int(body)
+            if length < 0:
+                return None
+            data = reader.read(length + 2)
+            if len(data) != length + 2:
+                raise ConnectionError('Connection closed by Redis server')
+            return data[:-2]
+        if kind == b'*':
+            count = int(body)
+            if count < 0:
+                return None
+            return [self._read_reply(reader) for _ in range(count)]
+        raise RESPError(f"Unexpected reply type {kind!r}")
+
+    def _call(self, conn, args):
+        sock, reader = conn
+        sock.sendall(self._encode(args))
+        return self._read_reply(reader)
+
+    def execute(self, *args):
+        """Send one command and return its reply"""
+        payload = self._encode(args)
+        for attempt in (1, 2):
+            conn = self._connect()
+            try:
+                conn[0].sendall(payload)
+                break
+            except OSError:
+                # Nothing was applied: a command only runs once the server has all of it
+                self._disconnect()
+                if attempt == 2:
+                    raise
+        try:
+            return self._read_reply(conn[1])
+        except (ConnectionError, OSError):
+            # The command may have run, so sending it again could apply it twice
+            self._disconnect()
+            raise
+
+    def get(self, key):
+        return self.execute('GET', key)
+
+    def set(self, key, value, px=None, nx=False):
+        """SET with optional millisecond expiry; returns False if nx was given and the key exists"""
+        args = ['SET', key, value]
+        if px is not None:
+            args += ['PX', max(int(px), 1)]
+        if nx:
+            args.append('NX')
+        return self.execute(*args) == 'OK'
+
+    def delete(self, *keys):
+        return self.execute('DEL', *keys) if keys else 0
+
+    def exists(self, key):
+        return self.execute('EXISTS', key) == 1
+
+    def incrby(self, key, amount=1):
+        return self.execute('INCRBY', key, amount)
+
+    def pexpire(self, key, milliseconds):
+        return self.execute('PEXPIRE', key, max(int(milliseconds), 1)) == 1
+
+    def time(self):
+        """Server clock in seconds, so every replica measures time the same way"""
+        seconds, microseconds = self.execute('TIME')
+        return int(seconds) + int(microseconds) / 1e6
+
+    def scan_iter(self, match=None, count=500):
+        """Yield every key matching a glob pattern"""
+        cursor = b'0'
+        while True:
+            args = ['SCAN', cursor]
+            if match:
+                args += ['MATCH', match]
+            args += ['COUNT', count]
+            cursor, keys = self.execute(*args)
+            yield from keys
+            if cursor in (b'0', '0'):
+                break
+
+    def ping(self):
+        return self.execute('PING') == 'PONG'
+
+
+_shared_client = None
+_shared_lock = threading.Lock()
+
+
+def shared_client():
+    """
+    Return the process-wide client for REDIS_URL, or None if it is not set.
+    Setting REDIS_URL moves the cache, rate limits and request coalescing to Redis
+    so every replica shares them.
+    """
+    global _shared_client
+    if not os.getenv('REDIS_URL'):
+        return None
+    with _shared_lock:
+        if _shared_client is None:
+            _shared_client = RESPClient(os.getenv('REDIS_URL'))
+        return _shared_client
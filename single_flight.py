@@ -0,0 +1,150 @@
+"""
+Single-Flight Request Coalescing
+Concurrent requests for the same key share one upstream call, within a process
+and, through a lock file per key, across processes on the same host (or through
+a Redis lock, across replicas)
+"""
+
+import os
+import time
+import hashlib
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:
+    # No flock on this platform; coalescing is limited to the current process
+    fcntl = None
+
+DEFAULT_LOCK_DIR = os.getenv('SINGLE_FLIGHT_LOCK_DIR', os.path.join('cache', 'locks'))
+
+# Upper bound on one upstream call; a Redis lock outlives a crashed holder by at most this long
+REDIS_LOCK_LEASE_SECONDS = 120
+
+
+class _Call:
+    """An in-flight call and, once done, its shared result"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Run at most one call per key at a time.
+
+    Callers in the same process that arrive while a call is in flight wait for it
+    and receive the same result object, which must be treated as read-only. The
+    leader also holds an exclusive lock file for the key, so a leader in another
+    process waits for it and then runs recheck (typically a cache lookup) before
+    deciding whether its own upstream call is still needed. With a Redis client
+    the lock is a leased Redis key instead, which extends this to every replica.
+    """
+
+    def __init__(self, lock_dir=DEFAULT_LOCK_DIR, redis=None):
+        self.lock_dir = lock_dir
+        self.redis = redis
+        if redis is None and fcntl is not None and not os.path.exists(lock_dir):
+            os.makedirs(lock_dir, exist_ok=True)
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.coalesced = 0
+        self.coalesced_across_processes = 0
+
+    def _lock_path(self, key):
+        name = hashlib.md5(repr(key).encode()).hexdigest()
+        return os.path.join(self.lock_dir, f"{name}.lock")
+
+    @contextmanager
+    def _redis_lock(self, key):
+        """Hold the key's Redis lock; yields True if another replica had it first"""
+        lock_key = f"singleflight:{hashlib.md5(repr(key).encode()).hexdigest()}"
+        token = os.urandom(8).hex()
+        waited = False
+        while not self.redis.set(lock_key, token, px=REDIS_LOCK_LEASE_SECONDS * 1000, nx=True):
+            waited = True
+            time.sleep(0.1)
+        try:
+            yield waited
+        finally:
+            if self.redis.get(lock_key) == token.encode():
+                self.redis.delete(lock_key)
+
+    @contextmanager
+    def _process_lock(self, key):
+        """Hold the key's lock file; yields True if another process had it first"""
+        if self.redis is not None:
+            with self._redis_lock(key) as waited:
+                yield waited
+            return
+        if fcntl is None:
+            yield False
+            return
+        # Lock files are left in place: unlinking one while another process waits on it
+        # would let a third process lock a fresh file and run concurrently
+        with open(self._lock_path(key), 'a') as lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                waited = False
+            except BlockingIOError:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                waited = True
+            try:
+                yield waited
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def do(self, key, fn, recheck=None):
+        """
+        Return fn() for the key, sharing one execution between concurrent callers.
+        recheck is called after waiting on another process; a non-None result is
+        returned in place of calling fn.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            with self._process_lock(key) as waited:
+                result = recheck() if waited and recheck else None
+                if result is None:
+                    self.calls += 1
+                    result = fn()
+                else:
+                    self.coalesced_across_processes += 1
+            call.result = result
+            return result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def in_flight(self):
+        """Number of keys with a call currently running"""
+        return len(self._calls)
+
+    def get_stats(self):
+        """Upstream calls made and calls that shared another caller's result"""
+        return {
+            'calls': self.calls,
+            'coalesced': self.coalesced,
+            'coalesced_across_processes': self.coalesced_across_processes,
+            'in_flight': self.in_flight()
+        }
@@ -0,0 +1,27 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# The app modules create their cache directories and databases in the working
+# directory when imported, so keep them out of the checkout
+os.chdir(tempfile.mkdtemp(prefix='share-evaluator-tests-'))
+os.environ.pop('REDIS_URL', None)
+
+from resp_client import RESPClient  # noqa: E402
+from resp_stub import RESPStubServer  # noqa: E402
+
+
+@pytest.fixture
+def resp_server():
+    server = RESPStubServer().start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def redis_client(resp_server):
+    return RESPClient(resp_server.url, timeout=2.0)
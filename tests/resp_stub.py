@@ -0,0 +1,187 @@
+"""
+In-process Redis stand-in
+A small RESP2 server, run on a background thread, implementing the commands
+resp_client.RESPClient sends, so the Redis code paths run without a live server
+"""
+
+import time
+import fnmatch
+import threading
+import socketserver
+
+
+class RESPStubServer:
+    """
+    Keys live in a dictionary with optional expiry times. SCAN really pages
+    through the keyspace COUNT keys at a time, and reply_delay holds every
+    reply back, to exercise client timeouts.
+    """
+
+    def __init__(self, password=None):
+        self.password = password
+        self.data = {}
+        self.expiry = {}
+        self.commands = []
+        self.reply_delay = 0.0
+        self._lock = threading.Lock()
+        self._connections = set()
+
+        stub = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                stub._connections.add(self.connection)
+                try:
+                    while True:
+                        args = stub._read_command(self.rfile)
+                        if args is None:
+                            return
+                        reply = stub._dispatch(args)
+                        if stub.reply_delay:
+                            time.sleep(stub.reply_delay)
+                        self.wfile.write(stub._encode(reply))
+                except (ConnectionError, OSError):
+                    return
+                finally:
+                    stub._connections.discard(self.connection)
+
+        class Server(socketserver.ThreadingTCPServer):
+            allow_reuse_address = True
+            daemon_threads = True
+
+        self._server = Server(('127.0.0.1', 0), Handler)
+        self.port = self._server.server_address[1]
+
+    @property
+    def url(self):
+        auth = f":{self.password}@" if self.password else ''
+        return f"redis://{auth}127.0.0.1:{self.port}/0"
+
+    def start(self):
+        threading.Thread(target=self._server.serve_forever, kwargs={'poll_interval': 0.05}, daemon=True).start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def drop_connections(self):
+        """Close every client connection from the server side, as an idle timeout would"""
+        for connection in list(self._connections):
+            try:
+                connection.shutdown(2)
+            except OSError:
+                pass
+
+    def count(self, name):
+        """How many times a command was received"""
+        return sum(1 for args in self.commands if args[0] == name)
+
+    @staticmethod
+    def _read_command(reader):
+        line = reader.readline()
+        if not line:
+            return None
+        args = []
+        for _ in range(int(line[1:])):
+            length = int(reader.readline()[1:])
+            args.append(reader.read(length + 2)[:-2])
+        return args
+
+    @staticmethod
+    def _encode(value):
+        if value is None:
+            return b'$-1\r\n'
+        if isinstance(value, Exception):
+            return b'-ERR ' + str(value).encode() + b'\r\n'
+        if isinstance(value, str):
+            return b'+' + value.encode() + b'\r\n'
+        if isinstance(value, int):
+            return b':%d\r\n' % value
+        if isinstance(value, list):
+            return b'*%d\r\n' % len(value) + b''.join(RESPStubServer._encode(item) for item in value)
+        return b'$%d\r\n' % len(value) + value + b'\r\n'
+
+    def _alive(self, key):
+        if key in self.expiry and self.expiry[key] <= time.time():
+            self.data.pop(key, None)
+            self.expiry.pop(key, None)
+        return key in self.data
+
+    def _dispatch(self, args):
+        name = args[0].decode().upper()
+        with self._lock:
+            self.commands.append([name] + args[1:])
+            handler = getattr(self, f"_cmd_{name.lower()}", None)
+            if handler is None:
+                return Exception(f"unknown command '{name}'")
+            try:
+                return handler(*args[1:])
+            except (TypeError, ValueError) as e:
+                return Exception(str(e))
+
+    def _cmd_ping(self):
+        return 'PONG'
+
+    def _cmd_auth(self, *credentials):
+        return 'OK' if credentials[-1].decode() == self.password else Exception('invalid password')
+
+    def _cmd_select(self, db):
+        return 'OK'
+
+    def _cmd_time(self):
+        now = time.time()
+        return [str(int(now)).encode(), str(int(now % 1 * 1e6)).encode()]
+
+    def _cmd_get(self, key):
+        return self.data[key] if self._alive(key) else None
+
+    def _cmd_set(self, key, value, *options):
+        options = [option.upper() for option in options]
+        if b'NX' in options and self._alive(key):
+            return None
+        self.data[key] = value
+        self.expiry.pop(key, None)
+        if b'PX' in options:
+            self.expiry[key] = time.time() + int(options[options.index(b'PX') + 1]) / 1000
+        return 'OK'
+
+    def _cmd_del(self, *keys):
+        deleted = 0
+        for key in keys:
+            if self._alive(key):
+                deleted += 1
+                del self.data[key]
+                self.expiry.pop(key, None)
+        return deleted
+
+    def _cmd_exists(self, key):
+        return int(self._alive(key))
+
+    def _cmd_incrby(self, key, amount):
+        value = (int(self.data[key]) if self._alive(key) else 0) + int(amount)
+        self.data[key] = str(value).encode()
+        return value
+
+    def _cmd_pexpire(self, key, milliseconds):
+        if not self._alive(key):
+            return 0
+        self.expiry[key] = time.time() + int(milliseconds) / 1000
+        return 1
+
+    def _cmd_strlen(self, key):
+        return len(self.data[key]) if self._alive(key) else 0
+
+    def _cmd_getrange(self, key, start, end):
+        return self.data[key][int(start):int(end) + 1] if self._alive(key) else b''
+
+    def _cmd_scan(self, cursor, *options):
+        options = list(options)
+        pattern = options[options.index(b'MATCH') + 1].decode() if b'MATCH' in options else '*'
+        count = int(options[options.index(b'COUNT') + 1]) if b'COUNT' in options else 10
+        keys = sorted(key for key in list(self.data) if self._alive(key))
+        start = int(cursor)
+        page = keys[start:start + count]
+        next_cursor = start + count if start + count < len(keys) else 0
+        return [str(next_cursor).encode(),
+                [key for key in page if fnmatch.fnmatchcase(key.decode(), pattern)]]
@@ -0,0 +1,41 @@
+import time
+
+from api_key_pool import APIKey, NOTE_COOLDOWN_SECONDS
+
+
+def test_notes_for_calls_in_flight_do_not_spend_the_day():
+    key = APIKey('in-flight-key', tier='premium-75')
+    key.mark_rate_limited()
+    key.mark_rate_limited()
+    assert key.notes == 2
+    assert key.daily_quota.remaining() == key.per_day
+    assert key.exhausted_until - time.time() <= NOTE_COOLDOWN_SECONDS
+
+
+def test_a_note_after_the_rest_spends_the_day():
+    key = APIKey('after-rest-key')
+    key.mark_rate_limited()
+    key.exhausted_until = time.time() - 1
+    key.mark_rate_limited()
+    assert key.daily_quota.remaining() == 0
+    assert key.exhausted_until - time.time() > NOTE_COOLDOWN_SECONDS
+
+
+def test_a_success_between_notes_resets_the_streak():
+    key = APIKey('streak-key')
+    key.mark_rate_limited()
+    key.exhausted_until = time.time() - 1
+    key.mark_ok()
+    key.mark_rate_limited()
+    assert key.daily_quota.remaining() == key.per_day
+
+
+def test_a_lost_quota_race_rests_only_for_the_cooldown():
+    key = APIKey('race-key')
+    key.mark_rate_limited()
+    key.exhausted_until = time.time() - 1
+    # Another process spends a call between reading the quota and claiming the rest of it
+    key.daily_quota.try_consume = lambda calls=1, lane=None: False
+    key.mark_rate_limited()
+    assert key.daily_quota.remaining() > 0
+    assert key.exhausted_until - time.time() <= NOTE_COOLDOWN_SECONDS
@@ -0,0 +1,65 @@
+from contextlib import contextmanager
+
+import batch_evaluator
+from batch_evaluator import BatchEvaluator
+
+
+class FakeKeyPool:
+    rate = 5
+    per = 60.0
+    limit = 25
+
+    def remaining(self):
+        return 25
+
+
+class FakeFetcher:
+    key_pool = FakeKeyPool()
+
+    def plan_requests(self, ticker, estimate_latency=True):
+        return {'max_api_calls': 2}
+
+    @contextmanager
+    def lane(self, name):
+        yield
+
+
+class ScriptedEvaluator(BatchEvaluator):
+    """Answers each ticker's evaluations from a list of errors, None meaning success"""
+
+    def __init__(self, replies):
+        super().__init__(FakeFetcher())
+        self.replies = replies
+        self.calls = []
+
+    def _evaluate_ticker(self, ticker):
+        self.calls.append(ticker)
+        error = self.replies[ticker].pop(0)
+        if error is None:
+            return {'Ticker': ticker, 'Status': 'Evaluated', 'Error': None, '19H Score': 50.0}
+        return {'Ticker': ticker, 'Status': 'Error', 'Error': error}
+
+
+FREQUENCY = 'Unable to fetch company data for {}: API call frequency limit reached. Please try again later.'
+DAILY = 'Unable to fetch company data for {}: Daily API call limit reached. Please try again tomorrow.'
+
+
+def test_a_frequency_limit_is_retried_without_stopping_the_batch():
+    evaluator = ScriptedEvaluator({'AAPL': [FREQUENCY.format('AAPL'), None], 'MSFT': [None]})
+    results = evaluator.run(['AAPL', 'MSFT'])
+    assert dict(zip(results['Ticker'], results['Status'])) == {'AAPL': 'Evaluated', 'MSFT': 'Evaluated'}
+    assert evaluator.calls == ['AAPL', 'AAPL', 'MSFT']
+
+
+def test_a_persistent_frequency_limit_fails_only_that_ticker():
+    retries = batch_evaluator.FREQUENCY_RETRIES
+    evaluator = ScriptedEvaluator({'AAPL': [FREQUENCY.format('AAPL')] * (retries + 1), 'MSFT': [None]})
+    results = evaluator.run(['AAPL', 'MSFT'])
+    assert dict(zip(results['Ticker'], results['Status'])) == {'AAPL': 'Error', 'MSFT': 'Evaluated'}
+
+
+def test_a_spent_daily_quota_defers_the_rest():
+    evaluator = ScriptedEvaluator({'AAPL': [DAILY.format('AAPL')], 'MSFT': [None]})
+    results = evaluator.run(['AAPL', 'MSFT'])
+    assert dict(zip(results['Ticker'], results['Status'])) == {'AAPL': 'Deferred', 'MSFT': 'Deferred'}
+    assert evaluator.calls == ['AAPL']
@@ -0,0 +1,19 @@
+from datetime import timedelta
+
+from api_cache import APICache
+from cache_snapshot import export_snapshot, import_snapshot
+
+
+def test_node_local_entries_are_not_exported(tmp_path):
+    source = APICache(cache_dir=str(tmp_path / 'source'))
+    source.cache_data('AAPL', {'Symbol': 'AAPL'}, 'function=OVERVIEW&symbol=AAPL', ttl=timedelta(hours=1))
+    source.cache_data('', {'calls': 12}, 'cache_warmer_run', ttl=timedelta(hours=1))
+    source.cache_data('ZZQA', {}, 'negative|function=OVERVIEW&symbol=ZZQA', ttl=timedelta(hours=1))
+
+    bundle = str(tmp_path / 'snapshot.tar.gz')
+    assert export_snapshot(source, bundle)['entries'] == 1
+
+    target = APICache(cache_dir=str(tmp_path / 'target'))
+    assert import_snapshot(target, bundle)['imported'] == 1
+    assert target.get_cached_data('AAPL', 'function=OVERVIEW&symbol=AAPL') == {'Symbol': 'AAPL'}
+    assert target.get_cached_data('', 'cache_warmer_run') is None
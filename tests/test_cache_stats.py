@@ -0,0 +1,16 @@
+from datetime import timedelta
+
+from api_cache import APICache
+
+
+def test_failed_lookups_are_grouped_by_endpoint(tmp_path):
+    cache = APICache(cache_dir=str(tmp_path))
+    cache.cache_data('AAPL', {'Symbol': 'AAPL'}, 'function=OVERVIEW&symbol=AAPL', ttl=timedelta(hours=1))
+    for symbol in ('ZZQA', 'ZZQB', 'ZZQC'):
+        cache.get_cached_data(symbol, f'negative|function=OVERVIEW&symbol={symbol}')
+        cache.cache_data(symbol, {}, f'negative|function=OVERVIEW&symbol={symbol}', ttl=timedelta(hours=6))
+
+    stats = cache.get_stats()
+    assert set(stats['endpoints']) == {'OVERVIEW', 'negative:OVERVIEW'}
+    assert stats['endpoints']['negative:OVERVIEW']['entries'] == 3
+    assert 'ZZQA' not in cache.get_stats_prometheus(stats)
@@ -0,0 +1,34 @@
+from datetime import date, timedelta
+from types import SimpleNamespace
+
+import numpy as np
+
+from alpha_vantage_fetcher import AlphaVantageDataFetcher
+from price_store import PriceStore, to_day_number
+
+OVERVIEW = {'Symbol': 'AAPL', '52WeekHigh': '200.0', '52WeekLow': '120.0'}
+
+
+def _fetcher(tmp_path):
+    return SimpleNamespace(price_store=PriceStore(root=str(tmp_path)))
+
+
+def _bars(days_ago, highs, lows):
+    dates = np.array([to_day_number(date.today() - timedelta(days=d)) for d in days_ago])
+    close = (np.array(highs) + np.array(lows)) / 2
+    return {'date': dates, 'open': close, 'high': np.array(highs, dtype=float),
+            'low': np.array(lows, dtype=float), 'close': close, 'volume': np.ones(len(dates))}
+
+
+def test_recent_history_sets_the_range(tmp_path):
+    fetcher = _fetcher(tmp_path)
+    # The 400-day-old bar has rolled out of the window
+    fetcher.price_store.append('AAPL', _bars([400, 200, 1], [250.0, 180.0, 170.0], [90.0, 150.0, 160.0]))
+    assert AlphaVantageDataFetcher._fifty_two_week_range(fetcher, 'AAPL', OVERVIEW, 165.0) == (180.0, 150.0)
+
+
+def test_without_history_the_quote_widens_the_overview_range(tmp_path):
+    quote = {'03. high': '210.5', '04. low': '205.0', '05. price': '209.0'}
+    assert AlphaVantageDataFetcher._fifty_two_week_range(
+        _fetcher(tmp_path), 'AAPL', OVERVIEW, 209.0, quote
+    ) == (210.5, 120.0)
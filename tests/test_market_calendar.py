@@ -0,0 +1,19 @@
+import pytest
+
+from market_calendar import LSE, NYSE, calendar_for
+
+
+@pytest.mark.parametrize('symbol, calendar', [
+    ('VOD.L', LSE),
+    ('VOD.LON', LSE),
+    ('tsco.lon', LSE),
+    ('AAPL', NYSE),
+    (None, NYSE),
+])
+def test_calendar_for_a_ticker_suffix(symbol, calendar):
+    assert calendar_for(symbol) is calendar
+
+
+def test_calendar_for_an_exchange_name():
+    assert calendar_for('VOD.LON', exchange='NASDAQ') is NYSE
+    assert calendar_for(exchange='lse') is LSE
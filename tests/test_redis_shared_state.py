@@ -0,0 +1,122 @@
+import threading
+import time
+from datetime import datetime, timedelta
+
+from api_cache import APICache
+from cache_backends import RedisCacheBackend
+from popularity import RedisPopularityTracker
+from rate_limiter import RedisDailyQuota, RedisTokenBucketRateLimiter
+from resp_client import RESPClient
+from single_flight import SingleFlight
+
+
+def _record(data, data_type='function=OVERVIEW', ttl=timedelta(minutes=5), max_stale=timedelta(0)):
+    now = datetime.now()
+    return {
+        'timestamp': now.isoformat(),
+        'expires_at': (now + ttl).isoformat(),
+        'stale_until': (now + ttl + max_stale).isoformat(),
+        'ticker': 'AAPL',
+        'data_type': data_type,
+        'data': data
+    }
+
+
+def test_cache_backend_round_trip(redis_client):
+    backend = RedisCacheBackend(redis_client)
+    record = _record({'Symbol': 'AAPL', 'PERatio': '28.1'})
+    backend.set('key1', record)
+    assert backend.get('key1') == record
+    assert [key for key, _ in backend.iter_records()] == ['key1']
+
+    [(data_type, entries, size)] = backend.usage()
+    assert (data_type, entries) == ('function=OVERVIEW', 1)
+    assert size == backend.size_bytes() > 0
+
+    backend.delete('key1')
+    assert backend.get('key1') is None
+
+
+def test_cache_backend_expires_entries_after_the_stale_window(resp_server, redis_client):
+    backend = RedisCacheBackend(redis_client)
+    backend.set('key1', _record({}, ttl=timedelta(milliseconds=50), max_stale=timedelta(milliseconds=50)))
+    assert 0 < resp_server.expiry[b'api_cache:key1'] - time.time() <= 0.1
+    time.sleep(0.15)
+    assert backend.get('key1') is None
+
+    # An entry already past its stale window is not stored at all
+    backend.set('key2', _record({}, ttl=timedelta(seconds=-1)))
+    assert backend.get('key2') is None
+
+
+def test_replicas_share_cached_responses(resp_server, tmp_path):
+    replicas = [
+        APICache(cache_dir=str(tmp_path / name), backend=RedisCacheBackend(RESPClient(resp_server.url)))
+        for name in ('replica1', 'replica2')
+    ]
+    replicas[0].cache_data('MSFT', {'Symbol': 'MSFT'}, 'function=OVERVIEW', ttl=timedelta(hours=1))
+    assert replicas[1].get_cached_data('MSFT', 'function=OVERVIEW') == {'Symbol': 'MSFT'}
+
+
+def test_replicas_share_one_token_bucket(resp_server):
+    limiters = [RedisTokenBucketRateLimiter('shared', rate=1, per=0.2, client=RESPClient(resp_server.url))
+                for _ in range(2)]
+    started = time.time()
+    threads = [threading.Thread(target=limiter.acquire) for limiter in limiters for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    # Four tokens from one bucket: the first is immediate, the rest 0.2 s apart
+    assert time.time() - started >= 0.55
+    assert limiters[0].queue_length() == 0
+
+
+def test_replicas_share_one_daily_quota(resp_server):
+    quotas = [RedisDailyQuota('alpha_vantage', limit=3, client=RESPClient(resp_server.url)) for _ in range(2)]
+    assert quotas[0].try_consume(2, lane='interactive')
+    assert quotas[1].try_consume(1, lane='background')
+    assert not quotas[1].try_consume()
+    assert quotas[0].used() == 3
+    assert quotas[0].remaining() == 0
+    assert quotas[1].used_by_lane() == {'interactive': 2, 'prefetch': 0, 'background': 1}
+    assert 0 < quotas[0].seconds_until_reset() <= 86400
+
+
+def test_popularity_counts_are_shared(resp_server):
+    trackers = [RedisPopularityTracker(RESPClient(resp_server.url)) for _ in range(2)]
+    trackers[0].record('aapl')
+    trackers[1].record('AAPL')
+    trackers[1].record('MSFT')
+    assert [ticker for ticker, _ in trackers[0].top()] == ['AAPL', 'MSFT']
+
+
+def test_single_flight_shares_one_call_between_replicas(resp_server):
+    shared_result = {}
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        time.sleep(0.3)
+        shared_result['value'] = 'fresh'
+        return 'fresh'
+
+    replicas = [SingleFlight(redis=RESPClient(resp_server.url)) for _ in range(2)]
+    results = []
+    threads = [
+        threading.Thread(target=lambda flight=flight: results.append(
+            flight.do(('AAPL', 'function=OVERVIEW'), fetch, lambda: shared_result.get('value'))
+        ))
+        for flight in replicas
+    ]
+    threads[0].start()
+    time.sleep(0.05)
+    threads[1].start()
+    for thread in threads:
+        thread.join()
+
+    assert results == ['fresh', 'fresh']
+    assert len(calls) == 1
+    assert sum(flight.coalesced_across_processes for flight in replicas) == 1
+    # The lease lock is released once the call is done
+    assert not list(RESPClient(resp_server.url).scan_iter(match='singleflight:*'))
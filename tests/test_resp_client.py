@@ -0,0 +1,87 @@
+import time
+
+import pytest
+
+from resp_client import RESPClient, RESPError
+from resp_stub import RESPStubServer
+
+
+def test_get_and_set(redis_client):
+    assert redis_client.get('missing') is None
+    assert redis_client.set('greeting', 'hello')
+    assert redis_client.get('greeting') == b'hello'
+    assert redis_client.set('binary', b'\x00\r\n\xff')
+    assert redis_client.get('binary') == b'\x00\r\n\xff'
+
+
+def test_set_px_expires(redis_client):
+    redis_client.set('short', 'lived', px=50)
+    assert redis_client.exists('short')
+    time.sleep(0.1)
+    assert redis_client.get('short') is None
+
+
+def test_set_nx_keeps_existing_value(redis_client):
+    assert redis_client.set('lock', 'first', nx=True)
+    assert not redis_client.set('lock', 'second', nx=True)
+    assert redis_client.get('lock') == b'first'
+    redis_client.delete('lock')
+    assert redis_client.set('lock', 'third', px=1000, nx=True)
+
+
+def test_incrby_and_pexpire(redis_client):
+    assert redis_client.incrby('counter') == 1
+    assert redis_client.incrby('counter', 4) == 5
+    assert redis_client.incrby('counter', -2) == 3
+    assert redis_client.pexpire('counter', 50)
+    assert not redis_client.pexpire('missing', 50)
+    time.sleep(0.1)
+    assert redis_client.get('counter') is None
+
+
+def test_scan_iter_pages_through_matching_keys(redis_client):
+    for i in range(25):
+        redis_client.set(f'scan:{i}', i)
+    redis_client.set('other', 1)
+    keys = set(redis_client.scan_iter(match='scan:*', count=4))
+    assert keys == {f'scan:{i}'.encode() for i in range(25)}
+
+
+def test_time_reads_the_server_clock(redis_client):
+    assert abs(redis_client.time() - time.time()) < 1
+
+
+def test_error_reply_raises(redis_client):
+    with pytest.raises(RESPError):
+        redis_client.execute('NOSUCHCOMMAND')
+    # The connection is still usable after an error reply
+    assert redis_client.ping()
+
+
+def test_authenticates_from_the_url():
+    server = RESPStubServer(password='s3cret').start()
+    try:
+        client = RESPClient(server.url)
+        assert client.ping()
+        assert server.count('AUTH') == 1
+    finally:
+        server.stop()
+
+
+def test_reconnects_when_the_server_closed_an_idle_connection(resp_server, redis_client):
+    assert redis_client.ping()
+    resp_server.drop_connections()
+    time.sleep(0.05)
+    assert redis_client.incrby('after_drop') == 1
+    assert resp_server.count('INCRBY') == 1
+
+
+def test_read_timeout_is_raised_without_resending(resp_server):
+    client = RESPClient(resp_server.url, timeout=0.2)
+    resp_server.reply_delay = 0.5
+    with pytest.raises(OSError):
+        client.incrby('quota')
+    resp_server.reply_delay = 0.0
+    # The command reached the server once and was not sent again
+    assert resp_server.count('INCRBY') == 1
+    assert client.get('quota') == b'1'